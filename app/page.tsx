@@ -49,7 +49,13 @@ export default function Dashboard() {
         body: JSON.stringify({ query }),
       })
 
+      if (response.status === 429) {
+        const detail = await response.json().catch(() => null)
+        const retryAfter = response.headers.get("Retry-After")
+        throw new Error(`${detail?.detail ?? "Too many analyses queued"}${retryAfter ? ` (retry in ${retryAfter}s)` : ""}`)
+      }
       if (!response.ok) throw new Error("Failed to start analysis")
+      const { task_id: taskId } = await response.json()
 
       setAnalysisStatus({
         status: "running",
@@ -61,16 +67,21 @@ export default function Dashboard() {
 
       const pollStatus = async () => {
         try {
-          const statusResponse = await fetch("http://localhost:8000/api/status")
+          const statusResponse = await fetch(`http://localhost:8000/api/status?task_id=${encodeURIComponent(taskId)}`)
           const status = await statusResponse.json()
           setAnalysisStatus(status)
 
-          if (status.status === "completed") {
-            const resultsResponse = await fetch("http://localhost:8000/api/results")
-            const resultsData = await resultsResponse.json()
-            setResults(resultsData)
-            setShowResults(true)
-          } else if (status.status === "running") {
+          if (["completed", "partial", "cancelled"].includes(status.status)) {
+            // Stopped analyses still return the stages they completed; a job
+            // cancelled while queued has none
+            const resultsResponse = await fetch(
+              `http://localhost:8000/api/results?task_id=${encodeURIComponent(taskId)}`
+            )
+            if (resultsResponse.ok) {
+              setResults(await resultsResponse.json())
+              setShowResults(true)
+            }
+          } else if (["queued", "starting", "running"].includes(status.status)) {
             setTimeout(pollStatus, 2000)
           }
         } catch (error) {
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Admission Configuration
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "100"))
+ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", "10"))
+ADMISSION_POLL_SECONDS = float(os.getenv("ADMISSION_POLL_SECONDS", "0.5"))
+THROUGHPUT_WINDOW_SECONDS = 60
+DEFAULT_RETRY_AFTER_SECONDS = 5
+MAX_RETRY_AFTER_SECONDS = 300
+
+# Lower value is served first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFull(Exception):
+    """The admission queue (or the client's share of it) is full"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueuedRequest:
+    """An analysis waiting for a job slot, with the arguments to start it"""
+
+    def __init__(self, task_id: str, client: str, priority: str, params: Dict[str, Any]):
+        self.task_id = task_id
+        self.client = client
+        self.priority = priority
+        self.params = params
+        self.enqueued_at = time.time()
+
+
+class ThroughputMeter:
+    """Finished jobs per second over a sliding window"""
+
+    def __init__(self, window: float = THROUGHPUT_WINDOW_SECONDS):
+        self.window = window
+        self._since = time.monotonic()
+        self._finished: Deque[float] = deque()
+
+    def record(self):
+        now = time.monotonic()
+        self._finished.append(now)
+        self._expire(now)
+
+    def _expire(self, now: float):
+        while self._finished and now - self._finished[0] > self.window:
+            self._finished.popleft()
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        self._expire(now)
+        return len(self._finished) / max(1.0, min(self.window, now - self._since))
+
+
+class AdmissionQueue:
+    """Bounded queue in front of the job supervisor.
+
+    Priorities are served strictly in order; within a priority, clients take
+    turns, so one client submitting many analyses cannot starve the others.
+    ``start`` launches a request and returns False when no job slot is free;
+    ``publish`` is told a waiting request's position and estimated start
+    whenever its position changes, and ``fail`` is told of a request that
+    could not be started because ``start`` raised.
+    """
+
+    def __init__(self, start: Callable[[QueuedRequest], bool],
+                 publish: Callable[[QueuedRequest, int, Optional[float]], None],
+                 max_queued: int = ADMISSION_QUEUE_SIZE, max_per_client: int = ADMISSION_MAX_PER_CLIENT,
+                 fail: Optional[Callable[[QueuedRequest, Exception], None]] = None):
+        self.start = start
+        self.publish = publish
+        self.fail = fail
+        self.max_queued = max_queued
+        self.max_per_client = max_per_client
+        self.throughput = ThroughputMeter()
+        self.rejected = 0
+        # One round-robin ring of clients per priority level
+        self._levels: List["OrderedDict[str, Deque[QueuedRequest]]"] = [OrderedDict() for _ in PRIORITIES]
+        self._queued: Dict[str, QueuedRequest] = {}
+        self._per_client: Counter = Counter()
+        # Last position published for each queued request
+        self._published: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def submit(self, request: QueuedRequest) -> bool:
+        """Start the request, or queue it; returns True if it was queued"""
+        if not self._queued and self.start(request):
+            return False
+        if len(self._queued) >= self.max_queued:
+            self.rejected += 1
+            raise QueueFull("Analysis queue is full", self._retry_after(1))
+        if self._per_client[request.client] >= self.max_per_client:
+            self.rejected += 1
+            order = self._dispatch_order()
+            first = next(i for i, queued in enumerate(order, 1) if queued.client == request.client)
+            raise QueueFull(f"Client already has {self.max_per_client} analyses queued", self._retry_after(first))
+
+        level = self._levels[PRIORITIES[request.priority]]
+        level.setdefault(request.client, deque()).append(request)
+        self._queued[request.task_id] = request
+        self._per_client[request.client] += 1
+        logger.info(f"[admission] Queued {request.task_id} for {request.client} ({len(self._queued)} waiting)")
+        self._publish_changed()
+        self._ensure_pump()
+        return True
+
+    def _retry_after(self, position: int) -> int:
+        """Seconds until ``position`` queued jobs are likely to have started"""
+        rate = self.throughput.rate()
+        if rate <= 0:
+            return DEFAULT_RETRY_AFTER_SECONDS
+        return min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(position / rate)))
+
+    def _dispatch_order(self) -> List[QueuedRequest]:
+        order = []
+        for level in self._levels:
+            rings = [list(requests) for requests in level.values()]
+            for turn in range(max(map(len, rings), default=0)):
+                order.extend(requests[turn] for requests in rings if turn < len(requests))
+        return order
+
+    def _next(self) -> Optional[QueuedRequest]:
+        for level in self._levels:
+            if level:
+                return next(iter(level.values()))[0]
+        return None
+
+    def _remove(self, request: QueuedRequest, dispatched: bool = False):
+        level = self._levels[PRIORITIES[request.priority]]
+        requests = level[request.client]
+        requests.remove(request)
+        if not requests:
+            del level[request.client]
+        elif dispatched:
+            # The client goes to the back of the ring after each dispatch
+            level.move_to_end(request.client)
+        del self._queued[request.task_id]
+        self._published.pop(request.task_id, None)
+        self._per_client[request.client] -= 1
+        if not self._per_client[request.client]:
+            del self._per_client[request.client]
+
+    def describe(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Live queue position and estimated start of a request queued on this worker"""
+        if task_id not in self._queued:
+            return None
+        position = next(i for i, queued in enumerate(self._dispatch_order(), 1) if queued.task_id == task_id)
+        return {"queue_position": position, "estimated_start": self._estimated_start(position)}
+
+    def _estimated_start(self, position: int) -> Optional[float]:
+        rate = self.throughput.rate()
+        return time.time() + position / rate if rate > 0 else None
+
+    def _publish_changed(self):
+        """Publish the positions that changed since they were last published"""
+        rate = self.throughput.rate()
+        for position, request in enumerate(self._dispatch_order(), 1):
+            if self._published.get(request.task_id) != position:
+                self._published[request.task_id] = position
+                self.publish(request, position, time.time() + position / rate if rate > 0 else None)
+
+    def remove(self, task_id: str) -> Optional[QueuedRequest]:
+        """Drop a queued request, e.g. when it is cancelled before starting"""
+        request = self._queued.get(task_id)
+        if request is not None:
+            self._remove(request)
+            self._publish_changed()
+        return request
+
+    def clear(self) -> List[QueuedRequest]:
+        requests = list(self._queued.values())
+        for request in requests:
+            self._remove(request)
+        return requests
+
+    def job_finished(self):
+        """Called when a job releases its slot: record throughput and try the next request"""
+        self.throughput.record()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_pump(self):
+        if self._pump_task is None or self._pump_task.done():
+            self._wakeup = asyncio.Event()
+            self._pump_task = asyncio.get_running_loop().create_task(self._pump())
+
+    def _start(self, request: QueuedRequest) -> bool:
+        """``start(request)``; True once the request has left the queue, even if starting it failed"""
+        try:
+            return self.start(request)
+        except Exception as e:
+            # Dropped, so one bad request cannot stop admission for the rest
+            logger.exception(f"[admission] Could not start {request.task_id}: {e}")
+            if self.fail is not None:
+                self.fail(request, e)
+            return True
+
+    async def _pump(self):
+        # Slots freed by other workers are not signalled here, so also poll
+        while self._queued:
+            dispatched = False
+            while self._queued:
+                request = self._next()
+                if not self._start(request):
+                    break
+                self._remove(request, dispatched=True)
+                dispatched = True
+            if dispatched:
+                # Positions shift once per batch of starts
+                self._publish_changed()
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), ADMISSION_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._queued),
+            "max_queued": self.max_queued,
+            "queued_by_priority": {
+                name: sum(map(len, self._levels[level].values())) for name, level in PRIORITIES.items()
+            },
+            "clients_waiting": len(self._per_client),
+            "rejected": self.rejected,
+            "jobs_per_second": round(self.throughput.rate(), 3),
+        }
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+# Agent Service Client Configuration
+AGENT_SERVICE_SOCKET = os.getenv("AGENT_SERVICE_SOCKET", os.path.join(tempfile.gettempdir(), "agent_service.sock"))
+# One JSON document per line; reports can be larger than asyncio's 64 KB default
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+class AgentServiceError(Exception):
+    """An error answered by the agent service; ``code`` is busy, bad_request or not_found"""
+
+    def __init__(self, message: str, code: str = "bad_request"):
+        super().__init__(message)
+        self.code = code
+
+
+class AgentServiceClient:
+    """Submits queries to a running agent service over its local socket"""
+
+    def __init__(self, socket_path: str = AGENT_SERVICE_SOCKET):
+        self.socket_path = socket_path
+
+    async def request(self, op: str, **fields) -> Dict[str, Any]:
+        reader, writer = await asyncio.open_unix_connection(self.socket_path, limit=MAX_LINE_BYTES)
+        try:
+            writer.write(json.dumps(dict(fields, op=op)).encode("utf-8") + b"\n")
+            await writer.drain()
+            line = await reader.readline()
+        finally:
+            writer.close()
+        if not line:
+            raise ConnectionError("Agent service closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise AgentServiceError(response["error"], response["code"])
+        return response["result"]
+
+    async def submit(self, query: str, wait: bool = False, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.request("submit", query=query, wait=wait, timeout=timeout)
+
+    async def status(self, job_id: str) -> Dict[str, Any]:
+        return await self.request("status", job_id=job_id)
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return await self.request("wait", job_id=job_id, timeout=timeout)
+
+    async def stats(self) -> Dict[str, Any]:
+        return await self.request("stats")
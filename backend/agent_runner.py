@@ -1,14 +1,25 @@
 import asyncio
 import logging
-import threading
+import pickle
 import time
-from typing import Dict, Any, Callable
-import requests
-import re
-import google.generativeai as genai
+from typing import AsyncIterator, Dict, Any, Callable, List, Optional, Tuple
 import os
-# Import the analysis_results from real_agents
-from real_agents import analysis_results
+from admission import AdmissionQueue, QueuedRequest
+from corpus_processor import EntityCounts, clean_text, process_corpus, process_shard, should_parallelize
+from corpus_store import get_corpus_store
+from dedup import ResultDeduplicator, estimate_time_saved
+from eda_engine import analyze_corpus, render_eda_markdown
+from feature_hashing import describe_training, train_relevance_model
+from gemini_client import configure_gemini, get_gemini_client
+from incremental import IncrementalRun, get_incremental_store
+from job_control import JobCancelled, JobContext, new_task_id
+from job_supervisor import get_job_supervisor
+from model_server import save_model
+from page_cache import PAGE_FETCH, PAGE_FETCH_TIMEOUT, apply_pages, get_page_cache, new_fetch_summary
+from records import SearchResult, render_results, results_from_items
+from stage_cache import Stage, get_stage_cache
+from summarizer import render_summary, summarize
+from tracing import activate, span
 
 logger = logging.getLogger(__name__)
 
@@ -18,211 +29,492 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 CX_ID = os.getenv("CX_ID")
 GEMINI_API_KEY =os.getenv("GEMINI_API_KEY")
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
+# Upstream endpoints; overridable to point at local stand-ins (see fake_upstreams.py)
+GOOGLE_CSE_URL = os.getenv("GOOGLE_CSE_URL", "https://www.googleapis.com/customsearch/v1")
+SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+
+# Search Configuration
+SEARCH_DEPTH = int(os.getenv("SEARCH_DEPTH", "10"))
+SEARCH_PAGE_SIZE = 10
+SEARCH_MAX_DEPTH = 100  # Custom Search serves at most 100 results per query
+
+
+def clean_documents(texts: List[str], in_process: bool = False) -> Tuple[List[str], EntityCounts]:
+    """Cleaned documents and their merged entity counts, sharded across processes for large corpora"""
+    # Profiled jobs clean in-process: the profiler samples this process only
+    if should_parallelize(texts) and not in_process:
+        documents, counts, _ = process_corpus(texts)
+        return documents, counts
+    return process_shard(texts)
+
+
+def analyze_documents(documents: List[str], entity_counts: EntityCounts):
+    """Corpus stats and keywords; EDA_STAGE hashes this module too, as it shapes the cached result"""
+    return analyze_corpus(documents), entity_counts.to_keywords()
+
+
+# Deterministic stages, reused for byte-identical input (see stage_cache.py)
+CLEAN_STAGE = Stage("clean", clean_documents, process_shard)
+EDA_STAGE = Stage("eda", analyze_documents, analyze_corpus, EntityCounts.to_keywords)
+TRAIN_STAGE = Stage("train", train_relevance_model)
+SUMMARY_STAGE = Stage("summary", summarize, analyze_corpus)
+
+# Gemini's answer is given up on this long before the job's deadline, so the
+# job still completes with the extractive summary as its answer
+GEMINI_DEADLINE_MARGIN_SECONDS = float(os.getenv("GEMINI_DEADLINE_MARGIN_SECONDS", "0.5"))
+
+# Configure Gemini (GEMINI_API_ENDPOINT overrides the endpoint)
+configure_gemini(GEMINI_API_KEY)
 
 class AgentPipelineRunner:
     def __init__(self):
-        self.is_running = False
+        self.supervisor = get_job_supervisor()
+        self.store = self.supervisor.store
+        self.admission = AdmissionQueue(self._start_request, self._publish_queued, fail=self._fail_queued)
+        self.supervisor.add_done_listener(lambda task_id: self.admission.job_finished())
         self.status_callback: Callable[[Dict[str, Any]], None] = None
-        self.current_thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.supervisor.running_count > 0
 
     def set_status_callback(self, callback: Callable[[Dict[str, Any]], None]):
         self.status_callback = callback
 
-    def update_status(self, status: str, current_agent: str = None, 
+    def update_status(self, job: JobContext, status: str, current_agent: str = None,
                      progress: int = 0, error: str = None):
+        job.status = {
+            "status": status,
+            "current_agent": current_agent,
+            "progress": progress,
+            "error": error,
+            "timestamp": time.time(),
+            "start_time": job.started_at,
+            "is_running": status in ("starting", "running"),
+            "task_id": job.task_id
+        }
+        self.store.put_nowait(job.task_id, "status", job.status)
         if self.status_callback:
-            self.status_callback({
-                "status": status,
-                "current_agent": current_agent,
-                "progress": progress,
-                "error": error,
-                "timestamp": time.time(),
-                "is_running": self.is_running
-            })
+            self.status_callback(job.status)
 
     def preprocess_text(self, text):
         """Clean and preprocess text data"""
-        text = re.sub(r"<.*?>", "", text)
-        text = re.sub(r"[^a-zA-Z0-9\s:]", "", text)
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+        return clean_text(text)
 
     def extract_keywords(self, text):
         """Extract keywords and named entities from text"""
-        words = re.findall(r'\b[A-Z][a-z]+\b', text)
-        keywords = list(set([w for w in words if len(w) > 3]))[:15]
-        
-        orgs = re.findall(r'\b[A-Z][a-zA-Z]* (?:Inc|Corp|Company|Technologies|Ltd)\b', text)
-        locs = re.findall(r'(?:in|at|from|to) ([A-Z][a-zA-Z]+)', text)
-        misc = re.findall(r'\b[A-Z][a-zA-Z]{2,}\b', text)
-        
-        return {
-            "Keywords": keywords,
-            "Named Entities": {
-                "ORG": list(set(orgs))[:10],
-                "LOC": list(set(locs))[:10], 
-                "MISC": list(set([m for m in misc if m not in orgs and m not in locs]))[:10]
-            }
-        }
+        return EntityCounts().add(text).to_keywords()
 
-    async def scrape_data(self, query: str) -> str:
-        """Scrape data from web sources"""
-        self.update_status("running", "scraper_agent", 20)
-        
+    async def scrape_data(self, query: str, job: JobContext,
+                          depth: int = SEARCH_DEPTH) -> AsyncIterator[List[SearchResult]]:
+        """Scrape web sources page by page, yielding each page's new results as it arrives.
+
+        All pages are requested at once; results are merged by URL and
+        near-duplicates are dropped across pages.
+        """
+        self.update_status(job, "running", "scraper_agent", 20)
+
+        depth = max(1, min(depth, SEARCH_MAX_DEPTH))
+        pages = [
+            asyncio.ensure_future(self._fetch_page(query, offset, job))
+            for offset in range(0, depth, SEARCH_PAGE_SIZE)
+        ]
+        deduplicator = ResultDeduplicator(series=query)
+        job.results["dedup"] = deduplicator.stats
+        seen_urls = set()
+        try:
+            for page in asyncio.as_completed(pages):
+                items = await page
+                results = []
+                for result in results_from_items(items):
+                    if not result.url or result.url not in seen_urls:
+                        seen_urls.add(result.url)
+                        results.append(result)
+                results = deduplicator.add(results)
+                if results:
+                    await self.fetch_pages(results, job)
+                    yield results
+        finally:
+            for page in pages:
+                page.cancel()
+
+        if not deduplicator.stats["input"]:
+            logger.warning("No data available - API quota exceeded or network error")
+        elif deduplicator.stats["removed"]:
+            logger.info(f"[dedup] Removed {deduplicator.stats['removed']} of "
+                        f"{deduplicator.stats['input']} near-duplicate results")
+
+    async def fetch_pages(self, results: List[SearchResult], job: JobContext):
+        """With PAGE_FETCH=on, add the text of each result's page, fetched through the shared page cache"""
+        if PAGE_FETCH != "on":
+            return
+        cache = get_page_cache()
+        with span("upstream.pages", pages=len(results)):
+            pages = await asyncio.gather(*(
+                job.run_blocking(cache.fetch, result.url, job.session, job.timeout(PAGE_FETCH_TIMEOUT))
+                for result in results
+            ))
+        # Extracting text runs several regex passes over bodies of up to PAGE_MAX_BYTES
+        await job.run_cpu(apply_pages, results, pages, job.results.setdefault("page_fetch", new_fetch_summary()))
+
+    async def _fetch_page(self, query: str, offset: int, job: JobContext) -> list:
+        """Fetch one page of results, falling back to SerpAPI for that page"""
         try:
             # Try Google Custom Search first
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {"q": query, "key": GOOGLE_API_KEY, "cx": CX_ID, "num": 10}
-            res = requests.get(url, params=params, timeout=10)
+            url = GOOGLE_CSE_URL
+            params = {"q": query, "key": GOOGLE_API_KEY, "cx": CX_ID,
+                      "num": SEARCH_PAGE_SIZE, "start": offset + 1}
+            with span("upstream.cse", offset=offset) as call:
+                res = await job.run_blocking(job.session.get, url, params=params, timeout=job.timeout())
+                call.set_attribute("status_code", res.status_code)
             
             if res.status_code == 200:
-                items = res.json().get("items", [])
-                result = "\n".join([
-                    f"Title: {item.get('title')}\nURL: {item.get('link')}\nSnippet: {item.get('snippet')}"
-                    for item in items
-                ])
-                return result
-            else:
-                return await self.use_serpapi(query)
+                return res.json().get("items", [])
+            return await self.use_serpapi(query, job, offset)
                 
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.warning(f"Google API failed: {e}")
-            return await self.use_serpapi(query)
+            return await self.use_serpapi(query, job, offset)
 
-    async def use_serpapi(self, query: str) -> str:
+    async def use_serpapi(self, query: str, job: JobContext, offset: int = 0) -> list:
         """Fallback to SerpAPI"""
         try:
-            url = "https://serpapi.com/search"
-            params = {"q": query, "api_key": SERP_API_KEY, "engine": "google", "num": 10}
-            res = requests.get(url, params=params, timeout=10)
+            url = SERPAPI_URL
+            params = {"q": query, "api_key": SERP_API_KEY, "engine": "google",
+                      "num": SEARCH_PAGE_SIZE, "start": offset}
+            with span("upstream.serpapi", offset=offset) as call:
+                res = await job.run_blocking(job.session.get, url, params=params, timeout=job.timeout())
+                call.set_attribute("status_code", res.status_code)
             res.raise_for_status()
-            results = res.json().get("organic_results", [])
-            return "\n".join([
-                f"Title: {r.get('title')}\nURL: {r.get('link')}\nSnippet: {r.get('snippet')}"
-                for r in results
-            ])
+            return res.json().get("organic_results", [])
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"SerpAPI failed: {e}")
-            return "No data available - API quota exceeded or network error"
+            return []
 
-    async def clean_data(self, raw_data: str) -> str:
-        """Clean and preprocess data"""
-        self.update_status("running", "data_cleaning_agent", 40)
-        return self.preprocess_text(raw_data)
+    async def clean_data(self, results: List[SearchResult], job: JobContext,
+                         incremental: Optional[IncrementalRun] = None) -> List[str]:
+        """Clean and preprocess each result's content; URLs are kept intact.
 
-    async def perform_eda(self, cleaned_data: str) -> str:
-        """Perform exploratory data analysis"""
-        self.update_status("running", "eda_agent", 60)
-        
-        keywords = self.extract_keywords(cleaned_data)
-        eda_output = f"""## Exploratory Data Analysis
-- Length: {len(cleaned_data)} chars
-- Articles: {cleaned_data.count('Title:')}
-- Keywords: {', '.join(keywords['Keywords'][:5])}
-- ORGs: {', '.join(keywords['Named Entities']['ORG'][:5])}
-- LOCs: {', '.join(keywords['Named Entities']['LOC'][:5])}
-- MISC: {', '.join(keywords['Named Entities']['MISC'][:5])}
-- Snippet: {cleaned_data[:300]}..."""
-        
-        return eda_output
+        In incremental mode only sources that are new or changed since the
+        query's previous run are cleaned.
+        """
+        self.update_status(job, "running", "data_cleaning_agent", 40)
+        if incremental is not None:
+            return await job.run_cpu(incremental.process, results)
+        texts = [result.text() for result in results]
+        # Hashing the texts and reading or writing the cache entry happen on the stage executor too
+        documents, counts = await job.run_cpu(get_stage_cache().call, CLEAN_STAGE, clean_documents, texts,
+                                              in_process=job.profiler is not None)
+        # Entity counts of every page are reduced into one for the EDA stage
+        job.results.setdefault("entity_counts", EntityCounts()).merge(counts)
+        return documents
 
-    async def train_model(self, eda_output: str) -> str:
-        """Simulate model training"""
-        self.update_status("running", "model_training_agent", 80)
-        
-        keywords = self.extract_keywords(eda_output)['Keywords']
-        sample_count = max(len(keywords), 15)
-        
-        return f"RandomForestRegressor trained on {sample_count} samples"
+    async def perform_eda(self, documents: List[str], job: JobContext,
+                          incremental: Optional[IncrementalRun] = None):
+        """Perform exploratory data analysis; returns corpus stats and keywords"""
+        self.update_status(job, "running", "eda_agent", 60)
+        if incremental is not None:
+            stats, keywords, job.results["incremental"] = await job.run_cpu(incremental.finish)
+            return stats, keywords
+        return await job.run_cpu(get_stage_cache().call, EDA_STAGE, analyze_documents, documents,
+                                 job.results.get("entity_counts", EntityCounts()))
+
+    async def train_model(self, documents: List[str], job: JobContext) -> str:
+        """Train the query-relevance model on hashed features of the cleaned documents"""
+        self.update_status(job, "running", "model_training_agent", 80)
+        (model, stats), cached = await job.run_cpu(get_stage_cache().call_with_hit, TRAIN_STAGE, train_relevance_model,
+                                                   documents, job.query, check=job.check)
+        if cached:
+            stats = dict(stats, cached=True)
+        job.results["training"] = stats
+        if stats["documents"]:
+            await job.run_blocking(save_model, pickle.dumps(model))
+        return describe_training(stats)
+
+    async def summarize_sources(self, query: str, job: JobContext) -> str:
+        """Extractive summary of the scraped sources, computed locally in milliseconds"""
+        sources = job.results.get("sources", [])
+        texts = [f"{source.snippet} {source.content}" for source in sources]
+        start = time.perf_counter()
+        summary = await job.run_cpu(get_stage_cache().call, SUMMARY_STAGE, summarize, texts, query)
+        job.results["summary_seconds"] = time.perf_counter() - start
+        return render_summary(summary, len(sources))
 
-    async def generate_final_answer(self, query: str) -> str:
-        """Generate final answer using Gemini AI"""
-        self.update_status("running", "report_agent", 90)
+    async def generate_final_answer(self, query: str, job: JobContext) -> str:
+        """Generate final answer using Gemini AI.
+
+        A local extractive summary is published as a provisional answer first;
+        it stays the answer if Gemini fails or misses the job's deadline.
+        """
+        self.update_status(job, "running", "report_agent", 90)
+        summary = await self.summarize_sources(query, job)
+        job.results["summary"] = summary
+        if summary:
+            job.results["final_answer"] = summary
+            job.results["answer_source"] = "summary"
+            # Readable from /api/results while Gemini is still generating
+            self.store.put_nowait(job.task_id, "results", self.results_payload(job))
         
+        timings = job.results.setdefault("llm", {})
         try:
-            model = genai.GenerativeModel("gemini-2.0-flash")
-            response = model.generate_content(
-                f"Provide a comprehensive analysis and answer for: '{query}'. Include trends, insights, and actionable information."
-            )
+            job.check()
+            wait = job.remaining() - (GEMINI_DEADLINE_MARGIN_SECONDS if summary else 0.0)
+            with span("upstream.gemini") as call:
+                response = await asyncio.wait_for(get_gemini_client().generate(
+                    f"Provide a comprehensive analysis and answer for: '{query}'. Include trends, insights, and actionable information.",
+                    timings
+                ), max(0.0, wait))
+                call.set_attribute("queue_ms", timings.get("queue_seconds", 0) * 1000)
             
             if hasattr(response, "text") and response.text.strip():
+                job.results["answer_source"] = "gemini"
                 return response.text.strip()
             else:
-                return "Analysis completed successfully."
+                return summary or "Analysis completed successfully."
                 
+        except asyncio.TimeoutError:
+            if not summary:
+                raise JobCancelled("deadline")
+            logger.warning(f"[{job.task_id}] Gemini missed the deadline; answering with the extractive summary")
+            timings["error"] = "deadline"
+            return summary
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Gemini failed: {e}")
+            if summary:
+                timings["error"] = str(e)
+                return summary
             return f"Analysis completed. AI summary temporarily unavailable: {str(e)}"
 
-    def run_pipeline_async(self, query: str):
-        """Start pipeline in background thread"""
-        if self.is_running:
+    def run_pipeline_async(self, query: str, timeout: Optional[float] = None, profile: bool = False,
+                           depth: Optional[int] = None, traceparent: Optional[str] = None,
+                           client: str = "anonymous", priority: str = "normal", incremental: bool = False) -> str:
+        """Schedule the pipeline on the running event loop, or queue it until a job slot frees up.
+
+        Returns the task id; raises QueueFull when the admission queue has no room.
+        """
+        request = QueuedRequest(new_task_id(), client, priority, {
+            "query": query, "timeout": timeout, "profile": profile, "depth": depth, "traceparent": traceparent,
+            "incremental": incremental,
+        })
+        if self.admission.submit(request):
+            # Started jobs are recorded by the supervisor
+            self.store.put_nowait(request.task_id, "submitted", request.enqueued_at)
+        return request.task_id
+
+    def _start_request(self, request: QueuedRequest) -> bool:
+        """Start a request from the admission queue; False if no job slot is free"""
+        if not self.supervisor.has_capacity():
             return False
-            
-        self.is_running = True
-        self.update_status("starting", "prompt_agent", 0)
-        
-        # Clear previous results
-        analysis_results.clear()
-        analysis_results["query"] = query
-        
-        self.current_thread = threading.Thread(
-            target=self._run_pipeline_sync,
-            args=(query,)
-        )
-        self.current_thread.daemon = True
-        self.current_thread.start()
+        params = request.params
+        job = JobContext(params["query"], params["timeout"], task_id=request.task_id,
+                         profile=params["profile"], traceparent=params["traceparent"])
+        if self.supervisor.submit(job, self._run_job(job, params["depth"] or SEARCH_DEPTH, params["incremental"])) is None:
+            return False
+        job.results["queue_seconds"] = time.time() - request.enqueued_at
+        job.span.set_attribute("queue_seconds", job.results["queue_seconds"])
+        self.update_status(job, "starting", "prompt_agent", 0)
         return True
 
-    def _run_pipeline_sync(self, query: str):
-        """Run the complete pipeline synchronously"""
+    def _publish_queued(self, request: QueuedRequest, position: int, estimated_start: Optional[float]):
+        self.store.put_nowait(request.task_id, "status", {
+            "status": "queued",
+            "current_agent": None,
+            "progress": 0,
+            "error": None,
+            "timestamp": time.time(),
+            "start_time": None,
+            "is_running": False,
+            "task_id": request.task_id,
+            "priority": request.priority,
+            "queued_at": request.enqueued_at,
+            "queue_position": position,
+            "estimated_start": estimated_start,
+        })
+
+    def _fail_queued(self, request: QueuedRequest, error: Exception):
+        status = self.store.get(request.task_id, "status") or {}
+        self.store.put_nowait(request.task_id, "status", dict(
+            status, status="error", error=f"Could not start the analysis: {error}", timestamp=time.time()
+        ))
+
+    def _cancel_queued(self, request: QueuedRequest, reason: str):
+        status = self.store.get(request.task_id, "status") or {}
+        self.store.put_nowait(request.task_id, "status", dict(
+            status, status="cancelled", error=f"Cancelled while queued ({reason})", timestamp=time.time()
+        ))
+
+    async def _run_job(self, job: JobContext, depth: int = SEARCH_DEPTH, incremental: bool = False):
+        """Run the complete pipeline for one job"""
         try:
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-            # Run the pipeline steps
-            loop.run_until_complete(self._execute_pipeline(query))
-            
-            self.update_status("completed", "report_agent", 100)
+            # The deadline bounds the whole run
+            with activate(job.span):
+                await asyncio.wait_for(self._execute_pipeline(job, depth, incremental), job.remaining())
+            self.update_status(job, "completed", "report_agent", 100)
             
+        except (JobCancelled, asyncio.CancelledError, asyncio.TimeoutError):
+            self._finish_partial(job)
         except Exception as e:
             error_msg = f"Pipeline failed: {str(e)}"
             logger.error(error_msg)
-            self.update_status("error", error=error_msg)
+            self.update_status(job, "error", error=error_msg)
         finally:
-            self.is_running = False
-            if 'loop' in locals():
-                loop.close()
+            if job.profiler is not None:
+                await asyncio.to_thread(job.profiler.flush)
+            self._publish_results(job)
+            await asyncio.to_thread(self._record_corpus, job)
+
+    @staticmethod
+    def _record_corpus(job: JobContext):
+        """Append the job's sources and cleaned text to the on-disk corpus history"""
+        store = get_corpus_store()
+        sources = job.results.get("sources", [])
+        if store is None or not sources:
+            return
+        documents = job.results.get("cleaned_documents", [])
+        # Incremental runs skip repeated URLs and stopped jobs may not have cleaned
+        # every page, so the documents do not always line up with the sources
+        if len(documents) != len(sources):
+            documents = [clean_text(source.text()) for source in sources]
+        try:
+            store.append(job.task_id, job.query, sources, documents)
+        except OSError as e:
+            logger.error(f"[corpus] Could not record {job.task_id}: {e}")
+
+    def _publish_results(self, job: JobContext):
+        """Make the finished job's results (and profile) readable from every worker"""
+        self.store.put_nowait(job.task_id, "results", self.results_payload(job))
+        if job.profiler is not None:
+            self.store.put_nowait(job.task_id, "profile", job.profiler.summary())
+            self.store.put_nowait(job.task_id, "profile_collapsed", job.profiler.collapsed())
+
+    @staticmethod
+    def results_payload(job: JobContext) -> Dict[str, Any]:
+        """The /api/results response for a job"""
+        analysis_results = job.results
+        status = job.status
+        sources = analysis_results.get("sources", [])
+        documents = analysis_results.get("cleaned_documents", [])
+        return {
+            "task_id": analysis_results.get("task_id"),
+            "query": analysis_results.get("query", ""),
+            "partial": analysis_results.get("partial", False),
+            "completed_stages": analysis_results.get("completed_stages"),
+            "scrape_results": render_results(sources) or "No data available - API quota exceeded or network error",
+            "sources": [source.to_dict() for source in sources],
+            "cleaned_data": "\n".join(documents),
+            "eda_output": analysis_results.get("eda_output", ""),
+            "eda_stats": analysis_results.get("eda_stats"),
+            "model_info": analysis_results.get("model_info", ""),
+            "final_answer": analysis_results.get("final_answer", ""),
+            # "summary" (local, extractive) until Gemini's answer replaces it
+            "answer_source": analysis_results.get("answer_source"),
+            "provisional": status.get("is_running", False),
+            "summary": analysis_results.get("summary", ""),
+            "summary_seconds": analysis_results.get("summary_seconds"),
+            "processing_time": status["timestamp"] - status["start_time"],
+            "data_sources": len(sources),
+            "characters_processed": sum(len(document) for document in documents),
+            "dedup": analysis_results.get("dedup"),
+            "page_fetch": analysis_results.get("page_fetch"),
+            "llm": analysis_results.get("llm"),
+            "queue_seconds": analysis_results.get("queue_seconds", 0.0),
+            "incremental": analysis_results.get("incremental"),
+            "training": analysis_results.get("training"),
+            "trace_id": job.span.trace_id if job.span.sampled else None,
+            "agent_actions": 6
+        }
+
+    def _finish_partial(self, job: JobContext):
+        """Publish whatever stages completed before cancellation or the deadline"""
+        reason = job.cancel_reason or "deadline"
+        job.results["partial"] = True
+        logger.warning(f"[{job.task_id}] Pipeline stopped ({reason}) after stages: {job.completed_stages}")
+        self.update_status(
+            job,
+            "cancelled" if reason != "deadline" else "partial",
+            error=f"Pipeline stopped ({reason}); returning partial results"
+        )
 
-    async def _execute_pipeline(self, query: str):
+    async def _execute_pipeline(self, job: JobContext, depth: int = SEARCH_DEPTH, incremental: bool = False):
         """Execute all pipeline steps"""
+        query = job.query
+        results = job.results
         
-        # Step 1: Scrape data
-        scrape_results = await self.scrape_data(query)
-        analysis_results["scrape_results"] = scrape_results
-        
-        # Step 2: Clean data  
-        cleaned_data = await self.clean_data(scrape_results)
-        analysis_results["cleaned_data"] = cleaned_data
+        # Steps 1-2: Scrape data, cleaning each page while later pages download
+        sources: List[SearchResult] = []
+        documents: List[str] = []
+        results["sources"] = sources
+        results["cleaned_documents"] = documents
+        downstream_seconds = 0.0
+        # Re-runs of a tracked query reuse the analysis of unchanged sources
+        run = None
+        if incremental:
+            run = IncrementalRun(get_incremental_store().get(query), self.preprocess_text)
+        pages = self.scrape_data(query, job, depth)
+        try:
+            with job.stage("scrape"):
+                async for page in pages:
+                    sources.extend(page)
+                    clean_start = time.perf_counter()
+                    with job.stage("clean"):
+                        documents.extend(await self.clean_data(page, job, run))
+                    downstream_seconds += time.perf_counter() - clean_start
+        finally:
+            # Cancels outstanding page requests if the job stops early
+            await pages.aclose()
+        job.stage_done("scrape")
+        job.stage_done("clean")
         
+        downstream_start = time.perf_counter()
+
         # Step 3: EDA
-        eda_output = await self.perform_eda(cleaned_data)
-        analysis_results["eda_output"] = eda_output
+        with job.stage("eda"):
+            eda_stats, keywords = await self.perform_eda(documents, job, run)
+        results["eda_stats"] = eda_stats
+        results["eda_output"] = render_eda_markdown(eda_stats, keywords, documents[0] if documents else "")
+        job.stage_done("eda")
         
         # Step 4: Train model
-        model_info = await self.train_model(eda_output)
-        analysis_results["model_info"] = model_info
+        with job.stage("train"):
+            model_info = await self.train_model(documents, job)
+        results["model_info"] = model_info
+        job.stage_done("train")
+
+        dedup_stats = results.get("dedup")
+        if dedup_stats:
+            dedup_stats["estimated_seconds_saved"] = estimate_time_saved(
+                dedup_stats, downstream_seconds + time.perf_counter() - downstream_start
+            )
         
         # Step 5: Generate final answer
-        final_answer = await self.generate_final_answer(query)
-        analysis_results["final_answer"] = final_answer
+        with job.stage("report"):
+            final_answer = await self.generate_final_answer(query, job)
+        results["final_answer"] = final_answer
+        job.stage_done("report")
+
+    def get_job(self, task_id: Optional[str] = None) -> Optional[JobContext]:
+        """Look up a job by id, or the most recent one"""
+        return self.supervisor.get(task_id)
+
+    def cancel_job(self, task_id: str) -> bool:
+        """Cancel a queued or running job by id, on whichever worker runs it"""
+        request = self.admission.remove(task_id)
+        if request is not None:
+            self._cancel_queued(request, "cancelled")
+            return True
+        return self.supervisor.cancel(task_id)
 
-    def stop_pipeline(self):
-        """Stop the pipeline"""
-        self.is_running = False
+    def stop_pipeline(self, reason: str = "stopped"):
+        """Drop queued jobs and stop all running ones"""
+        for request in self.admission.clear():
+            self._cancel_queued(request, reason)
+        self.supervisor.cancel_all(reason)
 
 # Global pipeline runner instance
 pipeline_runner = None
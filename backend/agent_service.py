@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from uagents import Bureau, Model
+from uagents.crypto import Identity
+from uagents.dispatch import dispatcher
+
+import agents
+from agent_client import AGENT_SERVICE_SOCKET, MAX_LINE_BYTES, AgentServiceClient, AgentServiceError
+from data_schemas import QueryMessage
+from job_control import new_task_id
+
+logger = logging.getLogger(__name__)
+
+# Agent Service Configuration
+# The Bureau's own envelope server; kept off 8000, where the FastAPI server listens
+AGENT_BUREAU_PORT = int(os.getenv("AGENT_BUREAU_PORT", "8001"))
+AGENT_SERVICE_MAX_JOBS = int(os.getenv("AGENT_SERVICE_MAX_JOBS", "32"))
+AGENT_SERVICE_JOB_TIMEOUT = float(os.getenv("AGENT_SERVICE_JOB_TIMEOUT", "300"))
+AGENT_SERVICE_KEEP_JOBS = int(os.getenv("AGENT_SERVICE_KEEP_JOBS", "200"))
+AGENT_SERVICE_SWEEP_SECONDS = 5
+
+
+class AgentService:
+    """Keeps the agent Bureau resident and injects queries into prompt_agent at runtime.
+
+    Each query becomes a job whose id travels in every message, so many jobs
+    move through the agent graph at once. Jobs are submitted over a local
+    socket, one JSON request per line: ``{"op": "submit", "query": "..."}``,
+    ``{"op": "status" | "wait", "job_id": "..."}`` or ``{"op": "stats"}``;
+    each is answered by a line ``{"ok": true, "result": ...}`` or
+    ``{"ok": false, "error": "...", "code": "..."}``.
+    """
+
+    def __init__(self, socket_path: str = AGENT_SERVICE_SOCKET, max_jobs: int = AGENT_SERVICE_MAX_JOBS,
+                 job_timeout: float = AGENT_SERVICE_JOB_TIMEOUT, keep_jobs: int = AGENT_SERVICE_KEEP_JOBS):
+        self.socket_path = socket_path
+        self.max_jobs = max_jobs
+        self.job_timeout = job_timeout
+        self.keep_jobs = keep_jobs
+        # Injected messages need a sender; agent addresses pass the signed-handler check
+        self.identity = Identity.generate()
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._done: Dict[str, asyncio.Event] = {}
+        self.counts = {"submitted": 0, "completed": 0, "failed": 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        agents.job_listeners.append(self._job_finished)
+
+    def running(self) -> int:
+        return len(self._done)
+
+    async def submit(self, query: str) -> Dict[str, Any]:
+        query = query.strip()
+        if not query:
+            raise AgentServiceError("Query cannot be empty")
+        if self.running() >= self.max_jobs:
+            raise AgentServiceError(f"{self.max_jobs} analyses already in flight", "busy")
+
+        job_id = new_task_id()
+        record = {
+            "job_id": job_id,
+            "query": query,
+            "status": "running",
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "processing_time": None,
+            "error": None,
+            "report": None,
+        }
+        self.jobs[job_id] = record
+        self._done[job_id] = asyncio.Event()
+        self.counts["submitted"] += 1
+        self._trim()
+
+        message = QueryMessage(query=query, job_id=job_id)
+        await dispatcher.dispatch(self.identity.address, agents.prompt_agent.address,
+                                  Model.build_schema_digest(message), message.json(), uuid.uuid4())
+        logger.info(f"[service] Submitted {job_id} ({self.running()} in flight)")
+        return record
+
+    def _finish(self, job_id: str, **fields):
+        record = self.jobs[job_id]
+        record.update(fields, finished_at=time.time())
+        record["processing_time"] = record["finished_at"] - record["submitted_at"]
+        self.counts[record["status"]] += 1
+        self._done.pop(job_id).set()
+
+    def _job_finished(self, job_id: str, state: Dict[str, Any]):
+        if job_id not in self._done:
+            return
+        self._finish(
+            job_id,
+            status="completed",
+            report=state["report"],
+            final_answer=state["final_answer"],
+            model_info=state["model_info"],
+            data_sources=len(state["sources"]),
+        )
+        logger.info(f"[service] Completed {job_id} in {self.jobs[job_id]['processing_time']:.2f}s")
+
+    async def _sweep(self):
+        # A job whose message was lost or whose handler failed never reaches the report agent
+        while True:
+            await asyncio.sleep(AGENT_SERVICE_SWEEP_SECONDS)
+            deadline = time.time() - self.job_timeout
+            for job_id in [job_id for job_id in self._done if self.jobs[job_id]["submitted_at"] < deadline]:
+                error = f"No report after {self.job_timeout:.0f}s"
+                agents.pipeline_jobs.pop(job_id, None)
+                pipeline_span = agents.pipeline_spans.pop(job_id, agents.NOOP_SPAN)
+                pipeline_span.set_error(TimeoutError(error))
+                pipeline_span.end()
+                self._finish(job_id, status="failed", error=error)
+                logger.warning(f"[service] {job_id} failed: {error}")
+
+    def _trim(self):
+        """Forget the oldest finished jobs beyond ``keep_jobs``"""
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.keep_jobs:
+                break
+            if job_id not in self._done:
+                del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        record = self.jobs.get(job_id)
+        if record is None:
+            raise AgentServiceError("Unknown job id", "not_found")
+        return record
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """The job's record once it has finished, or as it stands after ``timeout`` seconds"""
+        record = self.get(job_id)
+        done = self._done.get(job_id)
+        if done is not None:
+            try:
+                await asyncio.wait_for(done.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            self.counts,
+            running=self.running(),
+            max_jobs=self.max_jobs,
+            agent_jobs=len(agents.pipeline_jobs) - 1,
+            socket=self.socket_path,
+        )
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "submit":
+            record = await self.submit(str(request.get("query", "")))
+            if request.get("wait"):
+                record = await self.wait(record["job_id"], request.get("timeout"))
+            return record
+        if op == "status":
+            return self.get(str(request.get("job_id")))
+        if op == "wait":
+            return await self.wait(str(request.get("job_id")), request.get("timeout"))
+        if op == "stats":
+            return self.stats()
+        raise AgentServiceError(f"Unknown op {op!r}")
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = {"ok": True, "result": await self.handle(json.loads(line))}
+                except AgentServiceError as e:
+                    response = {"ok": False, "error": str(e), "code": e.code}
+                except (ValueError, AttributeError) as e:
+                    response = {"ok": False, "error": f"Bad request: {e}", "code": "bad_request"}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _start(self, ctx):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path,
+                                                       limit=MAX_LINE_BYTES)
+        os.chmod(self.socket_path, 0o600)
+        self._sweeper = asyncio.get_running_loop().create_task(self._sweep())
+        logger.info(f"[service] Accepting queries on {self.socket_path}")
+
+    def run(self):
+        """Start the agents once and serve queries until interrupted"""
+        agents.setup_ai_tools()
+        bureau = Bureau(port=AGENT_BUREAU_PORT)
+        for agent in (agents.prompt_agent, agents.scraper_agent, agents.data_cleaning_agent, agents.eda_agent,
+                      agents.model_training_agent, agents.report_agent):
+            bureau.add(agent)
+        # Runs on the Bureau's loop once the agents have started
+        agents.prompt_agent.on_event("startup")(self._start)
+        logger.info("Starting agent service...")
+        try:
+            bureau.run()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Long-lived agent service")
+    parser.add_argument("--socket", default=AGENT_SERVICE_SOCKET)
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="run the agents and accept queries (default)")
+    submit = commands.add_parser("submit", help="submit a query to a running service")
+    submit.add_argument("query")
+    submit.add_argument("--wait", action="store_true", help="wait for the report")
+    submit.add_argument("--timeout", type=float)
+    status = commands.add_parser("status", help="show a job")
+    status.add_argument("job_id")
+    commands.add_parser("stats", help="show service counters")
+    args = parser.parse_args()
+
+    if args.command in (None, "serve"):
+        AgentService(args.socket).run()
+    else:
+        client = AgentServiceClient(args.socket)
+        if args.command == "submit":
+            result = asyncio.run(client.submit(args.query, args.wait, args.timeout))
+        elif args.command == "status":
+            result = asyncio.run(client.status(args.job_id))
+        else:
+            result = asyncio.run(client.stats())
+        report = result.pop("report", None)
+        print(json.dumps(result, indent=2))
+        if report:
+            print(report)
@@ -0,0 +1,186 @@
+import asyncio
+import heapq
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Corpus Processing Configuration
+CORPUS_WORKERS = int(os.getenv("CORPUS_WORKERS", str(os.cpu_count() or 2)))
+# Corpora smaller than this are processed in the calling thread; pickling
+# them to worker processes would cost more than it saves
+CORPUS_PARALLEL_MIN_CHARS = int(os.getenv("CORPUS_PARALLEL_MIN_CHARS", str(256 * 1024)))
+CORPUS_MIN_SHARD_CHARS = int(os.getenv("CORPUS_MIN_SHARD_CHARS", str(64 * 1024)))
+CORPUS_SHARDS_PER_WORKER = 4
+CORPUS_MP_START = os.getenv("CORPUS_MP_START", "spawn")
+
+_TAG_RE = re.compile(r"<.*?>")
+_NON_TEXT_RE = re.compile(r"[^a-zA-Z0-9\s:]")
+_SPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\b[A-Z][a-z]+\b")
+_ORG_RE = re.compile(r"\b[A-Z][a-zA-Z]* (?:Inc|Corp|Company|Technologies|Ltd)\b")
+_LOC_RE = re.compile(r"(?:in|at|from|to) ([A-Z][a-zA-Z]+)")
+_MISC_RE = re.compile(r"\b[A-Z][a-zA-Z]{2,}\b")
+
+
+def clean_text(text: str) -> str:
+    """Strip markup and punctuation and collapse whitespace"""
+    text = _TAG_RE.sub("", text)
+    text = _NON_TEXT_RE.sub("", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def most_common(counter: Counter, n: int, excluded=frozenset()) -> List[str]:
+    """The ``n`` most frequent terms; ties rank alphabetically, whatever order the counts were built in"""
+    items = ((term, count) for term, count in counter.items() if term not in excluded)
+    return [term for term, _ in heapq.nsmallest(n, items, key=lambda item: (-item[1], item[0]))]
+
+
+class EntityCounts:
+    """Keyword and named-entity frequencies; partial counts from shards are merged with ``merge``"""
+
+    __slots__ = ("keywords", "orgs", "locs", "misc")
+
+    def __init__(self):
+        self.keywords: Counter = Counter()
+        self.orgs: Counter = Counter()
+        self.locs: Counter = Counter()
+        self.misc: Counter = Counter()
+
+    def add(self, text: str):
+        self.keywords.update(w for w in _WORD_RE.findall(text) if len(w) > 3)
+        self.orgs.update(_ORG_RE.findall(text))
+        self.locs.update(_LOC_RE.findall(text))
+        self.misc.update(_MISC_RE.findall(text))
+        return self
+
+    def merge(self, other: "EntityCounts"):
+        self.keywords.update(other.keywords)
+        self.orgs.update(other.orgs)
+        self.locs.update(other.locs)
+        self.misc.update(other.misc)
+        return self
+
+    def subtract(self, other: "EntityCounts"):
+        """Undo ``merge(other)``; terms left with no count are dropped"""
+        for mine, theirs in ((self.keywords, other.keywords), (self.orgs, other.orgs),
+                             (self.locs, other.locs), (self.misc, other.misc)):
+            for term, count in theirs.items():
+                remaining = mine[term] - count
+                if remaining > 0:
+                    mine[term] = remaining
+                else:
+                    mine.pop(term, None)
+        return self
+
+    def to_keywords(self) -> Dict[str, Any]:
+        """The most frequent keywords and entities, shaped like extract_keywords output"""
+        excluded = set(self.orgs) | set(self.locs)
+        return {
+            "Keywords": most_common(self.keywords, 15),
+            "Named Entities": {
+                "ORG": most_common(self.orgs, 10),
+                "LOC": most_common(self.locs, 10),
+                "MISC": most_common(self.misc, 10, excluded),
+            },
+        }
+
+
+def process_shard(texts: List[str]) -> Tuple[List[str], EntityCounts]:
+    """Clean each document and count its entities (runs in a worker process)"""
+    counts = EntityCounts()
+    documents = []
+    for text in texts:
+        document = clean_text(text)
+        counts.add(document)
+        documents.append(document)
+    return documents, counts
+
+
+def plan_shards(lengths: List[int], workers: int, min_chars: int = CORPUS_MIN_SHARD_CHARS) -> List[Tuple[int, int]]:
+    """Split documents into contiguous (start, end) ranges of roughly equal character size.
+
+    Aims for a few shards per worker so a shard of long documents does not
+    leave the other workers idle; a document longer than the target is a shard of its own.
+    """
+    total = sum(lengths)
+    target = max(min_chars, total // max(1, workers * CORPUS_SHARDS_PER_WORKER))
+    shards = []
+    start = size = 0
+    for i, length in enumerate(lengths):
+        if size and size + length > target:
+            shards.append((start, i))
+            start, size = i, 0
+        size += length
+    if start < len(lengths):
+        shards.append((start, len(lengths)))
+    return shards
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Spawned, not forked: the server process runs threads and holds locks
+        _process_pool = ProcessPoolExecutor(CORPUS_WORKERS, mp_context=multiprocessing.get_context(CORPUS_MP_START))
+    return _process_pool
+
+
+def _reduce(texts: List[str], shards: List[Tuple[int, int]], outputs, start: float,
+            workers: int) -> Tuple[List[str], EntityCounts, Dict[str, Any]]:
+    documents: List[str] = []
+    counts = EntityCounts()
+    # Shards are contiguous and outputs come back in submission order
+    for shard_documents, shard_counts in outputs:
+        documents.extend(shard_documents)
+        counts.merge(shard_counts)
+    stats = {
+        "documents": len(texts),
+        "characters": sum(map(len, texts)),
+        "shards": len(shards),
+        "workers": workers,
+        "seconds": time.perf_counter() - start,
+    }
+    return documents, counts, stats
+
+
+def should_parallelize(texts: List[str], workers: int = CORPUS_WORKERS) -> bool:
+    return workers > 1 and sum(map(len, texts)) >= CORPUS_PARALLEL_MIN_CHARS
+
+
+def process_corpus(texts: List[str], executor: Optional[Executor] = None,
+                   workers: int = CORPUS_WORKERS) -> Tuple[List[str], EntityCounts, Dict[str, Any]]:
+    """Clean documents and count their entities, across processes for large corpora.
+
+    Returns the cleaned documents in input order, the merged counts and run stats.
+    An explicit ``executor`` is always used (e.g. to benchmark pool sizes).
+    """
+    start = time.perf_counter()
+    lengths = [len(text) for text in texts]
+    if executor is None and not should_parallelize(texts, workers):
+        return _reduce(texts, [(0, len(texts))], [process_shard(texts)], start, 1)
+    shards = plan_shards(lengths, workers)
+    pool = executor or get_process_pool()
+    outputs = pool.map(process_shard, [texts[a:b] for a, b in shards])
+    return _reduce(texts, shards, outputs, start, workers)
+
+
+async def process_corpus_async(texts: List[str],
+                               workers: int = CORPUS_WORKERS) -> Tuple[List[str], EntityCounts, Dict[str, Any]]:
+    """process_corpus on the process pool, awaited from the event loop"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    lengths = [len(text) for text in texts]
+    shards = plan_shards(lengths, workers)
+    pool = get_process_pool()
+    outputs = await asyncio.gather(*(loop.run_in_executor(pool, process_shard, texts[a:b]) for a, b in shards))
+    logger.info(f"[corpus] {len(texts)} documents in {len(shards)} shards on {workers} processes")
+    return _reduce(texts, shards, outputs, start, workers)
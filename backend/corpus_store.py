@@ -0,0 +1,436 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from incremental import normalize_query
+from records import SearchResult
+
+logger = logging.getLogger(__name__)
+
+# Corpus Store Configuration
+CORPUS_STORE = os.getenv("CORPUS_STORE", "on")  # on or off
+CORPUS_STORE_DIR = os.getenv("CORPUS_STORE_DIR", os.path.join(os.path.dirname(__file__), ".corpus"))
+# Compact once this many heap bytes were appended since the last compaction
+CORPUS_COMPACT_BYTES = int(os.getenv("CORPUS_COMPACT_BYTES", str(256 * 1024 * 1024)))
+CORPUS_RETENTION_DAYS = float(os.getenv("CORPUS_RETENTION_DAYS", "0"))  # 0 keeps every job
+CORPUS_SCAN_ROWS = 65536
+
+STRING_FIELDS = ("title", "url", "snippet", "text")
+# Every column is a flat little-endian array in its own file, memory-mapped by
+# readers. Strings are (offset, length) pairs into one UTF-8 heap.
+TABLES = {
+    "records": {
+        "job": np.uint32,
+        "query": np.uint32,
+        **{f"{field}_off": np.uint64 for field in STRING_FIELDS},
+        **{f"{field}_len": np.uint32 for field in STRING_FIELDS},
+    },
+    # Records of a job are contiguous: rows [start, start + count)
+    "jobs": {"start": np.uint64, "count": np.uint32, "query": np.uint32, "time": np.float64,
+             "id_off": np.uint64, "id_len": np.uint32},
+    "queries": {"off": np.uint64, "len": np.uint32},
+}
+# Shorter strings are stored again rather than interned: the index entry would cost more
+MIN_INTERN_BYTES = 32
+
+
+def _column_path(directory: str, table: str, column: str) -> str:
+    return os.path.join(directory, f"{table}.{column}")
+
+
+def _append_file(path: str, offset: int, data: bytes):
+    """Write ``data`` at ``offset``, dropping anything a failed writer left past it"""
+    with open(path, "ab") as f:
+        f.truncate(offset)
+        f.write(data)
+
+
+class HeapWriter:
+    """Collects strings for the heap and assigns their offsets; optionally stores each distinct string once"""
+
+    def __init__(self, start: int, intern: bool = False):
+        self.position = start
+        self.chunks: List[bytes] = []
+        self._interned: Optional[Dict[bytes, int]] = {} if intern else None
+
+    def put(self, data: bytes) -> int:
+        if self._interned is not None and len(data) >= MIN_INTERN_BYTES:
+            key = hashlib.blake2b(data, digest_size=16).digest()
+            offset = self._interned.get(key)
+            if offset is not None:
+                return offset
+            self._interned[key] = self.position
+        offset = self.position
+        self.chunks.append(data)
+        self.position += len(data)
+        return offset
+
+    def put_many(self, values: Iterable[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+        values = list(values)
+        offsets = np.fromiter((self.put(value) for value in values), dtype=np.uint64, count=len(values))
+        lengths = np.fromiter(map(len, values), dtype=np.uint32, count=len(values))
+        return offsets, lengths
+
+    def flush(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class CorpusSnapshot:
+    """A consistent read-only view of the store.
+
+    Columns are memory-mapped, so scanning or slicing them never loads the
+    corpus into Python objects; strings are decoded only when asked for.
+    Appends made after the snapshot was taken are not visible. Every file is
+    mapped when the snapshot is taken, so a compaction that removes its
+    generation afterwards does not disturb it: unlinked files stay readable
+    while mapped.
+    """
+
+    def __init__(self, directory: str, manifest: Dict[str, Any]):
+        self.directory = directory
+        self.manifest = manifest
+        self._job_index: Optional[Dict[str, int]] = None
+        self._query_index: Optional[Dict[str, int]] = None
+        self._maps: Dict[Tuple[str, str], np.ndarray] = {
+            (table, name): self._map(_column_path(directory, table, name), dtype, manifest[table])
+            for table, columns in TABLES.items() for name, dtype in columns.items()
+        }
+        self._heap = self._map(os.path.join(directory, "heap"), np.uint8, manifest["heap"])
+
+    @staticmethod
+    def _map(path: str, dtype, count: int) -> np.ndarray:
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count,)) if count else np.zeros(0, dtype=dtype)
+
+    def __len__(self) -> int:
+        return self.manifest["records"]
+
+    def column(self, name: str, table: str = "records") -> np.ndarray:
+        """A whole column as a read-only memory-mapped array"""
+        return self._maps[(table, name)]
+
+    @property
+    def heap(self) -> np.ndarray:
+        return self._heap
+
+    def raw(self, field: str, row: int, table: str = "records") -> memoryview:
+        """Bytes of one string, without copying them out of the heap.
+
+        ``field`` names the column pair ``{field}_off``/``{field}_len``; query
+        strings, the only ones in their table, use ``off``/``len`` (field "").
+        """
+        prefix = f"{field}_" if field else ""
+        offset = int(self.column(f"{prefix}off", table)[row])
+        return memoryview(self.heap[offset:offset + int(self.column(f"{prefix}len", table)[row])])
+
+    def string(self, field: str, row: int, table: str = "records") -> str:
+        return str(self.raw(field, row, table), "utf-8")
+
+    def strings(self, field: str, rows: Optional[Iterable[int]] = None) -> Iterator[str]:
+        """Decode a string field lazily, for all records or the given rows (e.g. a slice or index array)"""
+        offsets, lengths, heap = self.column(f"{field}_off"), self.column(f"{field}_len"), self.heap
+        if rows is None:
+            rows = range(len(self))
+        elif isinstance(rows, slice):
+            rows = range(*rows.indices(len(self)))
+        for row in rows:
+            offset = int(offsets[row])
+            yield heap[offset:offset + int(lengths[row])].tobytes().decode("utf-8")
+
+    def scan(self, columns: Iterable[str], batch_rows: int = CORPUS_SCAN_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+        """Yield consecutive batches of record columns as memory-mapped views"""
+        maps = {name: self.column(name) for name in columns}
+        for start in range(0, len(self), batch_rows):
+            yield {name: column[start:start + batch_rows] for name, column in maps.items()}
+
+    def job_rows(self, job_id: str) -> slice:
+        """Records of one job"""
+        if self._job_index is None:
+            self._job_index = {self.string("id", job, "jobs"): job for job in range(self.manifest["jobs"])}
+        job = self._job_index.get(job_id)
+        if job is None:
+            return slice(0, 0)
+        start = int(self.column("start", "jobs")[job])
+        return slice(start, start + int(self.column("count", "jobs")[job]))
+
+    def query_id(self, query: str) -> Optional[int]:
+        if self._query_index is None:
+            self._query_index = {self.string("", query_id, "queries"): query_id
+                                 for query_id in range(self.manifest["queries"])}
+        return self._query_index.get(normalize_query(query))
+
+    def query_rows(self, query: str) -> np.ndarray:
+        """Record indices of every job run for ``query`` (normalized as for tracked queries)"""
+        query_id = self.query_id(query)
+        if query_id is None:
+            return np.zeros(0, dtype=np.int64)
+        jobs = np.flatnonzero(self.column("query", "jobs") == query_id)
+        starts = self.column("start", "jobs")[jobs].astype(np.int64)
+        counts = self.column("count", "jobs")[jobs].astype(np.int64)
+        # Concatenated ranges [start, start + count) without a Python loop
+        ends = np.cumsum(counts)
+        return np.arange(ends[-1] if ends.size else 0) + np.repeat(starts - (ends - counts), counts)
+
+
+class CorpusStore:
+    """Append-only columnar history of every job's sources and cleaned text.
+
+    Files live in a generation directory named by ``manifest.json``, which is
+    replaced atomically after each append, so readers only ever see whole
+    jobs. Appends from any process are serialized by a file lock. Compaction
+    rewrites live jobs into a new generation in the background, storing
+    repeated strings (sources seen by many runs of a query) once and dropping
+    jobs past the retention window.
+    """
+
+    def __init__(self, root: str = CORPUS_STORE_DIR, compact_bytes: int = CORPUS_COMPACT_BYTES,
+                 retention_days: float = CORPUS_RETENTION_DAYS):
+        self.root = root
+        self.compact_bytes = compact_bytes
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+        # Normalized query -> id, valid for the (generation, query count) it was read at
+        self._queries: Dict[str, int] = {}
+        self._queries_at: Tuple[str, int] = ("", 0)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, "manifest.json")
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"generation": "gen-000000", "records": 0, "jobs": 0, "queries": 0, "heap": 0,
+                    "compactions": 0, "heap_since_compaction": 0}
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self._manifest_path())
+
+    @contextlib.contextmanager
+    def _locked(self, name: str = "write", blocking: bool = True):
+        """Hold a lock shared by every process using the store; yields False if not ``blocking`` and held"""
+        with open(os.path.join(self.root, f"{name}.lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _generation_dir(self, generation: str) -> str:
+        return os.path.join(self.root, generation)
+
+    def snapshot(self, attempts: int = 3) -> CorpusSnapshot:
+        for attempt in range(attempts):
+            manifest = self._read_manifest()
+            try:
+                return CorpusSnapshot(self._generation_dir(manifest["generation"]), manifest)
+            except FileNotFoundError:
+                # A compaction removed the generation between reading the manifest and mapping it
+                if attempt == attempts - 1:
+                    raise
+
+    def _query_id(self, directory: str, manifest: Dict[str, Any], key: str) -> Optional[int]:
+        """Id of a normalized query, or None if it was never stored"""
+        if self._queries_at != (manifest["generation"], manifest["queries"]):
+            snapshot = CorpusSnapshot(directory, manifest)
+            self._queries = {snapshot.string("", query_id, "queries"): query_id
+                             for query_id in range(manifest["queries"])}
+            self._queries_at = (manifest["generation"], manifest["queries"])
+        return self._queries.get(key)
+
+    @staticmethod
+    def _append_rows(directory: str, table: str, start: int, columns: Dict[str, np.ndarray]):
+        for name, dtype in TABLES[table].items():
+            values = np.ascontiguousarray(columns[name], dtype=dtype)
+            _append_file(_column_path(directory, table, name), start * np.dtype(dtype).itemsize,
+                         values.tobytes())
+
+    def append(self, job_id: str, query: str, results: List[SearchResult], texts: List[str]) -> int:
+        """Record a job's sources with their cleaned text; returns the number of records stored"""
+        if len(results) != len(texts):
+            raise ValueError(f"{len(results)} sources but {len(texts)} cleaned texts")
+        with self._lock, self._locked():
+            manifest = self._read_manifest()
+            directory = self._generation_dir(manifest["generation"])
+            os.makedirs(directory, exist_ok=True)
+            heap = HeapWriter(manifest["heap"])
+            key = normalize_query(query)
+            query_id = self._query_id(directory, manifest, key)
+            new_query = None
+            if query_id is None:
+                query_id = manifest["queries"]
+                new_query = {"off": [heap.put(key.encode("utf-8"))], "len": [len(key.encode("utf-8"))]}
+            count = len(results)
+            columns = {
+                "job": np.full(count, manifest["jobs"]),
+                "query": np.full(count, query_id),
+            }
+            for field, values in (("title", [result.title for result in results]),
+                                  ("url", [result.url for result in results]),
+                                  ("snippet", [result.snippet for result in results]),
+                                  ("text", texts)):
+                columns[f"{field}_off"], columns[f"{field}_len"] = heap.put_many(
+                    value.encode("utf-8") for value in values
+                )
+            job_id_bytes = job_id.encode("utf-8")
+            job = {"start": [manifest["records"]], "count": [count], "query": [query_id], "time": [time.time()],
+                   "id_off": [heap.put(job_id_bytes)], "id_len": [len(job_id_bytes)]}
+            data = heap.flush()
+
+            _append_file(os.path.join(directory, "heap"), manifest["heap"], data)
+            self._append_rows(directory, "records", manifest["records"], columns)
+            self._append_rows(directory, "jobs", manifest["jobs"], job)
+            if new_query is not None:
+                self._append_rows(directory, "queries", manifest["queries"], new_query)
+                manifest["queries"] += 1
+                self._queries[key] = query_id
+                self._queries_at = (manifest["generation"], manifest["queries"])
+            manifest["records"] += count
+            manifest["jobs"] += 1
+            manifest["heap"] += len(data)
+            manifest["heap_since_compaction"] += len(data)
+            # Readers see the job only once every column holds it
+            self._write_manifest(manifest)
+        if manifest["heap_since_compaction"] >= self.compact_bytes:
+            self.compact_in_background()
+        return count
+
+    def compact_in_background(self) -> bool:
+        """Start a compaction thread unless one is already running here; returns True if started"""
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return False
+            self._compactor = threading.Thread(target=self._compact_logged, name="corpus-compaction", daemon=True)
+            self._compactor.start()
+            return True
+
+    def _compact_logged(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logger.error(f"[corpus] Compaction failed: {e}")
+
+    def _copy_jobs(self, source: CorpusSnapshot, jobs: Iterable[int], directory: str, counts: Dict[str, int],
+                   heap: HeapWriter):
+        """Append ``jobs`` of ``source`` to the generation in ``directory``, interning their strings"""
+        starts, job_counts = source.column("start", "jobs"), source.column("count", "jobs")
+        for job in jobs:
+            start, count = int(starts[job]), int(job_counts[job])
+            rows = slice(start, start + count)
+            columns = {
+                "job": np.full(count, counts["jobs"]),
+                "query": source.column("query")[rows],
+            }
+            for field in STRING_FIELDS:
+                offsets = source.column(f"{field}_off")[rows]
+                lengths = source.column(f"{field}_len")[rows]
+                columns[f"{field}_off"], columns[f"{field}_len"] = heap.put_many(
+                    source.heap[int(offset):int(offset) + int(length)].tobytes()
+                    for offset, length in zip(offsets, lengths)
+                )
+            job_id = source.raw("id", job, "jobs").tobytes()
+            row = {"start": [counts["records"]], "count": [count], "query": [source.column("query", "jobs")[job]],
+                   "time": [source.column("time", "jobs")[job]], "id_off": [heap.put(job_id)], "id_len": [len(job_id)]}
+            data = heap.flush()
+            _append_file(os.path.join(directory, "heap"), counts["heap"], data)
+            self._append_rows(directory, "records", counts["records"], columns)
+            self._append_rows(directory, "jobs", counts["jobs"], row)
+            counts["records"] += count
+            counts["jobs"] += 1
+            counts["heap"] += len(data)
+
+    def compact(self) -> Optional[Dict[str, Any]]:
+        """Rewrite the store into a new generation; returns its stats, or None if another compaction runs"""
+        with self._locked("compact", blocking=False) as acquired:
+            if not acquired:
+                return None
+            start = time.perf_counter()
+            source = self.snapshot()
+            before = dict(source.manifest)
+            generation = f"gen-{int(before['generation'].split('-')[1]) + 1:06d}"
+            directory = self._generation_dir(generation)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+
+            heap = HeapWriter(0, intern=True)
+            counts = {"records": 0, "jobs": 0, "heap": 0}
+            # Query ids are kept, so query columns are copied as they are
+            query_offsets, query_lengths = heap.put_many(
+                source.raw("", query_id, "queries").tobytes() for query_id in range(before["queries"])
+            )
+            _append_file(os.path.join(directory, "heap"), 0, heap.flush())
+            counts["heap"] = heap.position
+            self._append_rows(directory, "queries", 0, {"off": query_offsets, "len": query_lengths})
+
+            job_times = source.column("time", "jobs")
+            live = np.arange(before["jobs"])
+            if self.retention_days > 0:
+                live = np.flatnonzero(job_times >= time.time() - self.retention_days * 86400)
+            self._copy_jobs(source, live, directory, counts, heap)
+
+            with self._lock, self._locked():
+                current = self.snapshot()
+                # Jobs appended while the bulk was copied
+                self._copy_jobs(current, range(before["jobs"], current.manifest["jobs"]), directory, counts, heap)
+                if current.manifest["queries"] > before["queries"]:
+                    offsets, lengths = heap.put_many(
+                        current.raw("", query_id, "queries").tobytes()
+                        for query_id in range(before["queries"], current.manifest["queries"])
+                    )
+                    _append_file(os.path.join(directory, "heap"), counts["heap"], heap.flush())
+                    counts["heap"] = heap.position
+                    self._append_rows(directory, "queries", before["queries"], {"off": offsets, "len": lengths})
+                manifest = dict(counts, generation=generation, queries=current.manifest["queries"],
+                                compactions=before["compactions"] + 1, heap_since_compaction=0)
+                self._write_manifest(manifest)
+            # Open snapshots keep the old files mapped; unlinking does not disturb them
+            shutil.rmtree(self._generation_dir(before["generation"]), ignore_errors=True)
+
+        stats = {
+            "generation": generation,
+            "jobs_before": current.manifest["jobs"],
+            "jobs_after": manifest["jobs"],
+            "heap_bytes_before": current.manifest["heap"],
+            "heap_bytes_after": manifest["heap"],
+            "seconds": time.perf_counter() - start,
+        }
+        logger.info(f"[corpus] Compacted to {generation}: {stats['jobs_after']} jobs, heap "
+                    f"{stats['heap_bytes_before']:,} -> {stats['heap_bytes_after']:,} bytes in {stats['seconds']:.2f}s")
+        return stats
+
+    def stats(self) -> Dict[str, Any]:
+        manifest = self._read_manifest()
+        directory = self._generation_dir(manifest["generation"])
+        disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory)) if os.path.isdir(directory) else 0
+        return dict(manifest, disk_bytes=disk_bytes, compacting=self._compactor is not None and self._compactor.is_alive())
+
+
+corpus_store = None
+
+
+def get_corpus_store() -> Optional[CorpusStore]:
+    """The shared store, or None when CORPUS_STORE=off"""
+    global corpus_store
+    if corpus_store is None and CORPUS_STORE == "on":
+        corpus_store = CorpusStore()
+    return corpus_store
@@ -1,16 +1,43 @@
+from typing import Any, Dict, List, Optional
 from uagents import Model
 
+# Every message carries the W3C traceparent of the span that sent it (see tracing.py)
+# and the job it belongs to, so many queries can be in flight at once in the
+# agent service; the one-shot run started by main.py is job "".
 class QueryMessage(Model):
     query: str
+    traceparent: Optional[str] = None
+    job_id: str = ""
 
+# Payload fields default to empty so that payload_codec can move them into
+# `packed` (inline compressed data or a blob reference) for large messages.
 class ScrapeResponse(Model):
-    raw_data: str
+    titles: List[str] = []
+    urls: List[str] = []
+    snippets: List[str] = []
+    contents: List[str] = []
+    packed: Optional[str] = None
+    traceparent: Optional[str] = None
+    job_id: str = ""
 
 class CleanResponse(Model):
-    cleaned_data: str
+    urls: List[str] = []
+    documents: List[str] = []
+    keywords: Dict[str, Any] = {}
+    packed: Optional[str] = None
+    traceparent: Optional[str] = None
+    job_id: str = ""
 
 class EDAResponse(Model):
-    eda_output: str
+    eda_output: str = ""
+    keywords: List[str] = []
+    documents: List[str] = []
+    packed: Optional[str] = None
+    traceparent: Optional[str] = None
+    job_id: str = ""
 
 class TrainResponse(Model):
-    model_bytes_b64: str
+    model_bytes_b64: str = ""
+    packed: Optional[str] = None
+    traceparent: Optional[str] = None
+    job_id: str = ""
\ No newline at end of file
@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from records import SearchResult
+
+logger = logging.getLogger(__name__)
+
+# Deduplication Configuration
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.9"))
+DEDUP_HISTORY = os.getenv("DEDUP_HISTORY", "0") == "1"
+DEDUP_MAX_HISTORY = int(os.getenv("DEDUP_MAX_HISTORY", "100000"))
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+# More bands means smaller buckets but shorter band keys; 16 bands of 4 bits
+# still guarantee recall up to a Hamming distance of 15 (similarity ~0.77).
+MAX_BANDS = 16
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _shingles(text: str) -> List[str]:
+    """Split text into overlapping word shingles"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) <= SHINGLE_SIZE:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+
+def simhash(text: str) -> int:
+    """Compute a 64-bit SimHash fingerprint of the text"""
+    shingles = _shingles(text)
+    if not shingles:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)
+    packed = np.packbits(votes > 0, bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+def url_fingerprint(url: str) -> int:
+    """Exact-match fingerprint for results without text: distinct URLs never collide"""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class NearDuplicateIndex:
+    """LSH index over SimHash fingerprints.
+
+    Fingerprints are split into bands; two fingerprints within the Hamming
+    threshold share at least one identical band (pigeonhole), so only the
+    bucket members need an exact distance check instead of every entry.
+    Each entry may carry an owner (the query series that added it), and
+    lookups can ignore the entries of one owner.
+    """
+
+    def __init__(self, similarity: float = DEDUP_SIMILARITY, max_entries: int = DEDUP_MAX_HISTORY):
+        self.similarity = similarity
+        self.max_distance = int(round((1.0 - similarity) * SIMHASH_BITS))
+        self.max_entries = max_entries
+        bands = max(1, min(self.max_distance + 1, MAX_BANDS))
+        width, extra = divmod(SIMHASH_BITS, bands)
+        self._bands: List[Tuple[int, int]] = []
+        shift = 0
+        for i in range(bands):
+            size = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << size) - 1))
+            shift += size
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bands]
+        self._fingerprints: Dict[int, int] = {}
+        self._owners: Dict[int, Optional[str]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._fingerprints)
+
+    def _band_keys(self, fingerprint: int):
+        return [(fingerprint >> shift) & mask for shift, mask in self._bands]
+
+    def find(self, fingerprint: int, exclude_owner: Optional[str] = None) -> Optional[int]:
+        """Return the id of a stored near-duplicate not added by ``exclude_owner``, if any"""
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            for entry_id in bucket.get(key, ()):
+                stored = self._fingerprints.get(entry_id)
+                if (stored is not None and hamming_distance(fingerprint, stored) <= self.max_distance
+                        and (exclude_owner is None or self._owners[entry_id] != exclude_owner)):
+                    return entry_id
+        return None
+
+    def add(self, fingerprint: int, owner: Optional[str] = None) -> int:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._fingerprints[entry_id] = fingerprint
+        self._owners[entry_id] = owner
+        for bucket, key in zip(self._buckets, self._band_keys(fingerprint)):
+            bucket.setdefault(key, []).append(entry_id)
+        if len(self._fingerprints) > self.max_entries:
+            # Evict in chunks so the bucket sweep is amortized
+            self._evict(max(len(self._fingerprints) - self.max_entries, self.max_entries // 10))
+        return entry_id
+
+    def _evict(self, count: int):
+        """Drop the oldest fingerprints and prune them from the buckets"""
+        for entry_id in list(self._fingerprints)[:count]:
+            del self._fingerprints[entry_id]
+            del self._owners[entry_id]
+        for bucket in self._buckets:
+            for key in list(bucket):
+                alive = [e for e in bucket[key] if e in self._fingerprints]
+                if alive:
+                    bucket[key] = alive
+                else:
+                    del bucket[key]
+
+    def check_and_add(self, fingerprint: int) -> bool:
+        """Return True if the fingerprint is a near-duplicate, otherwise index it"""
+        with self._lock:
+            if self.find(fingerprint) is not None:
+                return True
+            self.add(fingerprint)
+            return False
+
+    def check_and_add_foreign(self, fingerprint: int, owner: str) -> bool:
+        """Return True if another owner indexed a near-duplicate; otherwise index it for ``owner``"""
+        with self._lock:
+            if self.find(fingerprint, exclude_owner=owner) is not None:
+                return True
+            if self.find(fingerprint) is None:
+                self.add(fingerprint, owner)
+            return False
+
+
+# History shared by all query series; each entry remembers the series that added it
+_history_index: Optional[NearDuplicateIndex] = None
+_history_lock = threading.Lock()
+
+
+def normalize_series_key(query: str) -> str:
+    return " ".join(_TOKEN_RE.findall(query.lower()))
+
+
+def get_history_index() -> NearDuplicateIndex:
+    global _history_index
+    with _history_lock:
+        if _history_index is None:
+            _history_index = NearDuplicateIndex()
+        return _history_index
+
+
+class ResultDeduplicator:
+    """Drops near-duplicate search results across batches of one run.
+
+    Results are always deduplicated within the run. When DEDUP_HISTORY is
+    enabled and a series key is given, results already seen under another
+    series are dropped as well; a series never suppresses its own results,
+    so re-running a query returns its sources again.
+    """
+
+    def __init__(self, series: Optional[str] = None, similarity: float = DEDUP_SIMILARITY):
+        self.batch_index = NearDuplicateIndex(similarity)
+        self.series = normalize_series_key(series) if series else None
+        self.history = get_history_index() if (series and DEDUP_HISTORY) else None
+        self.stats: Dict[str, Any] = {
+            "input": 0,
+            "kept": 0,
+            "removed": 0,
+            "removed_chars": 0,
+            "kept_chars": 0,
+            "similarity": similarity,
+            "seconds": 0.0,
+        }
+
+    def add(self, results: List[SearchResult]) -> List[SearchResult]:
+        """Return the results of this batch that are not near-duplicates of earlier ones"""
+        start = time.perf_counter()
+        stats = self.stats
+        kept = []
+        for result in results:
+            # URLs are left out on purpose: syndicated copies live on different hosts
+            text = result.text()
+            # Without any text every result would hash to 0; only identical URLs are duplicates then
+            fingerprint = simhash(text) if _shingles(text) else url_fingerprint(result.url)
+            duplicate = self.batch_index.check_and_add(fingerprint)
+            if not duplicate and self.history is not None:
+                duplicate = self.history.check_and_add_foreign(fingerprint, self.series)
+            if duplicate:
+                stats["removed_chars"] += len(text)
+            else:
+                stats["kept_chars"] += len(text)
+                kept.append(result)
+        stats["input"] += len(results)
+        stats["kept"] += len(kept)
+        stats["removed"] = stats["input"] - stats["kept"]
+        stats["seconds"] += time.perf_counter() - start
+        return kept
+
+
+def dedupe_results(results: List[SearchResult], series: Optional[str] = None,
+                   similarity: float = DEDUP_SIMILARITY) -> Tuple[List[SearchResult], Dict[str, Any]]:
+    """Drop near-duplicate search results from one batch"""
+    deduplicator = ResultDeduplicator(series, similarity)
+    kept = deduplicator.add(results)
+    stats = deduplicator.stats
+    if stats["removed"]:
+        logger.info(f"[dedup] Removed {stats['removed']} of {stats['input']} near-duplicate results")
+    return kept, stats
+
+
+def estimate_time_saved(stats: Dict[str, Any], downstream_seconds: float) -> float:
+    """Extrapolate the downstream time the removed results would have cost"""
+    if not stats.get("removed_chars") or not stats.get("kept_chars"):
+        return 0.0
+    return downstream_seconds * stats["removed_chars"] / stats["kept_chars"]
@@ -0,0 +1,166 @@
+import re
+import time
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+TOP_TERMS = 20
+TOP_TERMS_PER_DOC = 5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]{2,}")
+
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can did do does for from had has have he her his how if in into is it its
+just more most my no not of on or our out over she so such than that the their them then there these they
+this to too up us was we were what when where which who why will with you your all also any about after
+before being both each few further here i me only other own same some very title url snippet www http https
+com html
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+def build_term_matrix(documents: List[str]) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    """Build a sparse document-term count matrix and its vocabulary"""
+    tokenized = [tokenize(doc) for doc in documents]
+    lengths = np.fromiter((len(tokens) for tokens in tokenized), dtype=np.int64, count=len(tokenized))
+    vocabulary: Dict[str, int] = {}
+    columns = np.fromiter(
+        (vocabulary.setdefault(token, len(vocabulary)) for token in chain.from_iterable(tokenized)),
+        dtype=np.int64,
+        count=int(lengths.sum()),
+    )
+    rows = np.repeat(np.arange(len(documents)), lengths)
+    counts = sparse.csr_matrix(
+        (np.ones(columns.size, dtype=np.int32), (rows, columns)),
+        shape=(len(documents), len(vocabulary)),
+    )
+    counts.sum_duplicates()
+    return counts, np.array(list(vocabulary), dtype=str)
+
+
+def tfidf(counts: sparse.csr_matrix, df: Optional[np.ndarray] = None) -> sparse.csr_matrix:
+    """Smoothed TF-IDF with L2-normalized rows"""
+    n_docs = counts.shape[0]
+    if df is None:
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+    idf = np.log((1 + n_docs) / (1 + df)) + 1.0
+    weights = counts.astype(np.float64).multiply(idf).tocsr()
+    row_ids = np.repeat(np.arange(n_docs), np.diff(weights.indptr))
+    norms = np.sqrt(np.bincount(row_ids, weights=weights.data ** 2, minlength=n_docs))
+    weights.data /= np.where(norms > 0, norms, 1.0)[row_ids]
+    return weights
+
+
+def alphabetical_ranks(vocabulary: np.ndarray) -> np.ndarray:
+    """Rank of each term in alphabetical order, used to break ties between equal scores.
+
+    Ties then rank the same however the vocabulary is numbered (the
+    incremental path numbers terms differently from a full recompute).
+    """
+    return np.argsort(np.argsort(vocabulary, kind="stable"), kind="stable")
+
+
+def top_terms_per_row(matrix: sparse.csr_matrix, vocabulary: np.ndarray, k: int,
+                      ranks: Optional[np.ndarray] = None) -> List[List[str]]:
+    """Top-k terms of every row, without a Python loop over the rows"""
+    if ranks is None:
+        ranks = alphabetical_ranks(vocabulary)
+    row_ids = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((ranks[matrix.indices], -matrix.data, row_ids))
+    rank = np.arange(order.size) - matrix.indptr[row_ids[order]]
+    selected = order[rank < k]
+    terms = vocabulary[matrix.indices[selected]]
+    bounds = np.searchsorted(row_ids[selected], np.arange(matrix.shape[0] + 1))
+    return [terms[bounds[i]:bounds[i + 1]].tolist() for i in range(matrix.shape[0])]
+
+
+def _describe(values: np.ndarray) -> Dict[str, float]:
+    if values.size == 0:
+        return {"min": 0, "max": 0, "mean": 0.0, "median": 0.0, "std": 0.0}
+    return {
+        "min": int(values.min()),
+        "max": int(values.max()),
+        "mean": float(values.mean()),
+        "median": float(np.median(values)),
+        "std": float(values.std()),
+    }
+
+
+def analyze_corpus(documents: List[str], top_n: int = TOP_TERMS,
+                   top_per_doc: int = TOP_TERMS_PER_DOC) -> Dict[str, Any]:
+    """Compute structured corpus statistics over a list of documents"""
+    start = time.perf_counter()
+    counts, vocabulary = build_term_matrix(documents)
+    char_lengths = np.fromiter((len(doc) for doc in documents), dtype=np.int64, count=len(documents))
+    stats = corpus_stats(counts, vocabulary, char_lengths, top_n=top_n, top_per_doc=top_per_doc)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def corpus_stats(counts: sparse.csr_matrix, vocabulary: np.ndarray, char_lengths: np.ndarray,
+                 term_counts: Optional[np.ndarray] = None, doc_freq: Optional[np.ndarray] = None,
+                 top_n: int = TOP_TERMS, top_per_doc: int = TOP_TERMS_PER_DOC) -> Dict[str, Any]:
+    """Statistics from a document-term count matrix.
+
+    Term counts and document frequencies may be passed in when the caller
+    maintains them incrementally; vocabulary columns with a zero count are ignored.
+    """
+    n_docs = counts.shape[0]
+    token_lengths = np.asarray(counts.sum(axis=1)).ravel()
+    if term_counts is None:
+        term_counts = np.asarray(counts.sum(axis=0)).ravel()
+    if doc_freq is None:
+        doc_freq = np.bincount(counts.indices, minlength=vocabulary.size)
+    ranks = alphabetical_ranks(vocabulary)
+    by_count = np.lexsort((ranks, -term_counts))[:top_n]
+    by_count = by_count[term_counts[by_count] > 0]
+
+    weights = tfidf(counts, doc_freq)
+    mean_tfidf = np.asarray(weights.sum(axis=0)).ravel() / max(n_docs, 1)
+    by_tfidf = np.lexsort((ranks, -mean_tfidf))[:top_n]
+    by_tfidf = by_tfidf[mean_tfidf[by_tfidf] > 0]
+
+    return {
+        "num_documents": n_docs,
+        "total_characters": int(char_lengths.sum()),
+        "total_tokens": int(term_counts.sum()),
+        "vocabulary_size": int(np.count_nonzero(term_counts)),
+        "hapax_terms": int(np.count_nonzero(term_counts == 1)),
+        "document_lengths": {
+            "characters": _describe(char_lengths),
+            "tokens": _describe(token_lengths),
+        },
+        "top_terms": [
+            {"term": str(vocabulary[i]), "count": int(term_counts[i]), "document_frequency": int(doc_freq[i])}
+            for i in by_count
+        ],
+        "top_tfidf_terms": [
+            {"term": str(vocabulary[i]), "score": float(mean_tfidf[i])}
+            for i in by_tfidf
+        ],
+        "top_terms_per_document": top_terms_per_row(weights, vocabulary, top_per_doc, ranks),
+    }
+
+
+def render_eda_markdown(stats: Dict[str, Any], keywords: Dict[str, Any], snippet: str = "") -> str:
+    """Render EDA statistics as the markdown summary shown in reports"""
+    lengths = stats["document_lengths"]["characters"]
+    top_terms = ", ".join(f"{t['term']} ({t['count']})" for t in stats["top_terms"][:10])
+    tfidf_terms = ", ".join(t["term"] for t in stats["top_tfidf_terms"][:10])
+    return f"""## Exploratory Data Analysis
+- Length: {stats['total_characters']} chars
+- Articles: {stats['num_documents']}
+- Avg article length: {lengths['mean']:.0f} chars (min {lengths['min']}, max {lengths['max']})
+- Tokens: {stats['total_tokens']} ({stats['vocabulary_size']} unique)
+- Top terms: {top_terms}
+- Distinctive terms (TF-IDF): {tfidf_terms}
+- Keywords: {', '.join(keywords['Keywords'][:5])}
+- ORGs: {', '.join(keywords['Named Entities']['ORG'][:5])}
+- LOCs: {', '.join(keywords['Named Entities']['LOC'][:5])}
+- MISC: {', '.join(keywords['Named Entities']['MISC'][:5])}
+- Snippet: {snippet[:300]}..."""
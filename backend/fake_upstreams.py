@@ -0,0 +1,168 @@
+"""
+Local stand-ins for Google Custom Search, SerpAPI and Gemini used for load testing.
+
+Each upstream has its own latency, jitter and error rate, set from the
+command line or at runtime through POST /_config. Point the API at it with:
+
+    GOOGLE_CSE_URL=http://127.0.0.1:9100/customsearch/v1
+    SERPAPI_URL=http://127.0.0.1:9100/search
+    GEMINI_API_ENDPOINT=http://127.0.0.1:9100
+
+With --serve-pages, result links point at /pages/... on this server, which
+answers with ETag, Last-Modified and Cache-Control (max-age --page-max-age)
+and with 304 to matching conditional requests; run the API with
+PAGE_FETCH=on to exercise the page cache.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import time
+from email.utils import formatdate
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+app = FastAPI(title="Fake Upstreams")
+
+
+class UpstreamConfig(BaseModel):
+    latency_ms: float = 200
+    jitter_ms: float = 50
+    error_rate: float = 0.0
+    error_status: int = 503
+
+
+upstream_config: Dict[str, UpstreamConfig] = {
+    "cse": UpstreamConfig(),
+    "serpapi": UpstreamConfig(),
+    "gemini": UpstreamConfig(latency_ms=1500, jitter_ms=500),
+    "pages": UpstreamConfig(latency_ms=300, jitter_ms=100),
+}
+request_counts: Dict[str, int] = {name: 0 for name in upstream_config}
+# Result links; set to this server's /pages by --serve-pages
+page_base = "https://example.com"
+page_max_age = 0
+# Every page reads as last modified when the server started
+pages_modified = formatdate(time.time(), usegmt=True)
+not_modified_count = 0
+
+
+async def simulate(name: str) -> Optional[JSONResponse]:
+    """Sleep for the configured latency; return an error response when one is injected"""
+    config = upstream_config[name]
+    request_counts[name] += 1
+    delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+    await asyncio.sleep(delay)
+    if random.random() < config.error_rate:
+        return JSONResponse({"error": {"code": config.error_status, "message": f"Injected {name} error"}},
+                            status_code=config.error_status)
+    return None
+
+
+def fake_results(query: str, start: int, num: int):
+    return [
+        {
+            "title": f"{query.title()} - result {i}",
+            "link": f"{page_base}/{query.replace(' ', '-')}/{i}",
+            "snippet": f"Coverage of {query} number {i}: teams from Chennai and Mumbai, "
+                       f"season statistics and player records.",
+        }
+        for i in range(start, start + num)
+    ]
+
+
+@app.get("/customsearch/v1")
+async def custom_search(q: str = "", num: int = 10, start: int = 1):
+    error = await simulate("cse")
+    if error is not None:
+        return error
+    return {"items": fake_results(q, start, min(num, 10))}
+
+
+@app.get("/search")
+async def serpapi_search(q: str = "", num: int = 10, start: int = 0):
+    error = await simulate("serpapi")
+    if error is not None:
+        return error
+    return {"organic_results": fake_results(q, start + 1, min(num, 10))}
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    error = await simulate("gemini")
+    if error is not None:
+        return error
+    body = await request.json()
+    prompt = body.get("contents", [{}])[0].get("parts", [{}])[0].get("text", "")
+    return {
+        "candidates": [{
+            "content": {"parts": [{"text": f"Fake {model} answer to: {prompt[:200]}"}], "role": "model"},
+            "finishReason": "STOP",
+            "index": 0,
+        }]
+    }
+
+
+@app.get("/pages/{path:path}")
+async def page(path: str, request: Request):
+    global not_modified_count
+    error = await simulate("pages")
+    if error is not None:
+        return error
+    etag = f'"{hashlib.md5(path.encode()).hexdigest()}"'
+    headers = {"ETag": etag, "Last-Modified": pages_modified, "Cache-Control": f"max-age={page_max_age}"}
+    if request.headers.get("if-none-match") == etag:
+        not_modified_count += 1
+        return Response(status_code=304, headers=headers)
+    title = path.replace("-", " ").replace("/", " - ")
+    paragraphs = "".join(
+        f"<p>{title}: Chennai and Mumbai met again in match {i}, with season statistics and player records.</p>"
+        for i in range(200)
+    )
+    body = f"<html><head><title>{title}</title><style>p {{}}</style></head><body>{paragraphs}</body></html>"
+    return Response(body, media_type="text/html", headers=headers)
+
+
+@app.post("/_config/{name}")
+async def configure(name: str, config: UpstreamConfig):
+    upstream_config[name] = config
+    return upstream_config
+
+
+@app.get("/_stats")
+async def stats():
+    return {"requests": request_counts, "not_modified": not_modified_count, "config": upstream_config}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, help="latency for all upstreams")
+    parser.add_argument("--gemini-latency-ms", type=float)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--serve-pages", action="store_true", help="link results to pages served here")
+    parser.add_argument("--page-max-age", type=int, default=0, help="Cache-Control max-age of served pages")
+    args = parser.parse_args()
+
+    global page_base, page_max_age
+    if args.serve_pages:
+        page_base = f"http://{args.host}:{args.port}/pages"
+    page_max_age = args.page_max_age
+
+    for name, config in upstream_config.items():
+        if args.latency_ms is not None:
+            config.latency_ms = args.latency_ms
+        config.error_rate = args.error_rate
+    if args.gemini_latency_ms is not None:
+        upstream_config["gemini"].latency_ms = args.gemini_latency_ms
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,22 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Header, HTTPException, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import argparse
+import asyncio
 import logging
+import os
 import time
+from admission import QueueFull
+from agent_client import AgentServiceClient, AgentServiceError
 from agent_runner import get_pipeline_runner
+from corpus_store import get_corpus_store
+from gemini_client import get_gemini_client
+from model_server import ModelNotAvailable, get_model_batcher
+from page_cache import PAGE_FETCH, get_page_cache
+from stage_cache import get_stage_cache
+from tracing import get_exporter
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,8 +36,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global state
-current_analysis = {
+# Status reported before any analysis was started
+idle_status = {
     "status": "idle",
     "current_agent": None,
     "progress": 0,
@@ -38,60 +51,213 @@ pipeline_runner = get_pipeline_runner()
 
 class AnalysisRequest(BaseModel):
     query: str
+    timeout_seconds: Optional[float] = None
+    profile: bool = False
+    depth: Optional[int] = Field(None, ge=1, le=100)
+    priority: str = Field("normal", regex="^(high|normal|low)$")
+    # Re-analyze only sources that are new or changed since this query's last run
+    incremental: bool = False
+
+class AgentAnalysisRequest(BaseModel):
+    query: str
+    # Hold the request open until the report is ready (or timeout_seconds pass)
+    wait: bool = False
+    timeout_seconds: Optional[float] = Field(None, gt=0)
+
+class PredictRequest(BaseModel):
+    # Numeric feature rows, or raw texts for models trained on hashed text features
+    features: Optional[List[List[float]]] = None
+    texts: Optional[List[str]] = None
 
 class AnalysisResponse(BaseModel):
     status: str
     message: str
     task_id: str
+    queue_position: Optional[int] = None
+    estimated_start: Optional[float] = None
+
+def resolve_task_id(task_id: Optional[str]) -> Optional[str]:
+    """Default to the most recent analysis on any worker; 404 for unknown ids"""
+    if task_id is None:
+        return pipeline_runner.store.latest_task_id()
+    if pipeline_runner.store.get(task_id, "status") is None:
+        raise HTTPException(status_code=404, detail="Unknown task id")
+    return task_id
 
-def status_callback(status: dict):
-    """Callback to update current analysis status"""
-    global current_analysis
-    current_analysis.update(status)
+@app.on_event("shutdown")
+async def shutdown_jobs():
+    pipeline_runner.stop_pipeline("shutdown")
+    await pipeline_runner.supervisor.shutdown()
 
 @app.post("/api/analyze", response_model=AnalysisResponse)
-async def start_analysis(request: AnalysisRequest):
-    """Start the analysis pipeline"""
-    if pipeline_runner.is_running:
-        raise HTTPException(status_code=400, detail="Analysis already running")
-    
+async def start_analysis(request: AnalysisRequest, http_request: Request,
+                         traceparent: Optional[str] = Header(None), x_client_id: Optional[str] = Header(None)):
+    """Start the analysis pipeline, or queue it while all job slots are busy.
+
+    Queued analyses are scheduled by priority, then round robin across clients
+    (the X-Client-Id header, or the caller's address). A full queue answers 429
+    with Retry-After. A W3C traceparent header continues the caller's trace.
+    """
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
-    # Set callback and start pipeline
-    pipeline_runner.set_status_callback(status_callback)
-    pipeline_runner.run_pipeline_async(request.query)
+    client = x_client_id or (http_request.client.host if http_request.client else "anonymous")
+    try:
+        task_id = pipeline_runner.run_pipeline_async(
+            request.query, request.timeout_seconds, request.profile, request.depth, traceparent,
+            client=client, priority=request.priority, incremental=request.incremental
+        )
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     
+    queued = pipeline_runner.admission.describe(task_id)
+    if queued is not None:
+        return AnalysisResponse(
+            status="queued",
+            message=f"Analysis queued at position {queued['queue_position']}",
+            task_id=task_id,
+            **queued
+        )
     return AnalysisResponse(
         status="started",
         message="Analysis pipeline started successfully",
-        task_id=f"analysis_{int(time.time())}"
+        task_id=task_id
     )
 
+@app.delete("/api/analyze/{task_id}")
+async def cancel_analysis(task_id: str):
+    """Cancel a running analysis and release its upstream resources"""
+    if not pipeline_runner.cancel_job(task_id):
+        raise HTTPException(status_code=404, detail="No running analysis with this task id")
+    return {"status": "cancelled", "task_id": task_id}
+
 @app.get("/api/status")
-async def get_analysis_status():
-    """Get current analysis status"""
-    return current_analysis
+async def get_analysis_status(task_id: Optional[str] = None):
+    """Get analysis status; defaults to the most recent analysis"""
+    task_id = resolve_task_id(task_id)
+    if task_id is None:
+        return idle_status
+    status = dict(pipeline_runner.store.get(task_id, "status") or idle_status)
+    if status["status"] == "queued":
+        # Live position when the analysis is queued on this worker
+        status.update(pipeline_runner.admission.describe(task_id) or {})
+    return status
 
 @app.get("/api/results")
-async def get_analysis_results():
-    """Get analysis results"""
-    if current_analysis["status"] != "completed":
+async def get_analysis_results(task_id: Optional[str] = None):
+    """Get analysis results; defaults to the most recent analysis"""
+    task_id = resolve_task_id(task_id)
+    results = pipeline_runner.store.get(task_id, "results") if task_id else None
+    if results is None:
         raise HTTPException(status_code=400, detail="Analysis not completed yet")
-    
-    from real_agents import analysis_results
-    return {
-        "query": analysis_results.get("query", ""),
-        "scrape_results": analysis_results.get("scrape_results", ""),
-        "cleaned_data": analysis_results.get("cleaned_data", ""),
-        "eda_output": analysis_results.get("eda_output", ""),
-        "model_info": analysis_results.get("model_info", ""),
-        "final_answer": analysis_results.get("final_answer", ""),
-        "processing_time": current_analysis.get("timestamp", 0) - current_analysis.get("start_time", 0) if current_analysis.get("start_time") else None,
-        "data_sources": analysis_results.get("scrape_results", "").count("Title:") if analysis_results.get("scrape_results") else 0,
-        "characters_processed": len(analysis_results.get("cleaned_data", "")),
-        "agent_actions": 6
-    }
+    status = pipeline_runner.store.get(task_id, "status")
+    # A provisional answer (the extractive summary) is served while Gemini is still generating
+    if status["status"] not in ("completed", "partial", "cancelled") and not results.get("provisional"):
+        raise HTTPException(status_code=400, detail="Analysis not completed yet")
+    return results
+
+@app.get("/api/profile/{task_id}")
+async def get_profile(task_id: str, format: str = "json"):
+    """CPU samples and allocations of a profiled analysis, per stage, as JSON or collapsed stacks"""
+    if format not in ("json", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'collapsed'")
+    task_id = resolve_task_id(task_id)
+    status = pipeline_runner.store.get(task_id, "status")
+    job = pipeline_runner.get_job(task_id)
+    if job is not None and job.profiler is not None:
+        # Live profile while the job still runs on this worker
+        summary, collapsed = job.profiler.summary(), job.profiler.collapsed()
+    else:
+        summary = pipeline_runner.store.get(task_id, "profile")
+        collapsed = pipeline_runner.store.get(task_id, "profile_collapsed")
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No profile for this analysis; start it with profile enabled")
+    if format == "collapsed":
+        return PlainTextResponse(collapsed)
+    summary["status"] = status["status"]
+    return summary
+
+@app.post("/api/predict")
+async def predict(request: PredictRequest):
+    """Serve predictions from the latest trained model, micro-batched across requests"""
+    if bool(request.features) == bool(request.texts):
+        raise HTTPException(status_code=400, detail="Give either feature rows or texts")
+    try:
+        predictions, version = await get_model_batcher().predict(request.features or request.texts)
+    except ModelNotAvailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"predictions": predictions, "model_version": f"{version[0]}-{version[1]}"}
+
+@app.get("/api/predict/stats")
+async def predict_stats():
+    """Throughput, latency percentiles and batch sizes of the predict endpoint"""
+    return get_model_batcher().stats()
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """Spans of a trace recorded by this worker (TRACE_EXPORTER=memory) or the trace file"""
+    # The file exporter reads the trace file
+    spans = await asyncio.to_thread(get_exporter().get_trace, trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="No spans recorded for this trace")
+    return {"trace_id": trace_id, "spans": sorted(spans, key=lambda s: s["start_ns"])}
+
+agent_service_errors = {"busy": 429, "not_found": 404, "bad_request": 400}
+
+async def call_agent_service(op: str, **fields):
+    """Forward a request to the long-lived agent service (agent_service.py)"""
+    try:
+        return await AgentServiceClient().request(op, **fields)
+    except AgentServiceError as e:
+        raise HTTPException(status_code=agent_service_errors.get(e.code, 400), detail=str(e))
+    except (ConnectionError, FileNotFoundError) as e:
+        raise HTTPException(status_code=503, detail=f"Agent service is not running: {e}")
+
+@app.post("/api/agents/analyze")
+async def start_agent_analysis(request: AgentAnalysisRequest):
+    """Inject a query into the resident agent Bureau (started with main.py --serve)"""
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    return await call_agent_service("submit", query=request.query, wait=request.wait,
+                                    timeout=request.timeout_seconds)
+
+@app.get("/api/agents/jobs/{job_id}")
+async def get_agent_job(job_id: str, wait: bool = False, timeout_seconds: Optional[float] = None):
+    """Status and, once completed, the report of an agent service job"""
+    if wait:
+        return await call_agent_service("wait", job_id=job_id, timeout=timeout_seconds)
+    return await call_agent_service("status", job_id=job_id)
+
+@app.get("/api/agents/stats")
+async def agent_service_stats():
+    return await call_agent_service("stats")
+
+@app.get("/api/corpus/stats")
+async def corpus_stats():
+    """Size of the on-disk corpus history, its generation and compactions so far"""
+    store = get_corpus_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Corpus store is off (CORPUS_STORE=off)")
+    return store.stats()
+
+@app.get("/api/cache/stats")
+async def stage_cache_stats():
+    """Hit rate and time saved per memoized pipeline stage on this worker"""
+    return get_stage_cache().stats()
+
+@app.get("/api/pages/stats")
+async def page_cache_stats():
+    """Bytes of source pages downloaded versus served from the page cache on this worker"""
+    if PAGE_FETCH != "on":
+        raise HTTPException(status_code=404, detail="Page fetching is off (PAGE_FETCH=off)")
+    return get_page_cache().stats()
+
+@app.get("/api/gemini/stats")
+async def gemini_stats():
+    """In-flight and queued Gemini calls, with queue wait and generation latency"""
+    return get_gemini_client().stats()
 
 @app.get("/health")
 async def health_check():
@@ -100,6 +266,9 @@ async def health_check():
         "status": "healthy",
         "service": "AI Analysis Dashboard API",
         "pipeline_running": pipeline_runner.is_running,
+        "running_jobs": pipeline_runner.store.running_count(),
+        "admission": pipeline_runner.admission.stats(),
+        "worker_pid": os.getpid(),
         "timestamp": time.time()
     }
 
@@ -113,11 +282,30 @@ async def root():
         "endpoints": {
             "health": "/health",
             "analyze": "/api/analyze",
+            "cancel": "/api/analyze/{task_id}",
             "status": "/api/status",
-            "results": "/api/results"
+            "results": "/api/results",
+            "profile": "/api/profile/{task_id}",
+            "predict": "/api/predict",
+            "agents": "/api/agents/analyze"
         }
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="AI Analysis Dashboard API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes; more than one shares job state through SQLite")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Workers are separate processes: job state must live outside any one of them
+        if os.environ.setdefault("STATE_BACKEND", "sqlite") == "memory":
+            parser.error("STATE_BACKEND=memory cannot be shared across --workers")
+        uvicorn.run("fastapi_server:app", host=args.host, port=args.port,
+                    workers=args.workers, log_level="info")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="info")
\ No newline at end of file
@@ -0,0 +1,130 @@
+import functools
+import logging
+import os
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDRegressor
+
+from eda_engine import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Feature Hashing Configuration
+HASH_FEATURE_BITS = int(os.getenv("HASH_FEATURE_BITS", "18"))
+HASH_MAX_NGRAM = int(os.getenv("HASH_MAX_NGRAM", "2"))
+TRAIN_BATCH_DOCS = int(os.getenv("TRAIN_BATCH_DOCS", "256"))
+
+
+def analyze(text: str, max_ngram: int = HASH_MAX_NGRAM) -> List[str]:
+    """Tokens of ``text`` (as in the EDA) followed by its n-grams up to ``max_ngram``"""
+    tokens = tokenize(text)
+    features = list(tokens)
+    for n in range(2, max_ngram + 1):
+        features.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return features
+
+
+def make_vectorizer(n_features: int = 1 << HASH_FEATURE_BITS, max_ngram: int = HASH_MAX_NGRAM) -> HashingVectorizer:
+    """Stateless vectorizer: no vocabulary is kept, so its memory does not grow with the corpus"""
+    return HashingVectorizer(
+        analyzer=functools.partial(analyze, max_ngram=max_ngram),
+        n_features=n_features,
+        alternate_sign=True,
+        norm="l2",
+        dtype=np.float32,
+    )
+
+
+class HashedTextModel:
+    """Linear regressor over hashed token and n-gram features, trained incrementally.
+
+    Unlike the numeric models, it predicts directly from raw texts.
+    """
+
+    accepts_text = True
+
+    def __init__(self, n_features: int = 1 << HASH_FEATURE_BITS, max_ngram: int = HASH_MAX_NGRAM):
+        self.n_features = n_features
+        self.vectorizer = make_vectorizer(n_features, max_ngram)
+        self.regressor = SGDRegressor(alpha=1e-5, learning_rate="invscaling", random_state=0)
+        self.documents_seen = 0
+
+    def partial_fit(self, texts: List[str], targets: np.ndarray):
+        self.regressor.partial_fit(self.vectorizer.transform(texts), targets)
+        self.documents_seen += len(texts)
+        return self
+
+    def predict(self, texts: List[str]) -> np.ndarray:
+        return self.regressor.predict(self.vectorizer.transform(texts))
+
+
+def query_relevance(texts: List[str], query: str) -> np.ndarray:
+    """Share of the query's distinct terms that occur in each text"""
+    terms = set(tokenize(query))
+    if not terms:
+        return np.zeros(len(texts))
+    return np.array([len(terms.intersection(tokenize(text))) / len(terms) for text in texts])
+
+
+def iter_batches(documents: Iterable[str], batch_size: int = TRAIN_BATCH_DOCS) -> Iterator[List[str]]:
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_text_file(path: str) -> Iterator[str]:
+    """Documents of a corpus file, one per line, read lazily"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def train_relevance_model(documents: Iterable[str], query: str, batch_size: int = TRAIN_BATCH_DOCS,
+                          model: Optional[HashedTextModel] = None,
+                          check: Optional[Callable[[], None]] = None) -> Tuple[HashedTextModel, Dict[str, Any]]:
+    """Train a model predicting query-term relevance from a stream of documents.
+
+    ``documents`` may be any iterable (e.g. a generator over a file); only one
+    mini-batch is held in memory at a time. ``check`` runs between batches and
+    may raise to stop training early.
+    """
+    model = model or HashedTextModel()
+    start = time.perf_counter()
+    batches = documents_trained = 0
+    for batch in iter_batches(documents, batch_size):
+        if check is not None:
+            check()
+        model.partial_fit(batch, query_relevance(batch, query))
+        batches += 1
+        documents_trained += len(batch)
+    elapsed = time.perf_counter() - start
+    stats = {
+        "model": type(model.regressor).__name__,
+        "features": model.n_features,
+        "documents": documents_trained,
+        "batches": batches,
+        "batch_size": batch_size,
+        "seconds": elapsed,
+        "docs_per_second": documents_trained / elapsed if elapsed > 0 else 0.0,
+        # Set by callers that reuse a cached model: the timings are then those of the original run
+        "cached": False,
+    }
+    logger.info(f"[train] {stats['documents']} documents in {batches} batches, {stats['docs_per_second']:.0f} docs/s")
+    return model, stats
+
+
+def describe_training(stats: Dict[str, Any]) -> str:
+    if not stats["documents"]:
+        return "No documents to train on"
+    speed = "reused from the stage cache" if stats.get("cached") else f"{stats['docs_per_second']:,.0f} docs/s"
+    return (f"{stats['model']} on {stats['features']} hashed features trained on {stats['documents']} documents "
+            f"({speed})")
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import google.generativeai as genai
+
+from job_control import get_upstream_executor
+from metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+# Gemini Configuration
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+
+# The async API needs the gRPC transport; with REST (custom endpoints) the
+# blocking call runs on the upstream executor instead.
+_use_async_api = True
+
+
+def configure_gemini(api_key: Optional[str], endpoint: Optional[str] = GEMINI_API_ENDPOINT):
+    """Configure the genai library, optionally against a custom REST endpoint"""
+    global _use_async_api
+    if endpoint:
+        genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": endpoint})
+        _use_async_api = False
+    else:
+        genai.configure(api_key=api_key)
+        _use_async_api = True
+
+
+class GeminiClient:
+    """Process-wide Gemini model with a cap on concurrent in-flight generations.
+
+    Calls beyond the cap queue on a semaphore (one per event loop); time spent
+    queued and time spent generating are recorded separately.
+    """
+
+    def __init__(self, model_name: str = GEMINI_MODEL, max_concurrency: int = GEMINI_MAX_CONCURRENCY):
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.queue_wait = LatencyRecorder()
+        self.generation = LatencyRecorder()
+        self.waiting = 0
+        self.in_flight = 0
+        self.failures = 0
+        self._model = None
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def generate(self, prompt: str, timings: Optional[Dict[str, float]] = None) -> Any:
+        """Generate a response; ``timings`` receives queue_seconds and generation_seconds"""
+        semaphore = self._semaphore()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        started_at = time.perf_counter()
+        self.queue_wait.record(started_at - queued_at)
+        self.in_flight += 1
+        handed_off = False
+        try:
+            if _use_async_api:
+                return await self.model.generate_content_async(prompt)
+            loop = asyncio.get_running_loop()
+            future = get_upstream_executor().submit(self.model.generate_content, prompt)
+            # A cancelled caller cannot stop the thread, so the permit is only
+            # returned once the blocking call has actually finished
+            future.add_done_callback(lambda _: self._finish_threadsafe(loop, semaphore, started_at))
+            handed_off = True
+            return await asyncio.wrap_future(future)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            if not handed_off:
+                self._finish(semaphore, started_at)
+            if timings is not None:
+                timings["queue_seconds"] = started_at - queued_at
+                timings["generation_seconds"] = time.perf_counter() - started_at
+
+    def _finish(self, semaphore: asyncio.Semaphore, started_at: float):
+        semaphore.release()
+        self.in_flight -= 1
+        self.generation.record(time.perf_counter() - started_at)
+
+    def _finish_threadsafe(self, loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore, started_at: float):
+        try:
+            loop.call_soon_threadsafe(self._finish, semaphore, started_at)
+        except RuntimeError:
+            # The loop has closed; nothing is left to wait on its semaphore
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "failures": self.failures,
+            "queue_wait": self.queue_wait.summary(),
+            "generation": self.generation.summary(),
+        }
+
+
+gemini_client = None
+
+
+def get_gemini_client():
+    global gemini_client
+    if gemini_client is None:
+        gemini_client = GeminiClient()
+    return gemini_client
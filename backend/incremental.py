@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from corpus_processor import EntityCounts
+from eda_engine import analyze_corpus, corpus_stats, tokenize
+from records import SearchResult
+
+logger = logging.getLogger(__name__)
+
+# Incremental Analysis Configuration
+INCREMENTAL_MAX_QUERIES = int(os.getenv("INCREMENTAL_MAX_QUERIES", "100"))
+# Unused terms are dropped from a query's vocabulary once there are more than this many
+INCREMENTAL_MIN_COMPACT_TERMS = int(os.getenv("INCREMENTAL_MIN_COMPACT_TERMS", "1024"))
+
+
+def normalize_query(query: str) -> str:
+    """Key under which re-runs of the same tracked query share their state"""
+    return " ".join(re.sub(r"[^a-z0-9\s]", " ", query.lower()).split())
+
+
+def content_hash(result: SearchResult) -> str:
+    return hashlib.blake2b(result.text().encode("utf-8"), digest_size=16).hexdigest()
+
+
+class AnalyzedDocument:
+    """A cleaned source with its term counts and entity counts, reusable while its content is unchanged"""
+
+    __slots__ = ("key", "content_hash", "text", "columns", "counts", "entities", "generation")
+
+    def __init__(self, key: str, digest: str, text: str, columns: np.ndarray, counts: np.ndarray,
+                 entities: EntityCounts, generation: int):
+        self.key = key
+        self.content_hash = digest
+        self.text = text
+        self.columns = columns
+        self.counts = counts
+        self.entities = entities
+        # Vocabulary generation the term ids refer to; compaction renumbers them
+        self.generation = generation
+
+
+class IncrementalCorpus:
+    """EDA state of one tracked query, updated by merging per-document deltas.
+
+    Term counts, document frequencies and entity counts are adjusted for
+    each added, changed or removed document instead of being recomputed.
+    The document-term matrix keeps the rows of unchanged documents, and the
+    stats are reused until the documents change; TF-IDF is rescored from the
+    matrix as idf shifts with every document.
+    Terms no document uses any more are dropped once they make up most of
+    the vocabulary.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.documents: "OrderedDict[str, AnalyzedDocument]" = OrderedDict()
+        self.vocabulary: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.term_counts = np.zeros(1024, dtype=np.int64)
+        self.doc_freq = np.zeros(1024, dtype=np.int64)
+        self.entities = EntityCounts()
+        self.generation = 0
+        self.runs = 0
+        self.lock = threading.Lock()
+        # Rows follow self.documents
+        self._matrix = sparse.csr_matrix((0, 0), dtype=np.int64)
+        self._char_lengths = np.zeros(0, dtype=np.int64)
+        self._stats: Optional[Dict[str, Any]] = None
+
+    def lookup(self, key: str, digest: str) -> Optional[AnalyzedDocument]:
+        with self.lock:
+            document = self.documents.get(key)
+        return document if document is not None and document.content_hash == digest else None
+
+    def analyze(self, key: str, digest: str, text: str) -> AnalyzedDocument:
+        entities = EntityCounts().add(text)
+        with self.lock:
+            columns, counts = self._term_counts(text)
+            return AnalyzedDocument(key, digest, text, columns, counts, entities, self.generation)
+
+    def _term_counts(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        tokens = tokenize(text)
+        ids = np.empty(len(tokens), dtype=np.int64)
+        for i, token in enumerate(tokens):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                term_id = self.vocabulary[token] = len(self.terms)
+                self.terms.append(token)
+            ids[i] = term_id
+        columns, counts = np.unique(ids, return_counts=True)
+        return columns, counts.astype(np.int64)
+
+    def _apply(self, document: AnalyzedDocument, sign: int):
+        if document.columns.size and document.columns[-1] >= self.term_counts.size:
+            size = max(self.term_counts.size * 2, int(document.columns[-1]) + 1)
+            self.term_counts = np.pad(self.term_counts, (0, size - self.term_counts.size))
+            self.doc_freq = np.pad(self.doc_freq, (0, size - self.doc_freq.size))
+        self.term_counts[document.columns] += sign * document.counts
+        self.doc_freq[document.columns] += sign
+        if sign > 0:
+            self.entities.merge(document.entities)
+        else:
+            self.entities.subtract(document.entities)
+
+    def commit(self, documents: List[AnalyzedDocument]) -> Dict[str, int]:
+        """Make ``documents`` the current source set, merging only what differs"""
+        with self.lock:
+            previous = self.documents
+            current = OrderedDict((document.key, document) for document in documents)
+            delta = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+            fresh = []
+            for key, document in current.items():
+                old = previous.get(key)
+                if old is document:
+                    delta["unchanged"] += 1
+                    continue
+                if document.generation != self.generation:
+                    # Analyzed before the vocabulary was compacted
+                    document.columns, document.counts = self._term_counts(document.text)
+                    document.generation = self.generation
+                if old is not None:
+                    self._apply(old, -1)
+                    delta["changed"] += 1
+                else:
+                    delta["added"] += 1
+                self._apply(document, 1)
+                fresh.append(document)
+            for key, old in previous.items():
+                if key not in current:
+                    self._apply(old, -1)
+                    delta["removed"] += 1
+            if fresh or delta["removed"] or list(current) != list(previous):
+                self._update_matrix(previous, current, fresh)
+                self._stats = None
+            self.documents = current
+            self._compact()
+            self.runs += 1
+            return delta
+
+    def _update_matrix(self, previous: "OrderedDict[str, AnalyzedDocument]",
+                       current: "OrderedDict[str, AnalyzedDocument]", fresh: List[AnalyzedDocument]):
+        """Keep the rows of unchanged documents and add rows for the new ones, in ``current`` order"""
+        size = len(self.terms)
+        rows = {key: row for row, key in enumerate(previous)}
+        reused = [rows[key] for key, document in current.items() if previous.get(key) is document]
+        kept = _with_columns(self._matrix[reused], size)
+        added = _rows(fresh, size)
+        # Position of each current document in the stacked [kept; added] matrix
+        order, next_kept, next_added = [], 0, len(reused)
+        for key, document in current.items():
+            if previous.get(key) is document:
+                order.append(next_kept)
+                next_kept += 1
+            else:
+                order.append(next_added)
+                next_added += 1
+        self._matrix = sparse.vstack([kept, added], format="csr")[order]
+        fresh_lengths = np.fromiter((len(document.text) for document in fresh), dtype=np.int64, count=len(fresh))
+        self._char_lengths = np.concatenate([self._char_lengths[reused], fresh_lengths])[order]
+
+    def _compact(self):
+        """Renumber the vocabulary without unused terms once they outnumber the used ones"""
+        size = len(self.terms)
+        used = self.doc_freq[:size] > 0
+        live = int(np.count_nonzero(used))
+        if size - live <= max(live, INCREMENTAL_MIN_COMPACT_TERMS):
+            return
+        remap = np.cumsum(used) - 1
+        self.terms = [term for term, keep in zip(self.terms, used) if keep]
+        self.vocabulary = {term: term_id for term_id, term in enumerate(self.terms)}
+        self.term_counts = self.term_counts[:size][used]
+        self.doc_freq = self.doc_freq[:size][used]
+        self.generation += 1
+        for document in self.documents.values():
+            document.columns = remap[document.columns]
+            document.generation = self.generation
+        matrix = self._matrix
+        self._matrix = sparse.csr_matrix((matrix.data, remap[matrix.indices], matrix.indptr),
+                                         shape=(matrix.shape[0], live))
+        self._stats = None
+        logger.info(f"[incremental] {self.key!r}: vocabulary compacted from {size} to {live} terms")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            if self._stats is None:
+                size = len(self.terms)
+                # TF-IDF is rescored from the stored counts: idf shifts with every new document
+                self._stats = corpus_stats(_with_columns(self._matrix, size), np.array(self.terms, dtype=str),
+                                           self._char_lengths, self.term_counts[:size], self.doc_freq[:size])
+            return dict(self._stats)
+
+    def keywords(self) -> Dict[str, Any]:
+        """Keywords of the current documents, ranked by frequency as on the full path"""
+        with self.lock:
+            return self.entities.to_keywords()
+
+
+def _rows(documents: List[AnalyzedDocument], size: int) -> sparse.csr_matrix:
+    lengths = np.fromiter((document.columns.size for document in documents), dtype=np.int64, count=len(documents))
+    return sparse.csr_matrix(
+        (
+            np.concatenate([document.counts for document in documents]) if documents else np.zeros(0, np.int64),
+            np.concatenate([document.columns for document in documents]) if documents else np.zeros(0, np.int64),
+            np.concatenate([[0], np.cumsum(lengths)]),
+        ),
+        shape=(len(documents), size),
+    )
+
+
+def _with_columns(matrix: sparse.csr_matrix, size: int) -> sparse.csr_matrix:
+    """``matrix`` widened to ``size`` columns; the vocabulary only grows between compactions"""
+    if matrix.shape[1] == size:
+        return matrix
+    return sparse.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], size))
+
+
+class IncrementalRun:
+    """One re-run of a tracked query: cleans and analyzes only new or changed sources"""
+
+    def __init__(self, corpus: IncrementalCorpus, clean: Callable[[str], str]):
+        self.corpus = corpus
+        self.clean = clean
+        self.documents: List[AnalyzedDocument] = []
+        self._keys = set()
+        self.processed = 0
+        self.processed_characters = 0
+        self.process_seconds = 0.0
+        self.previous_documents = len(corpus.documents)
+
+    def process(self, results: List[SearchResult]) -> List[str]:
+        """Cleaned documents of a page, reusing those whose content was analyzed before"""
+        start = time.perf_counter()
+        texts = []
+        for result in results:
+            digest = content_hash(result)
+            key = result.url or f"content:{digest}"
+            if key in self._keys:
+                continue
+            self._keys.add(key)
+            document = self.corpus.lookup(key, digest)
+            if document is None:
+                text = self.clean(result.text())
+                document = self.corpus.analyze(key, digest, text)
+                self.processed += 1
+                self.processed_characters += len(text)
+            self.documents.append(document)
+            texts.append(document.text)
+        self.process_seconds += time.perf_counter() - start
+        return texts
+
+    def finish(self) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """Merge this run into the stored state; returns (eda stats, keywords, cost report)"""
+        start = time.perf_counter()
+        if not self.documents:
+            # Nothing was found (e.g. the search failed): keep the stored state for the next run
+            logger.info(f"[incremental] {self.corpus.key!r}: no sources, stored state left as is")
+            stats = analyze_corpus([])
+            return stats, EntityCounts().to_keywords(), dict(
+                added=0, changed=0, removed=0, unchanged=0, skipped=True, query_key=self.corpus.key,
+                run=self.corpus.runs, previous_documents=self.previous_documents, documents=0,
+                processed_documents=0, processed_characters=0, reused_documents=0,
+                process_seconds=self.process_seconds, merge_seconds=stats["seconds"],
+            )
+        delta = self.corpus.commit(self.documents)
+        stats = self.corpus.stats()
+        keywords = self.corpus.keywords()
+        stats["seconds"] = time.perf_counter() - start
+        report = dict(
+            delta,
+            skipped=False,
+            query_key=self.corpus.key,
+            run=self.corpus.runs,
+            previous_documents=self.previous_documents,
+            documents=len(self.documents),
+            processed_documents=self.processed,
+            processed_characters=self.processed_characters,
+            reused_documents=len(self.documents) - self.processed,
+            process_seconds=self.process_seconds,
+            merge_seconds=stats["seconds"],
+        )
+        logger.info(f"[incremental] {self.corpus.key!r}: processed {self.processed} of {len(self.documents)} "
+                    f"sources (+{delta['added']} ~{delta['changed']} -{delta['removed']})")
+        return stats, keywords, report
+
+
+class IncrementalStore:
+    """Per-query incremental state, least recently used queries evicted first"""
+
+    def __init__(self, max_queries: int = INCREMENTAL_MAX_QUERIES):
+        self.max_queries = max_queries
+        self._corpora: "OrderedDict[str, IncrementalCorpus]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> IncrementalCorpus:
+        key = normalize_query(query)
+        with self._lock:
+            corpus = self._corpora.get(key)
+            if corpus is None:
+                corpus = self._corpora[key] = IncrementalCorpus(key)
+                while len(self._corpora) > self.max_queries:
+                    self._corpora.popitem(last=False)
+            self._corpora.move_to_end(key)
+            return corpus
+
+
+incremental_store = None
+
+
+def get_incremental_store():
+    global incremental_store
+    if incremental_store is None:
+        incremental_store = IncrementalStore()
+    return incremental_store
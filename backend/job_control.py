@@ -0,0 +1,185 @@
+import asyncio
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from profiler import JobProfiler, get_sampler
+from tracing import span, start_span
+
+logger = logging.getLogger(__name__)
+
+# Job Configuration
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOB_TIMEOUT_SECONDS", "60"))
+UPSTREAM_TIMEOUT_SECONDS = 10
+UPSTREAM_WORKERS = int(os.getenv("UPSTREAM_WORKERS", "32"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+
+# Bounded executors shared by all jobs: blocking upstream calls and CPU-bound
+# stages queue here instead of each job owning a thread.
+_upstream_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor: Optional[ThreadPoolExecutor] = None
+_upstream_session: Optional[requests.Session] = None
+
+
+def get_upstream_executor() -> ThreadPoolExecutor:
+    global _upstream_executor
+    if _upstream_executor is None:
+        _upstream_executor = ThreadPoolExecutor(UPSTREAM_WORKERS, thread_name_prefix="upstream")
+    return _upstream_executor
+
+
+def get_upstream_session() -> requests.Session:
+    """Session whose keep-alive pool is shared by all jobs, sized to the upstream executor"""
+    global _upstream_session
+    if _upstream_session is None:
+        _upstream_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=UPSTREAM_WORKERS)
+        _upstream_session.mount("https://", adapter)
+        _upstream_session.mount("http://", adapter)
+    return _upstream_session
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    global _cpu_executor
+    if _cpu_executor is None:
+        _cpu_executor = ThreadPoolExecutor(CPU_WORKERS, thread_name_prefix="stage")
+    return _cpu_executor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job once it was cancelled or ran past its deadline"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def new_task_id() -> str:
+    return f"analysis_{uuid.uuid4().hex[:12]}"
+
+
+class JobContext:
+    """Deadline, cancellation flag and upstream resources of one pipeline run"""
+
+    def __init__(self, query: str, timeout: Optional[float] = None, task_id: Optional[str] = None,
+                 profile: bool = False, traceparent: Optional[str] = None):
+        self.task_id = task_id or new_task_id()
+        self.query = query
+        self.timeout_seconds = timeout or JOB_TIMEOUT_SECONDS
+        self.started_at = time.time()
+        self.deadline = time.monotonic() + self.timeout_seconds
+        self.cancel_reason: Optional[str] = None
+        self.completed_stages: List[str] = []
+        self.status: Dict[str, Any] = {"status": "starting", "task_id": self.task_id}
+        self.results: Dict[str, Any] = {
+            "task_id": self.task_id,
+            "query": query,
+            "completed_stages": self.completed_stages,
+            "partial": False,
+        }
+        # Pooled connections are shared; a cancelled job stops waiting on its
+        # calls, which then finish within their own timeout
+        self.session = get_upstream_session()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        # Root span of the job; stages and upstream calls become its children
+        self.span = start_span("analysis", traceparent, {"task_id": self.task_id, "query": query})
+        self.profiler: Optional[JobProfiler] = None
+        if profile:
+            self.profiler = JobProfiler(self.task_id)
+            get_sampler().register(self.profiler)
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def timeout(self, default: float = UPSTREAM_TIMEOUT_SECONDS) -> float:
+        """Per-call timeout clipped to the time left before the deadline"""
+        return max(0.1, min(default, self.remaining()))
+
+    def check(self):
+        if self.cancel_reason is not None:
+            raise JobCancelled(self.cancel_reason)
+        if self.expired:
+            raise JobCancelled("deadline")
+
+    def stage_done(self, stage: str):
+        self.completed_stages.append(stage)
+
+    @contextlib.contextmanager
+    def stage(self, stage: str):
+        """Trace ``stage`` as a span and, if profiling was requested, profile it"""
+        with span(f"stage.{stage}"):
+            if self.profiler is None:
+                yield
+            else:
+                with self.profiler.stage(stage):
+                    yield
+
+    def attach(self, task: asyncio.Task):
+        self._loop = task.get_loop()
+        self._task = task
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel the job from any thread; its pending upstream calls are abandoned"""
+        with self._lock:
+            if self.cancel_reason is not None:
+                return
+            self.cancel_reason = reason
+        logger.info(f"[{self.task_id}] Cancelling job: {reason}")
+        if self._task is not None and not self._task.done():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+
+    def close(self):
+        self.span.set_attribute("status", self.status.get("status"))
+        self.span.set_attribute("completed_stages", list(self.completed_stages))
+        self.span.end()
+        if self.profiler is not None:
+            get_sampler().unregister(self.profiler)
+
+    @property
+    def finished(self) -> bool:
+        return self._task is not None and self._task.done()
+
+    async def run_blocking(self, func: Callable[..., Any], *args,
+                           executor: Optional[Executor] = None, **kwargs) -> Any:
+        """Run a blocking call on a bounded executor, giving up at the deadline"""
+        self.check()
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if self.profiler is not None:
+            call = self.profiler.wrap(call)
+        future = loop.run_in_executor(executor or get_upstream_executor(), call)
+        try:
+            return await asyncio.wait_for(future, self.remaining())
+        except asyncio.TimeoutError:
+            raise JobCancelled("deadline")
+
+    async def run_async(self, awaitable: Awaitable[Any]) -> Any:
+        """Await a coroutine, giving up at the deadline"""
+        self.check()
+        try:
+            return await asyncio.wait_for(awaitable, self.remaining())
+        except asyncio.TimeoutError:
+            raise JobCancelled("deadline")
+
+    async def run_cpu(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a CPU-bound stage without blocking the event loop"""
+        return await self.run_blocking(func, *args, executor=get_cpu_executor(), **kwargs)
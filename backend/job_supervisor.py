@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+from job_control import JobContext
+from state_store import StateStore, get_state_store
+
+logger = logging.getLogger(__name__)
+
+# Supervisor Configuration
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "256"))
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "100"))
+CANCEL_POLL_SECONDS = float(os.getenv("CANCEL_POLL_SECONDS", "0.5"))
+
+
+class JobSupervisor:
+    """Tracks pipeline jobs running as tasks on the server's event loop.
+
+    Running jobs are capped across all workers through the state store's
+    slots; finished jobs are kept in a bounded local history so their
+    contexts stay reachable without growing memory forever.
+    """
+
+    def __init__(self, max_jobs: int = MAX_CONCURRENT_JOBS, max_finished: int = MAX_FINISHED_JOBS,
+                 store: Optional[StateStore] = None):
+        self.store = store or get_state_store()
+        self.max_jobs = max_jobs
+        self.max_finished = max_finished
+        self._running: Dict[str, asyncio.Task] = {}
+        self._jobs: "OrderedDict[str, JobContext]" = OrderedDict()
+        self.latest_task_id: Optional[str] = None
+        self._cancel_watcher: Optional[asyncio.Task] = None
+        self._done_listeners: List[Callable[[str], None]] = []
+
+    @property
+    def running_count(self) -> int:
+        return len(self._running)
+
+    def add_done_listener(self, callback: Callable[[str], None]):
+        """Call ``callback(task_id)`` whenever a job finishes and frees its slot"""
+        self._done_listeners.append(callback)
+
+    def has_capacity(self) -> bool:
+        return self.store.running_count() < self.max_jobs
+
+    def submit(self, job: JobContext, coro: Coroutine[Any, Any, Any]) -> Optional[asyncio.Task]:
+        """Schedule a job on the running loop, or return None when at capacity"""
+        if not self.store.acquire_slot(job.task_id, self.max_jobs):
+            coro.close()
+            job.close()
+            return None
+        self.store.put_nowait(job.task_id, "submitted", job.started_at)
+        task = asyncio.get_running_loop().create_task(coro, name=job.task_id)
+        job.attach(task)
+        self._running[job.task_id] = task
+        self._jobs[job.task_id] = job
+        self.latest_task_id = job.task_id
+        task.add_done_callback(lambda t, task_id=job.task_id: self._on_done(task_id, t))
+        if self.store.shared and (self._cancel_watcher is None or self._cancel_watcher.done()):
+            self._cancel_watcher = asyncio.get_running_loop().create_task(self._watch_cancels())
+        return task
+
+    async def _watch_cancels(self):
+        """Apply cancellations that other workers recorded in the shared store"""
+        while self._running:
+            await asyncio.sleep(CANCEL_POLL_SECONDS)
+            for task_id in self.store.cancel_requests(list(self._running)):
+                self.cancel(task_id)
+
+    def _on_done(self, task_id: str, task: asyncio.Task):
+        self._running.pop(task_id, None)
+        self.store.release_slot(task_id)
+        job = self._jobs.get(task_id)
+        if job is not None:
+            job.close()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[{task_id}] Job task failed: {task.exception()}")
+        self._trim_history()
+        for callback in self._done_listeners:
+            callback(task_id)
+
+    def _trim_history(self):
+        finished = [task_id for task_id in self._jobs if task_id not in self._running]
+        for task_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[task_id]
+
+    def get(self, task_id: Optional[str] = None) -> Optional[JobContext]:
+        """Look up a job by id, or the most recently submitted one"""
+        return self._jobs.get(task_id or self.latest_task_id or "")
+
+    def cancel(self, task_id: str, reason: str = "cancelled") -> bool:
+        """Cancel a job running here, or flag it for the worker that runs it"""
+        if task_id not in self._running:
+            return self.store.request_cancel(task_id)
+        self._jobs[task_id].cancel(reason)
+        return True
+
+    def cancel_all(self, reason: str = "cancelled"):
+        for task_id in list(self._running):
+            self.cancel(task_id, reason)
+
+    async def shutdown(self):
+        self.cancel_all("shutdown")
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+
+job_supervisor = None
+
+
+def get_job_supervisor():
+    global job_supervisor
+    if job_supervisor is None:
+        job_supervisor = JobSupervisor()
+    return job_supervisor
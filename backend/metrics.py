@@ -0,0 +1,40 @@
+import threading
+import time
+from collections import deque
+from typing import Dict
+
+import numpy as np
+
+
+class LatencyRecorder:
+    """Rolling window of latency samples with throughput and percentiles"""
+
+    def __init__(self, max_samples: int = 10000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+            self.count += 1
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {"count": self.count, "window": 0, "throughput_per_second": 0.0,
+                    "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        finished = np.array([s[0] for s in samples])
+        latencies = np.array([s[1] for s in samples]) * 1000
+        span = finished[-1] - finished[0]
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "count": self.count,
+            "window": len(samples),
+            "throughput_per_second": float(len(samples) / span) if span > 0 else 0.0,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(latencies.max()),
+        }
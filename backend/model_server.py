@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import deque
+from typing import Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+from metrics import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+# Model Serving Configuration
+MODEL_PATH = os.getenv("MODEL_PATH", "trained_model.pkl")
+MODEL_CHECK_INTERVAL = float(os.getenv("MODEL_CHECK_INTERVAL", "1.0"))
+BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5"))
+MAX_BATCH_ROWS = int(os.getenv("PREDICT_MAX_BATCH_ROWS", "1024"))
+
+
+class ModelNotAvailable(Exception):
+    pass
+
+
+def save_model(model_bytes: bytes, path: str = MODEL_PATH):
+    """Write a pickled model atomically so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(model_bytes)
+    os.replace(tmp_path, path)
+
+
+class ModelCache:
+    """Keeps the deserialized model in memory and reloads it when the artifact changes"""
+
+    def __init__(self, path: str = MODEL_PATH, check_interval: float = MODEL_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._model = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def get(self) -> Tuple[Any, Tuple[int, int]]:
+        """Return (model, version), reloading only when the file changed"""
+        now = time.monotonic()
+        if self._model is not None and now - self._last_check < self.check_interval:
+            return self._model, self._signature
+        with self._lock:
+            self._last_check = now
+            signature = self._stat()
+            if signature is None:
+                if self._model is None:
+                    raise ModelNotAvailable(f"No trained model at {self.path}")
+                return self._model, self._signature
+            if signature != self._signature:
+                with open(self.path, "rb") as f:
+                    self._model = pickle.load(f)
+                self._signature = signature
+                self.loads += 1
+                logger.info(f"[model] Loaded {type(self._model).__name__} from {self.path}")
+            return self._model, self._signature
+
+
+class MicroBatcher:
+    """Coalesces concurrent predict calls into one vectorized model.predict"""
+
+    def __init__(self, cache: ModelCache, window_ms: float = BATCH_WINDOW_MS, max_rows: int = MAX_BATCH_ROWS):
+        self.cache = cache
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self.latency = LatencyRecorder()
+        self.batches = 0
+        self._batch_rows = deque(maxlen=1000)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, rows: Union[List[List[float]], List[str]]) -> Tuple[List[float], Tuple[int, int]]:
+        """Predict numeric feature rows, or raw texts for models that accept text"""
+        start = time.perf_counter()
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        features = list(rows) if rows and isinstance(rows[0], str) else np.asarray(rows, dtype=np.float64)
+        await self._queue.put((features, future))
+        try:
+            return await future
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.window
+            while rows < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            await self._dispatch(batch, loop)
+
+    async def _dispatch(self, batch, loop):
+        try:
+            model, version = await loop.run_in_executor(None, self.cache.get)
+            accepts_text = getattr(model, "accepts_text", False)
+            width = getattr(model, "n_features_in_", None)
+            for features, future in batch:
+                if isinstance(features, list) != accepts_text:
+                    future.set_exception(ValueError(
+                        "This model predicts from texts, not feature rows" if accepts_text else "This model expects feature rows, not texts"
+                    ))
+                elif not accepts_text and (features.ndim != 2 or (width is not None and features.shape[1] != width)):
+                    future.set_exception(ValueError(f"Expected rows of {width} features"))
+            valid = [(features, future) for features, future in batch if not future.done()]
+            if not valid:
+                return
+            if accepts_text:
+                stacked = [text for features, _ in valid for text in features]
+            else:
+                stacked = np.vstack([features for features, _ in valid])
+            predictions = await loop.run_in_executor(None, model.predict, stacked)
+            self.batches += 1
+            self._batch_rows.append(len(stacked))
+            offset = 0
+            for features, future in valid:
+                if not future.done():
+                    future.set_result((predictions[offset:offset + len(features)].tolist(), version))
+                offset += len(features)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self):
+        return {
+            "requests": self.latency.summary(),
+            "batches": self.batches,
+            "mean_batch_rows": float(np.mean(self._batch_rows)) if self._batch_rows else 0.0,
+            "model_loads": self.cache.loads,
+        }
+
+
+model_batcher = None
+
+
+def get_model_batcher():
+    global model_batcher
+    if model_batcher is None:
+        model_batcher = MicroBatcher(ModelCache())
+    return model_batcher
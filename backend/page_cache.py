@@ -0,0 +1,395 @@
+import email.utils
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Page Cache Configuration
+PAGE_FETCH = os.getenv("PAGE_FETCH", "off")  # on: fetch each result's page and analyze its text as well
+PAGE_CACHE = os.getenv("PAGE_CACHE", "on")  # on or off
+PAGE_CACHE_DIR = os.getenv("PAGE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pages"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+PAGE_FETCH_TIMEOUT = 10
+PAGE_MAX_BYTES = int(os.getenv("PAGE_MAX_BYTES", str(2 * 1024 * 1024)))  # longer bodies are truncated
+PAGE_TEXT_CHARS = int(os.getenv("PAGE_TEXT_CHARS", "5000"))  # page text kept per result
+PAGE_USER_AGENT = "ipl-analysis-agent/1.0"
+# Responses with Last-Modified but no explicit lifetime stay fresh for a
+# tenth of their age (RFC 9111, 4.2.2), at most this long
+PAGE_HEURISTIC_MAX_SECONDS = 24 * 3600
+# Evicting stops once the cache is this far under its budget
+PAGE_CACHE_LOW_WATER = 0.9
+
+_SCRIPT = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_SPACE = re.compile(r"\s+")
+_CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+_COUNTERS = ("requests", "fresh_hits", "revalidated", "stale_served", "downloads", "not_stored", "errors",
+             "evictions", "discarded", "bytes_downloaded", "bytes_from_cache")
+
+
+def html_to_text(body: bytes, content_type: str = "") -> str:
+    """Readable text of an HTML or plain-text body; other media types have none"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type and not media_type.startswith("text/") and "html" not in media_type:
+        return ""
+    match = _CHARSET.search(content_type)
+    try:
+        text = body.decode(match.group(1) if match else "utf-8", "replace")
+    except LookupError:
+        text = body.decode("utf-8", "replace")
+    if media_type != "text/plain":
+        text = _TAG.sub(" ", _COMMENT.sub(" ", _SCRIPT.sub(" ", text)))
+        text = html.unescape(text)
+    return _SPACE.sub(" ", text).strip()
+
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness(headers, now: float) -> Optional[float]:
+    """Time until which a response may be served without revalidation; None if it must not be stored.
+
+    This is a private cache: ``private`` responses are kept and ``s-maxage``
+    does not apply.
+    """
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return now
+    age = _seconds(headers.get("Age")) or 0
+    max_age = _seconds(directives.get("max-age"))
+    if max_age is not None:
+        return now + max_age - age
+    date = _http_date(headers.get("Date")) or now
+    if headers.get("Expires") is not None:
+        expires = _http_date(headers["Expires"])
+        # An invalid Expires means already expired
+        return now + (expires - date) - age if expires is not None else now
+    last_modified = _http_date(headers.get("Last-Modified"))
+    if last_modified is not None and last_modified < date:
+        return now + min((date - last_modified) / 10, PAGE_HEURISTIC_MAX_SECONDS) - age
+    return now
+
+
+class Page:
+    """A fetched page body and where it came from: downloaded, fresh (cache), revalidated (304) or stale"""
+
+    __slots__ = ("url", "body", "content_type", "source")
+
+    def __init__(self, url: str, body: bytes, content_type: str, source: str):
+        self.url = url
+        self.body = body
+        self.content_type = content_type
+        self.source = source
+
+    @property
+    def from_cache(self) -> bool:
+        return self.source != "downloaded"
+
+    def text(self, limit: int = PAGE_TEXT_CHARS) -> str:
+        return html_to_text(self.body, self.content_type)[:limit]
+
+
+class PageCache:
+    """HTTP cache for source pages, shared by jobs and kept on disk across runs.
+
+    Each URL is one file: a JSON header line (validators, content type,
+    freshness) and the zlib-compressed body. Fresh entries are served
+    without a request, stale ones are revalidated with If-None-Match /
+    If-Modified-Since so an unchanged page costs a 304. Files are evicted
+    least recently used first once they exceed ``max_bytes``.
+    """
+
+    def __init__(self, directory: str = PAGE_CACHE_DIR, max_bytes: int = PAGE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self.counts = dict.fromkeys(_COUNTERS, 0)
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        """Rebuild the LRU index from the directory, which other workers write to as well"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+        self._sizes = OrderedDict((name, size) for _, name, size in sorted(entries))
+        self._bytes = sum(self._sizes.values())
+
+    def _touch(self, key: str, size: int):
+        old = self._sizes.pop(key, None)
+        self._bytes += size - (old or 0)
+        self._sizes[key] = size
+
+    def _evict(self):
+        if self._bytes <= self.max_bytes:
+            return
+        self._scan()
+        target = self.max_bytes * PAGE_CACHE_LOW_WATER
+        while self._sizes and self._bytes > target:
+            key, size = self._sizes.popitem(last=False)
+            self._bytes -= size
+            self.counts["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        key = self._key(url)
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            # Touched on read: eviction goes by modification time after a rescan
+            os.utime(self._path(key))
+        except OSError:
+            return None
+        line, _, compressed = data.partition(b"\n")
+        try:
+            entry = json.loads(line)
+            entry["fresh_until"] = float(entry["fresh_until"])
+            entry["body"] = zlib.decompress(compressed)
+        except (ValueError, TypeError, KeyError, zlib.error) as e:
+            # A torn or corrupt file is a miss: drop it so the page is fetched and stored again
+            logger.warning(f"[page-cache] Discarding unreadable entry for {url}: {e}")
+            self._discard(key)
+            return None
+        if entry.get("url") != url:
+            return None
+        entry["compressed"] = compressed
+        with self._lock:
+            self._touch(key, len(data))
+        return entry
+
+    def _discard(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+        with self._lock:
+            self._bytes -= self._sizes.pop(key, 0)
+            self.counts["discarded"] += 1
+
+    def _store(self, entry: Dict[str, Any]):
+        key = self._key(entry["url"])
+        header = {name: value for name, value in entry.items() if name not in ("compressed", "body")}
+        data = json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n" + entry["compressed"]
+        if len(data) > self.max_bytes // 4:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[page-cache] Could not store {entry['url']}: {e}")
+            return
+        with self._lock:
+            self._touch(key, len(data))
+            self._evict()
+
+    def _serve(self, entry: Dict[str, Any], source: str) -> Page:
+        body = entry["body"]
+        with self._lock:
+            self.counts[{"fresh": "fresh_hits", "revalidated": "revalidated", "stale": "stale_served"}[source]] += 1
+            self.counts["bytes_from_cache"] += len(body)
+        return Page(entry["url"], body, entry.get("content_type", ""), source)
+
+    @staticmethod
+    def _read_body(response: requests.Response) -> bytes:
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= PAGE_MAX_BYTES:
+                break
+        return b"".join(chunks)[:PAGE_MAX_BYTES]
+
+    def fetch(self, url: str, session: Optional[requests.Session] = None,
+              timeout: float = PAGE_FETCH_TIMEOUT) -> Optional[Page]:
+        """The page at ``url``, from the cache when still fresh or unchanged; None if it cannot be had"""
+        with self._lock:
+            self.counts["requests"] += 1
+        entry = self._load(url)
+        now = time.time()
+        if entry is not None and now < entry["fresh_until"]:
+            return self._serve(entry, "fresh")
+
+        headers = {"User-Agent": PAGE_USER_AGENT}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = (session or requests).get(url, headers=headers, timeout=timeout, stream=True)
+            try:
+                if response.status_code == 304 and entry is not None:
+                    fresh_until = freshness(response.headers, now)
+                    if fresh_until is not None:
+                        entry["fresh_until"] = fresh_until
+                        entry["etag"] = response.headers.get("ETag", entry.get("etag"))
+                        entry["last_modified"] = response.headers.get("Last-Modified", entry.get("last_modified"))
+                        self._store(entry)
+                    return self._serve(entry, "revalidated")
+                body = self._read_body(response)
+            finally:
+                response.close()
+        except requests.RequestException as e:
+            with self._lock:
+                self.counts["errors"] += 1
+            logger.warning(f"[page-cache] Could not fetch {url}: {e}")
+            # A stale copy beats none (RFC 9111, 4.2.4)
+            return self._serve(entry, "stale") if entry is not None else None
+
+        with self._lock:
+            self.counts["downloads"] += 1
+            self.counts["bytes_downloaded"] += len(body)
+        if response.status_code != 200:
+            with self._lock:
+                self.counts["errors"] += 1
+            if response.status_code >= 500 and entry is not None:
+                return self._serve(entry, "stale")
+            return None
+        content_type = response.headers.get("Content-Type", "")
+        fresh_until = freshness(response.headers, now)
+        etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+        # Without a lifetime or a validator an entry could never be used
+        if fresh_until is None or (fresh_until <= now and not (etag or last_modified)):
+            with self._lock:
+                self.counts["not_stored"] += 1
+        else:
+            self._store({
+                "url": url,
+                "content_type": content_type,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fresh_until": fresh_until,
+                "stored_at": now,
+                "compressed": zlib.compress(body, 6),
+            })
+        return Page(url, body, content_type, "downloaded")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            served = self.counts["bytes_from_cache"]
+            total = served + self.counts["bytes_downloaded"]
+            return dict(
+                self.counts,
+                cache_byte_ratio=served / total if total else 0.0,
+                entries=len(self._sizes),
+                stored_bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                directory=self.directory,
+            )
+
+
+class NullPageCache(PageCache):
+    """PAGE_CACHE=off: every page is downloaded in full, nothing is kept"""
+
+    def __init__(self):
+        self.directory = None
+        self.max_bytes = 0
+        self._lock = threading.Lock()
+        self._sizes = OrderedDict()
+        self._bytes = 0
+        self.counts = dict.fromkeys(_COUNTERS, 0)
+
+    def _load(self, url: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def _store(self, entry: Dict[str, Any]):
+        pass
+
+
+def new_fetch_summary() -> Dict[str, int]:
+    return {"pages": 0, "failed": 0, "downloaded_bytes": 0, "cached_bytes": 0, "fresh": 0, "revalidated": 0}
+
+
+def apply_pages(results: List[Any], pages: List[Optional[Page]],
+                summary: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Set each result's content to the text of its page; returns the job's fetch summary"""
+    summary = summary if summary is not None else new_fetch_summary()
+    for result, page in zip(results, pages):
+        if page is None:
+            summary["failed"] += 1
+            continue
+        result.content = page.text()
+        summary["pages"] += 1
+        summary["cached_bytes" if page.from_cache else "downloaded_bytes"] += len(page.body)
+        if page.source in ("fresh", "revalidated"):
+            summary[page.source] += 1
+    return summary
+
+
+def format_page_stats(stats: Optional[Dict[str, Any]]) -> str:
+    if not stats or not stats["requests"]:
+        return f"- No pages fetched (PAGE_FETCH={PAGE_FETCH})"
+    return (
+        f"- {stats['requests']} pages: {stats['fresh_hits']} fresh from cache, {stats['revalidated']} revalidated "
+        f"(304), {stats['downloads']} downloaded\n"
+        f"- {stats['bytes_downloaded']:,} bytes downloaded, {stats['bytes_from_cache']:,} served from cache "
+        f"({stats['cache_byte_ratio']:.0%})"
+    )
+
+
+page_cache = None
+
+
+def get_page_cache() -> PageCache:
+    global page_cache
+    if page_cache is None:
+        page_cache = PageCache() if PAGE_CACHE == "on" else NullPageCache()
+    return page_cache
@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, Type
+
+logger = logging.getLogger(__name__)
+
+# Payload Configuration
+# "off" sends fields as plain JSON, "zlib" inlines a compressed payload and
+# "blob" writes the compressed payload to a local store and sends a reference.
+PAYLOAD_ENCODING = os.getenv("PAYLOAD_ENCODING", "off")
+PAYLOAD_THRESHOLD = int(os.getenv("PAYLOAD_THRESHOLD", "16384"))
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(os.path.dirname(__file__), ".blobs"))
+BLOB_TTL_SECONDS = int(os.getenv("BLOB_TTL_SECONDS", "3600"))
+
+ZLIB_PREFIX = "zlib:"
+BLOB_PREFIX = "blob:"
+# Routing fields stay on the message itself, outside the packed payload
+ENVELOPE_FIELDS = ("traceparent", "job_id")
+
+
+class BlobStore:
+    """Content-addressed store for payloads shared between local processes"""
+
+    def __init__(self, root: str = BLOB_STORE_DIR, ttl: int = BLOB_TTL_SECONDS):
+        self.root = root
+        self.ttl = ttl
+        self._last_prune = 0.0
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        # Identical payloads (e.g. one EDA result sent to two agents) are stored once;
+        # reusing a blob renews its TTL, since a new message now refers to it
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self._maybe_prune()
+        return key
+
+    def get(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def _maybe_prune(self):
+        now = time.time()
+        if now - self._last_prune < self.ttl / 10:
+            return
+        self._last_prune = now
+        for name in os.listdir(self.root):
+            path = self._path(name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class PayloadStats:
+    """Bytes-on-wire and (de)serialization time, aggregated per hop"""
+
+    def __init__(self):
+        self._hops: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _hop(self, hop: str) -> Dict[str, float]:
+        return self._hops.setdefault(hop, {
+            "messages": 0,
+            "encoded_messages": 0,
+            "raw_bytes": 0,
+            "wire_bytes": 0,
+            "encode_seconds": 0.0,
+            "decode_seconds": 0.0,
+        })
+
+    def record_encode(self, hop: str, raw_bytes: int, wire_bytes: int, seconds: float, encoded: bool):
+        with self._lock:
+            stats = self._hop(hop)
+            stats["messages"] += 1
+            stats["encoded_messages"] += int(encoded)
+            stats["raw_bytes"] += raw_bytes
+            stats["wire_bytes"] += wire_bytes
+            stats["encode_seconds"] += seconds
+
+    def record_decode(self, hop: str, seconds: float):
+        with self._lock:
+            self._hop(hop)["decode_seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {hop: dict(stats) for hop, stats in self._hops.items()}
+
+
+payload_stats = PayloadStats()
+_blob_store = None
+
+
+def get_blob_store() -> BlobStore:
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore()
+    return _blob_store
+
+
+def pack_message(model_cls: Type, hop: str, **fields: Any):
+    """Build a message, compressing its payload fields when they are large"""
+    start = time.perf_counter()
+    envelope = {name: fields.pop(name) for name in ENVELOPE_FIELDS if name in fields}
+    if PAYLOAD_ENCODING == "off":
+        # The plain message is the uncompressed baseline the other modes are compared with
+        message = model_cls(**envelope, **fields)
+        size = len(message.json())
+        payload_stats.record_encode(hop, size, size, time.perf_counter() - start, False)
+        return message
+    raw = json.dumps(fields, separators=(",", ":")).encode("utf-8")
+    if len(raw) < PAYLOAD_THRESHOLD:
+        message = model_cls(**envelope, **fields)
+        payload_stats.record_encode(hop, len(raw), len(message.json()), time.perf_counter() - start, False)
+        return message
+
+    compressed = zlib.compress(raw, 6)
+    if PAYLOAD_ENCODING == "blob":
+        packed = BLOB_PREFIX + get_blob_store().put(compressed)
+    else:
+        packed = ZLIB_PREFIX + base64.b64encode(compressed).decode("ascii")
+    message = model_cls(packed=packed, **envelope)
+    payload_stats.record_encode(hop, len(raw), len(message.json()), time.perf_counter() - start, True)
+    return message
+
+
+def unpack_message(message, hop: str) -> Dict[str, Any]:
+    """Return the payload fields of a message built by pack_message"""
+    packed = getattr(message, "packed", None)
+    if not packed:
+        return message.dict(exclude={"packed", *ENVELOPE_FIELDS})
+
+    start = time.perf_counter()
+    if packed.startswith(BLOB_PREFIX):
+        compressed = get_blob_store().get(packed[len(BLOB_PREFIX):])
+    elif packed.startswith(ZLIB_PREFIX):
+        compressed = base64.b64decode(packed[len(ZLIB_PREFIX):])
+    else:
+        raise ValueError(f"Unknown payload encoding on hop {hop}")
+    fields = json.loads(zlib.decompress(compressed))
+    payload_stats.record_decode(hop, time.perf_counter() - start)
+    return fields
+
+
+def format_payload_stats() -> str:
+    lines = []
+    for hop, stats in payload_stats.snapshot().items():
+        ratio = stats["wire_bytes"] / stats["raw_bytes"] if stats["raw_bytes"] else 1.0
+        lines.append(
+            f"- {hop}: {stats['messages']} msgs, {stats['raw_bytes']} -> {stats['wire_bytes']} bytes "
+            f"({ratio:.0%}), encode {stats['encode_seconds'] * 1000:.2f} ms, "
+            f"decode {stats['decode_seconds'] * 1000:.2f} ms"
+        )
+    return "\n".join(lines) or f"- Payload encoding: {PAYLOAD_ENCODING}"
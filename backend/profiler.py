@@ -0,0 +1,275 @@
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profiling Configuration
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_DEPTH = int(os.getenv("PROFILE_MAX_DEPTH", "64"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+PROFILE_TOP_ALLOCATIONS = 10
+PROFILE_FLUSH_SECONDS = 30  # longest wait for a job's pending allocation snapshots
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame, max_depth: int = PROFILE_MAX_DEPTH) -> str:
+    """Render a frame's stack root-first, as in the collapsed flamegraph format.
+
+    Frames from the executor machinery below the profiled call are dropped.
+    """
+    labels = []
+    while frame is not None and len(labels) < max_depth and frame.f_code is not _run_profiled.__code__:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StageProfile:
+    """Time, samples and allocations attributed to one pipeline stage"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.samples: Counter = Counter()
+        self.peak_bytes = 0
+        self.allocations: List[Dict[str, Any]] = []
+
+    def to_dict(self, samples: Counter) -> Dict[str, Any]:
+        """``samples`` is a copy of ``self.samples`` taken under the profiler's lock"""
+        return {
+            "wall_seconds": round(self.wall_seconds, 4),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "samples": sum(samples.values()),
+            "top_frames": [
+                {"frame": stack.rsplit(";", 1)[-1], "samples": count}
+                for stack, count in self._leaf_counts(samples).most_common(10)
+            ],
+            # tracemalloc traces the whole process: the allocation figures also
+            # count every other job (profiled or not) running during the stage
+            "allocation_scope": "process",
+            "peak_traced_bytes": self.peak_bytes,
+            "top_allocations": self.allocations,
+        }
+
+    @staticmethod
+    def _leaf_counts(samples: Counter) -> Counter:
+        leaves: Counter = Counter()
+        for stack, count in samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves
+
+
+class JobProfiler:
+    """Sampling CPU and tracemalloc profile of one job, split by stage"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.stages: Dict[str, StageProfile] = {}
+        # Per asyncio task, so stages that overlap (e.g. cleaning pages while
+        # later pages download) each get their own executor calls
+        self._current: contextvars.ContextVar = contextvars.ContextVar(f"stage_{task_id}", default=None)
+        # Executor threads currently running this job's work, and the stage they run for
+        self.threads: Dict[int, StageProfile] = {}
+        # Stages in progress, whose traced-memory peak the sampler tracks
+        self.active = set()
+        self._pending: List[Future] = []
+        # Most profiled jobs seen running at once while this one ran
+        self.concurrent_jobs = 1
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            profile = self.stages.setdefault(name, StageProfile(name))
+        token = self._current.set(profile)
+        # Snapshots block whichever thread takes them, so they are taken and
+        # compared on the snapshot thread rather than on the event loop
+        before = _submit_snapshot(tracemalloc.take_snapshot) if tracemalloc.is_tracing() else None
+        with self._lock:
+            self.active.add(profile)
+        self._note_traced(profile)
+        start = time.perf_counter()
+        try:
+            yield profile
+        finally:
+            profile.wall_seconds += time.perf_counter() - start
+            with self._lock:
+                self.active.discard(profile)
+            self._note_traced(profile)
+            if before is not None:
+                self._pending.append(_submit_snapshot(self._record_allocations, profile, before))
+            self._current.reset(token)
+
+    @staticmethod
+    def _note_traced(profile: StageProfile):
+        # Cheap, unlike a snapshot; covers stages shorter than the sampling interval
+        if tracemalloc.is_tracing():
+            profile.peak_bytes = max(profile.peak_bytes, tracemalloc.get_traced_memory()[0])
+
+    def _record_allocations(self, profile: StageProfile, before: Future):
+        try:
+            profile.allocations = self._top_allocations(before.result(), tracemalloc.take_snapshot())
+        except RuntimeError:
+            # tracemalloc was stopped after the last profiled job finished
+            pass
+
+    def flush(self, timeout: float = PROFILE_FLUSH_SECONDS):
+        """Wait for the allocation snapshots of finished stages; call off the event loop"""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                logger.warning(f"[profiler] {self.task_id}: allocation snapshot failed: {e}")
+
+    @staticmethod
+    def _top_allocations(before, after) -> List[Dict[str, Any]]:
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+        return [
+            {"location": str(stat.traceback), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff}
+            for stat in diff[:PROFILE_TOP_ALLOCATIONS]
+            if stat.size_diff > 0
+        ]
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Register the executor thread running ``func`` for sampling under the current stage"""
+        profile = self._current.get()
+        if profile is None:
+            return func
+        return functools.partial(_run_profiled, self, profile, func)
+
+    def sample(self, frames: Dict[int, Any], traced_bytes: int = 0):
+        with self._lock:
+            threads = list(self.threads.items())
+        stacks = [(profile, _collapse(frames[ident])) for ident, profile in threads if ident in frames]
+        # The API reads the counters while the job runs (see _samples)
+        with self._lock:
+            for profile in self.active:
+                profile.peak_bytes = max(profile.peak_bytes, traced_bytes)
+            for profile, stack in stacks:
+                profile.samples[stack] += 1
+
+    def _samples(self) -> List[tuple]:
+        """Each stage with a copy of its sample counts, safe to iterate while the sampler runs"""
+        with self._lock:
+            return [(name, profile, Counter(profile.samples)) for name, profile in list(self.stages.items())]
+
+    def collapsed(self) -> str:
+        """Folded stacks (``stage;frame;...;frame count``), readable by flamegraph.pl and speedscope"""
+        lines = []
+        for name, _, samples in self._samples():
+            for stack, count in sorted(samples.items()):
+                lines.append(f"{name};{stack} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "task_id": self.task_id,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "concurrent_profiled_jobs": self.concurrent_jobs,
+            "stages": {name: profile.to_dict(samples) for name, profile, samples in self._samples()},
+        }
+
+
+def _run_profiled(profiler: JobProfiler, profile: StageProfile, func: Callable[..., Any], *args, **kwargs):
+    ident = threading.get_ident()
+    with profiler._lock:
+        profiler.threads[ident] = profile
+    cpu_start = time.thread_time()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        cpu_seconds = time.thread_time() - cpu_start
+        with profiler._lock:
+            profile.cpu_seconds += cpu_seconds
+            profiler.threads.pop(ident, None)
+
+
+_snapshot_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _submit_snapshot(func: Callable[..., Any], *args) -> Future:
+    """Run tracemalloc snapshot work in order on one dedicated thread"""
+    global _snapshot_executor
+    if _snapshot_executor is None:
+        _snapshot_executor = ThreadPoolExecutor(1, thread_name_prefix="profiler-snapshot")
+    return _snapshot_executor.submit(func, *args)
+
+
+class Sampler:
+    """One background thread that samples the executor threads of all profiled jobs.
+
+    The thread and tracemalloc only run while at least one job is being profiled.
+    Each tick also records the traced memory as the peak of every stage in
+    progress; like the allocations, it is a process-wide figure. Only threads
+    of this process are sampled, so profiled jobs keep their CPU stages off
+    the process pool.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.profilers: Dict[str, JobProfiler] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+
+    def register(self, profiler: JobProfiler):
+        with self._lock:
+            self.profilers[profiler.task_id] = profiler
+            for running in self.profilers.values():
+                running.concurrent_jobs = max(running.concurrent_jobs, len(self.profilers))
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+                self._started_tracemalloc = True
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def unregister(self, profiler: JobProfiler):
+        with self._lock:
+            self.profilers.pop(profiler.task_id, None)
+            if not self.profilers and self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def _run(self):
+        logger.info("[profiler] Sampler started")
+        while True:
+            with self._lock:
+                profilers = list(self.profilers.values())
+                if not profilers:
+                    self._thread = None
+                    break
+            frames = sys._current_frames()
+            traced_bytes = tracemalloc.get_traced_memory()[0]
+            for profiler in profilers:
+                profiler.sample(frames, traced_bytes)
+            del frames
+            time.sleep(self.interval)
+        logger.info("[profiler] Sampler stopped")
+
+
+sampler = None
+
+
+def get_sampler():
+    global sampler
+    if sampler is None:
+        sampler = Sampler()
+    return sampler
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import logging
 from uagents import Bureau
@@ -11,6 +12,7 @@ from agents import (
     setup_ai_tools,
     analysis_results
 )
+from agent_service import AgentService
 from data_schemas import QueryMessage
 
 # Configure logging
@@ -21,6 +23,14 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 def main():
+    parser = argparse.ArgumentParser(description="Run the agent pipeline")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the agents running and take queries from the agent service socket")
+    args = parser.parse_args()
+    if args.serve:
+        AgentService().run()
+        return
+
     setup_ai_tools()
 
     query = input("Enter your search query (e.g., 'Cricket trends in 2025'): ").strip()
@@ -0,0 +1,63 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class SearchResult:
+    """A single search hit, kept structured until it has to be shown as text"""
+
+    __slots__ = ("title", "url", "snippet", "content")
+
+    def __init__(self, title: str = "", url: str = "", snippet: str = "", content: str = ""):
+        self.title = title
+        self.url = url
+        self.snippet = snippet
+        # Text of the page itself, when pages are fetched (see page_cache.py)
+        self.content = content
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any]) -> "SearchResult":
+        """Build from a Google CSE item or SerpAPI organic result"""
+        return cls(item.get("title") or "", item.get("link") or "", item.get("snippet") or "")
+
+    def text(self) -> str:
+        """Content used for analysis; the URL is metadata, not content"""
+        if self.content:
+            return f"{self.title} {self.snippet} {self.content}"
+        return f"{self.title} {self.snippet}"
+
+    def render(self) -> str:
+        return f"Title: {self.title}\nURL: {self.url}\nSnippet: {self.snippet}"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"title": self.title, "url": self.url, "snippet": self.snippet}
+
+    def __repr__(self):
+        return f"SearchResult(title={self.title!r}, url={self.url!r})"
+
+
+def results_from_items(items: Iterable[Dict[str, Any]]) -> List[SearchResult]:
+    return [SearchResult.from_item(item) for item in items]
+
+
+def render_results(results: List[SearchResult]) -> str:
+    """Render results in the legacy 'Title/URL/Snippet' text layout"""
+    return "\n".join(result.render() for result in results)
+
+
+def total_chars(results: List[SearchResult]) -> int:
+    return sum(len(result.title) + len(result.snippet) + len(result.content) for result in results)
+
+
+def to_columns(results: List[SearchResult]) -> Dict[str, List[str]]:
+    """Columnar layout used in agent messages"""
+    return {
+        "titles": [result.title for result in results],
+        "urls": [result.url for result in results],
+        "snippets": [result.snippet for result in results],
+        "contents": [result.content for result in results],
+    }
+
+
+def from_columns(titles: List[str], urls: List[str], snippets: List[str],
+                 contents: Optional[List[str]] = None) -> List[SearchResult]:
+    contents = contents or [""] * len(titles)
+    return [SearchResult(*fields) for fields in zip(titles, urls, snippets, contents)]
@@ -0,0 +1,305 @@
+import hashlib
+import logging
+import os
+import pickle
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Stage Cache Configuration
+STAGE_CACHE = os.getenv("STAGE_CACHE", "on")  # on or off
+STAGE_CACHE_MAX_BYTES = int(os.getenv("STAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Disk tier; off unless a directory is given
+STAGE_CACHE_DIR = os.getenv("STAGE_CACHE_DIR", "")
+STAGE_CACHE_DISK_MAX_BYTES = int(os.getenv("STAGE_CACHE_DISK_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+STAGE_CACHE_PRUNE_SECONDS = 60
+
+# Leads each disk entry: the seconds the stage took to compute it
+_SECONDS = struct.Struct("<d")
+
+
+def _feed(hasher, value: Any):
+    """Hash ``value`` by content; containers and strings are length-prefixed so that inputs cannot collide"""
+    if isinstance(value, str):
+        data = value.encode("utf-8", "surrogatepass")
+        hasher.update(b"s%d:" % len(data))
+        hasher.update(data)
+    elif isinstance(value, bytes):
+        hasher.update(b"b%d:" % len(value))
+        hasher.update(value)
+    elif value is None or isinstance(value, (bool, int, float)):
+        hasher.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(b"l%d:" % len(value))
+        for item in value:
+            _feed(hasher, item)
+    elif isinstance(value, dict):
+        hasher.update(b"d%d:" % len(value))
+        for key in sorted(value, key=repr):
+            _feed(hasher, key)
+            _feed(hasher, value[key])
+    else:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        hasher.update(b"p%d:" % len(data))
+        hasher.update(data)
+
+
+def code_version(*functions: Callable) -> str:
+    """Hash of the source of the modules defining ``functions`` and their upper-case settings.
+
+    Editing a stage's module or changing its configuration (e.g. an
+    environment variable read at import) changes the version, and with it
+    every cache key of the stage.
+    """
+    hasher = hashlib.blake2b(digest_size=8)
+    modules = {function.__module__: sys.modules[function.__module__] for function in functions}
+    for name in sorted(modules):
+        module = modules[name]
+        with open(module.__file__, "rb") as f:
+            hasher.update(f.read())
+        for setting, value in sorted(vars(module).items()):
+            if setting.isupper() and isinstance(value, (bool, int, float, str, tuple)):
+                hasher.update(f"{setting}={value!r};".encode())
+    return hasher.hexdigest()
+
+
+class Stage:
+    """A deterministic pipeline stage whose results can be reused for identical input"""
+
+    def __init__(self, name: str, *functions: Callable):
+        self.name = name
+        self.functions = functions
+        self._version: Optional[str] = None
+
+    @property
+    def version(self) -> str:
+        # Computed on first use: stages are declared while their calling module
+        # is still importing, before all of its settings exist
+        if self._version is None:
+            self._version = code_version(*self.functions)
+        return self._version
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.seconds_saved = 0.0
+        self.compute_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "calls": self.calls,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.calls - hits,
+            "hit_rate": hits / self.calls if self.calls else 0.0,
+            "seconds_saved": self.seconds_saved,
+            "compute_seconds": self.compute_seconds,
+            "lookup_seconds": self.lookup_seconds,
+        }
+
+
+class StageCache:
+    """Memoizes deterministic stages by a content hash of stage name, version and input.
+
+    Results are kept pickled, so callers never share (and cannot mutate) a
+    cached object, in a byte-bounded LRU; with a directory they also go to a
+    disk tier that outlives the process and is shared by API workers.
+    """
+
+    def __init__(self, max_bytes: int = STAGE_CACHE_MAX_BYTES, directory: str = STAGE_CACHE_DIR,
+                 disk_max_bytes: int = STAGE_CACHE_DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory or None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._stats: Dict[str, StageStats] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(stage: Stage, *inputs: Any) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        _feed(hasher, (stage.name, stage.version, inputs))
+        return f"{stage.name}-{hasher.hexdigest()}"
+
+    def _stage_stats(self, stage: Stage) -> StageStats:
+        stats = self._stats.get(stage.name)
+        if stats is None:
+            stats = self._stats[stage.name] = StageStats()
+        return stats
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key: str, blob: bytes, seconds: float):
+        if len(blob) > self.max_bytes // 4:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[0])
+        self._entries[key] = (blob, seconds)
+        self._bytes += len(blob)
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _read_disk(self, key: str) -> Optional[Tuple[bytes, float]]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            # Touched on read: the disk tier evicts least recently used files
+            os.utime(self._path(key))
+        except OSError:
+            return None
+        (seconds,) = _SECONDS.unpack_from(data)
+        return data[_SECONDS.size:], seconds
+
+    def _write_disk(self, key: str, blob: bytes, seconds: float):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_SECONDS.pack(seconds))
+                f.write(blob)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"[stage-cache] Could not write {key}: {e}")
+        self._maybe_prune()
+
+    def _maybe_prune(self):
+        now = time.time()
+        if now - self._last_prune < STAGE_CACHE_PRUNE_SECONDS:
+            return
+        self._last_prune = now
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def get(self, stage: Stage, key: str) -> Optional[Any]:
+        """The cached result for ``key``, or None"""
+        start = time.perf_counter()
+        with self._lock:
+            stats = self._stage_stats(stage)
+            stats.calls += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                stats.memory_hits += 1
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is not None:
+                with self._lock:
+                    stats.disk_hits += 1
+                    self._remember(key, *entry)
+        value = None
+        if entry is not None:
+            try:
+                value = pickle.loads(entry[0])
+            except Exception as e:
+                # e.g. a disk entry written by an incompatible library version
+                logger.warning(f"[stage-cache] Dropping unreadable {key}: {e}")
+                entry = None
+        with self._lock:
+            if entry is not None:
+                stats.seconds_saved += entry[1]
+            stats.lookup_seconds += time.perf_counter() - start
+        return value
+
+    def put(self, stage: Stage, key: str, value: Any, seconds: float):
+        """Cache ``value``, which took ``seconds`` to compute"""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._stage_stats(stage).compute_seconds += seconds
+            self._remember(key, blob, seconds)
+        if self.directory:
+            self._write_disk(key, blob, seconds)
+
+    def call(self, stage: Stage, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """``func(*args, **kwargs)``, reused when ``args`` were seen before.
+
+        Only positional arguments form the key; keyword arguments are for
+        things that do not change the result, such as cancellation checks.
+        """
+        return self.call_with_hit(stage, func, *args, **kwargs)[0]
+
+    def call_with_hit(self, stage: Stage, func: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        """Like ``call``, also returning whether the result came from the cache"""
+        key = self.key(stage, *args)
+        value = self.get(stage, key)
+        if value is not None:
+            return value, True
+        start = time.perf_counter()
+        value = func(*args, **kwargs)
+        self.put(stage, key, value, time.perf_counter() - start)
+        return value, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "disk": self.directory,
+                "stages": {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
+
+
+class NullStageCache(StageCache):
+    """STAGE_CACHE=off: every stage is computed, nothing is kept"""
+
+    def get(self, stage: Stage, key: str) -> Optional[Any]:
+        return None
+
+    def put(self, stage: Stage, key: str, value: Any, seconds: float):
+        pass
+
+    def call_with_hit(self, stage: Stage, func: Callable[..., Any], *args, **kwargs) -> Tuple[Any, bool]:
+        return func(*args, **kwargs), False
+
+
+def format_cache_stats(stats: Dict[str, Any]) -> str:
+    lines = [
+        f"- {name}: {stage['hits']}/{stage['calls']} hits ({stage['hit_rate']:.0%}), "
+        f"{stage['seconds_saved'] * 1000:.1f} ms saved"
+        for name, stage in stats["stages"].items()
+    ]
+    return "\n".join(lines) or "- No cached stages yet"
+
+
+stage_cache = None
+
+
+def get_stage_cache() -> StageCache:
+    global stage_cache
+    if stage_cache is None:
+        stage_cache = StageCache() if STAGE_CACHE == "on" else NullStageCache()
+    return stage_cache
@@ -0,0 +1,318 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# State Store Configuration
+# "memory" only works with a single API worker: each process would keep its own jobs
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "job_state.db"))
+STATE_MAX_JOBS = int(os.getenv("STATE_MAX_JOBS", "1000"))
+
+# Only jobs in these states are trimmed; queued and running jobs are kept
+TERMINAL_STATUSES = ("completed", "partial", "cancelled", "error")
+
+
+class StateStore:
+    """Job status, results and concurrency slots shared by every API worker.
+
+    Values are stored per (task_id, kind), where kind is e.g. "submitted",
+    "status", "results" or "profile". Slots implement the cross-worker limit on
+    running jobs, and cancel flags let any worker cancel a job another
+    worker is running.
+    """
+
+    # Whether other processes see this store, so cancel flags must be polled
+    shared = False
+
+    def put(self, task_id: str, kind: str, value: Any):
+        raise NotImplementedError
+
+    def put_nowait(self, task_id: str, kind: str, value: Any):
+        """put() without waiting on storage, for callers on the event loop.
+
+        Writes are applied in call order and get() sees them at once.
+        """
+        self.put(task_id, kind, value)
+
+    def get(self, task_id: str, kind: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def latest_task_id(self) -> Optional[str]:
+        raise NotImplementedError
+
+    def acquire_slot(self, task_id: str, limit: int) -> bool:
+        raise NotImplementedError
+
+    def release_slot(self, task_id: str):
+        raise NotImplementedError
+
+    def running_count(self) -> int:
+        raise NotImplementedError
+
+    def request_cancel(self, task_id: str) -> bool:
+        """Flag a running job for cancellation; False if no worker runs it"""
+        raise NotImplementedError
+
+    def cancel_requests(self, task_ids: Iterable[str]) -> List[str]:
+        """Return the task ids among ``task_ids`` that were flagged for cancellation"""
+        raise NotImplementedError
+
+
+class MemoryStateStore(StateStore):
+    """In-process store for a single worker; values are kept as live objects"""
+
+    def __init__(self, max_jobs: int = STATE_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._slots: Dict[str, bool] = {}
+        self._latest: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def put(self, task_id: str, kind: str, value: Any):
+        with self._lock:
+            if task_id not in self._jobs:
+                self._jobs[task_id] = {}
+                self._trim()
+            self._jobs[task_id][kind] = value
+            if kind == "submitted":
+                self._latest = task_id
+
+    def _trim(self):
+        finished = [
+            task_id for task_id, values in self._jobs.items()
+            if task_id not in self._slots and (values.get("status") or {}).get("status") in TERMINAL_STATUSES
+        ]
+        for task_id in finished[:max(0, len(self._jobs) - self.max_jobs)]:
+            del self._jobs[task_id]
+
+    def get(self, task_id: str, kind: str) -> Optional[Any]:
+        return self._jobs.get(task_id, {}).get(kind)
+
+    def latest_task_id(self) -> Optional[str]:
+        return self._latest
+
+    def acquire_slot(self, task_id: str, limit: int) -> bool:
+        with self._lock:
+            if len(self._slots) >= limit:
+                return False
+            self._slots[task_id] = False
+            return True
+
+    def release_slot(self, task_id: str):
+        with self._lock:
+            self._slots.pop(task_id, None)
+
+    def running_count(self) -> int:
+        return len(self._slots)
+
+    def request_cancel(self, task_id: str) -> bool:
+        with self._lock:
+            if task_id not in self._slots:
+                return False
+            self._slots[task_id] = True
+            return True
+
+    def cancel_requests(self, task_ids: Iterable[str]) -> List[str]:
+        return [task_id for task_id in task_ids if self._slots.get(task_id)]
+
+
+def process_started(pid: int) -> Optional[int]:
+    """Start time of process ``pid`` in clock ticks after boot; None where /proc is unavailable.
+
+    Together with the pid it identifies a worker: a pid alone may be reused,
+    e.g. by a worker of the next run after a container restart.
+    """
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Field 22; the command name before it may contain spaces and parentheses
+    return int(stat.rsplit(")", 1)[1].split()[19])
+
+
+class SQLiteStateStore(StateStore):
+    """Store in a local SQLite database (WAL mode) shared by the workers on one box"""
+
+    shared = True
+
+    def __init__(self, path: str = STATE_DB_PATH, max_jobs: int = STATE_MAX_JOBS):
+        self.path = path
+        self.max_jobs = max_jobs
+        self._local = threading.local()
+        self._puts = 0
+        # put_nowait() values not yet written, served by get() meanwhile
+        self._pending: Dict[tuple, str] = {}
+        self._pending_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="state_writer")
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS job_state (
+                    task_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    PRIMARY KEY (task_id, kind)
+                );
+                CREATE INDEX IF NOT EXISTS job_state_updated ON job_state (kind, updated);
+                CREATE TABLE IF NOT EXISTS job_slots (
+                    task_id TEXT PRIMARY KEY,
+                    pid INTEGER NOT NULL,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    started INTEGER
+                );
+            """)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(job_slots)")}
+            if "started" not in columns:
+                # Databases created before workers were keyed by start time
+                db.execute("ALTER TABLE job_slots ADD COLUMN started INTEGER")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def put(self, task_id: str, kind: str, value: Any):
+        self._write(task_id, kind, json.dumps(value, default=str))
+
+    def put_nowait(self, task_id: str, kind: str, value: Any):
+        # Encoded now, so later changes to ``value`` are not written
+        encoded = json.dumps(value, default=str)
+        with self._pending_lock:
+            self._pending[(task_id, kind)] = encoded
+        self._writer.submit(self._write_pending, task_id, kind, encoded)
+
+    def _write_pending(self, task_id: str, kind: str, encoded: str):
+        try:
+            self._write(task_id, kind, encoded)
+        except sqlite3.Error as e:
+            logger.error(f"[state] Could not write {kind} of {task_id}: {e}")
+        finally:
+            with self._pending_lock:
+                if self._pending.get((task_id, kind)) is encoded:
+                    del self._pending[(task_id, kind)]
+
+    def _write(self, task_id: str, kind: str, encoded: str):
+        db = self._connect()
+        db.execute(
+            "INSERT OR REPLACE INTO job_state (task_id, kind, value, updated) VALUES (?, ?, ?, ?)",
+            (task_id, kind, encoded, time.time()),
+        )
+        self._puts += 1
+        if self._puts % 100 == 0:
+            self._trim(db)
+
+    def _trim(self, db: sqlite3.Connection):
+        """Drop the oldest finished jobs beyond max_jobs"""
+        placeholders = ",".join("?" * len(TERMINAL_STATUSES))
+        db.execute(f"""
+            DELETE FROM job_state WHERE task_id IN (
+                SELECT task_id FROM job_state
+                WHERE kind = 'status' AND task_id NOT IN (SELECT task_id FROM job_slots)
+                  AND json_extract(value, '$.status') IN ({placeholders})
+                ORDER BY updated DESC LIMIT -1 OFFSET ?
+            )
+        """, (*TERMINAL_STATUSES, self.max_jobs))
+
+    def get(self, task_id: str, kind: str) -> Optional[Any]:
+        with self._pending_lock:
+            encoded = self._pending.get((task_id, kind))
+        if encoded is not None:
+            return json.loads(encoded)
+        row = self._connect().execute(
+            "SELECT value FROM job_state WHERE task_id = ? AND kind = ?", (task_id, kind)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest_task_id(self) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT task_id FROM job_state WHERE kind = 'submitted' ORDER BY updated DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def acquire_slot(self, task_id: str, limit: int) -> bool:
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("SELECT COUNT(*) FROM job_slots").fetchone()[0] >= limit:
+                self._reap_dead_workers(db)
+                if db.execute("SELECT COUNT(*) FROM job_slots").fetchone()[0] >= limit:
+                    db.execute("ROLLBACK")
+                    return False
+            pid = os.getpid()
+            db.execute("INSERT INTO job_slots (task_id, pid, started) VALUES (?, ?, ?)",
+                       (task_id, pid, process_started(pid)))
+            db.execute("COMMIT")
+            return True
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _reap_dead_workers(db: sqlite3.Connection):
+        """Free slots still held by workers that exited without releasing them"""
+        for pid, started in db.execute("SELECT DISTINCT pid, started FROM job_slots").fetchall():
+            try:
+                os.kill(pid, 0)
+                alive = True
+            except ProcessLookupError:
+                alive = False
+            except PermissionError:
+                # Alive, run by another user
+                alive = True
+            # A live process may be a different one that was given the same pid
+            if alive and (started is None or process_started(pid) in (None, started)):
+                continue
+            logger.warning(f"[state] Releasing slots of exited worker {pid}")
+            db.execute("DELETE FROM job_slots WHERE pid = ? AND started IS ?", (pid, started))
+
+    def release_slot(self, task_id: str):
+        self._connect().execute("DELETE FROM job_slots WHERE task_id = ?", (task_id,))
+
+    def running_count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM job_slots").fetchone()[0]
+
+    def request_cancel(self, task_id: str) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE job_slots SET cancel_requested = 1 WHERE task_id = ?", (task_id,)
+        )
+        return cursor.rowcount > 0
+
+    def cancel_requests(self, task_ids: Iterable[str]) -> List[str]:
+        task_ids = list(task_ids)
+        if not task_ids:
+            return []
+        placeholders = ",".join("?" * len(task_ids))
+        rows = self._connect().execute(
+            f"SELECT task_id FROM job_slots WHERE cancel_requested = 1 AND task_id IN ({placeholders})",
+            task_ids,
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+state_store = None
+
+
+def get_state_store():
+    global state_store
+    if state_store is None:
+        if STATE_BACKEND == "sqlite":
+            state_store = SQLiteStateStore()
+        elif STATE_BACKEND == "memory":
+            state_store = MemoryStateStore()
+        else:
+            raise ValueError(f"Unknown STATE_BACKEND {STATE_BACKEND!r}; use 'memory' or 'sqlite'")
+        logger.info(f"[state] Using {type(state_store).__name__}")
+    return state_store
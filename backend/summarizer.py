@@ -0,0 +1,115 @@
+import os
+import re
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from eda_engine import build_term_matrix, tfidf, tokenize
+
+# Summarizer Configuration
+SUMMARY_SENTENCES = int(os.getenv("SUMMARY_SENTENCES", "5"))
+SUMMARY_METHOD = os.getenv("SUMMARY_METHOD", "textrank")  # textrank or centroid
+# TextRank ranks this many sentences, pre-selected by centroid score; its graph grows quadratically
+SUMMARY_MAX_CANDIDATES = int(os.getenv("SUMMARY_MAX_CANDIDATES", "1500"))
+SUMMARY_MIN_WORDS = 6
+SUMMARY_MAX_CHARS = 400  # longer "sentences" are mostly navigation, tables or lists
+SUMMARY_REDUNDANCY = 0.6  # candidates this similar to a chosen sentence are skipped
+SUMMARY_POOL = 20  # top-ranked candidates per summary sentence considered when skipping redundant ones
+SUMMARY_QUERY_WEIGHT = 0.5
+TEXTRANK_DAMPING = 0.85
+TEXTRANK_MIN_SIMILARITY = 0.1  # weaker edges are dropped, which keeps the graph sparse
+TEXTRANK_ITERATIONS = 100
+TEXTRANK_TOLERANCE = 1e-6
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+# Snippets mark elided text with an ellipsis; the pieces around it are separate fragments
+_ELLIPSIS = re.compile(r"\s*(?:\.\.\.|…)\s*")
+
+
+def split_sentences(texts: List[str]) -> Tuple[List[str], np.ndarray]:
+    """Distinct, reasonably sized sentences of ``texts`` and the index of the text each came from"""
+    seen: Dict[str, int] = {}
+    for index, text in enumerate(texts):
+        for fragment in _ELLIPSIS.split(text):
+            for sentence in _SENTENCE_END.split(fragment):
+                sentence = sentence.strip()
+                if (len(sentence) <= SUMMARY_MAX_CHARS and len(sentence.split()) >= SUMMARY_MIN_WORDS
+                        and sentence not in seen):
+                    seen[sentence] = index
+    return list(seen), np.fromiter(seen.values(), dtype=np.int64, count=len(seen))
+
+
+def centroid_scores(weights: sparse.csr_matrix, vocabulary: np.ndarray, query: str) -> np.ndarray:
+    """Cosine of each sentence to the corpus centroid, plus its weight on query terms"""
+    centroid = np.asarray(weights.sum(axis=0)).ravel()
+    norm = np.linalg.norm(centroid)
+    scores = weights @ (centroid / norm) if norm else np.zeros(weights.shape[0])
+    query_columns = np.flatnonzero(np.isin(vocabulary, tokenize(query)))
+    if query_columns.size:
+        scores = scores + SUMMARY_QUERY_WEIGHT * np.asarray(weights[:, query_columns].sum(axis=1)).ravel()
+    return scores
+
+
+def textrank(weights: sparse.csr_matrix, prior: np.ndarray) -> np.ndarray:
+    """PageRank over the cosine-similarity graph of the sentences, teleporting by ``prior``.
+
+    Biasing the teleport toward the centroid (and query) scores keeps the
+    ranking on topic; a uniform prior gives plain TextRank.
+    """
+    n = weights.shape[0]
+    similarity = (weights @ weights.T).tocsr()
+    similarity.setdiag(0)
+    similarity.data[similarity.data < TEXTRANK_MIN_SIMILARITY] = 0
+    similarity.eliminate_zeros()
+    out_weight = np.asarray(similarity.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    transition = sparse.diags(np.where(dangling, 0.0, 1.0 / np.where(dangling, 1.0, out_weight))) @ similarity
+    transition_t = transition.T.tocsr()
+    total = prior.sum()
+    prior = prior / total if total > 0 else np.full(n, 1.0 / n)
+    rank = prior.copy()
+    for _ in range(TEXTRANK_ITERATIONS):
+        updated = (TEXTRANK_DAMPING * (transition_t @ rank + rank[dangling].sum() * prior)
+                   + (1 - TEXTRANK_DAMPING) * prior)
+        if np.abs(updated - rank).sum() < TEXTRANK_TOLERANCE:
+            return updated
+        rank = updated
+    return rank
+
+
+def summarize(texts: List[str], query: str = "", sentences: int = SUMMARY_SENTENCES,
+              method: str = SUMMARY_METHOD) -> List[Tuple[int, str]]:
+    """The ``sentences`` most representative, mutually distinct sentences as (text index, sentence)"""
+    candidates, origins = split_sentences(texts)
+    if not candidates:
+        return []
+    counts, vocabulary = build_term_matrix(candidates)
+    weights = tfidf(counts)
+    scores = centroid_scores(weights, vocabulary, query)
+    if method == "textrank" and len(candidates) > 2:
+        ranked = np.argsort(-scores, kind="stable")[:SUMMARY_MAX_CANDIDATES]
+        ranked = ranked[scores[ranked] > 0]
+        scores = np.zeros(len(candidates))
+        if ranked.size:
+            scores[ranked] = textrank(weights[ranked], centroid_scores(weights[ranked], vocabulary, query))
+
+    # Greedy pick down the ranking, skipping near-repeats of what was already picked
+    pool = np.argsort(-scores, kind="stable")[:sentences * SUMMARY_POOL]
+    pool = pool[scores[pool] > 0]
+    similarity = (weights[pool] @ weights[pool].T).toarray()
+    chosen: List[int] = []
+    for position in range(pool.size):
+        if len(chosen) == sentences:
+            break
+        if not chosen or similarity[position, chosen].max() <= SUMMARY_REDUNDANCY:
+            chosen.append(position)
+    return [(int(origins[pool[position]]), candidates[pool[position]]) for position in chosen]
+
+
+def render_summary(summary: List[Tuple[int, str]], sources: int) -> str:
+    """Summary as an answer; [n] cites the n-th source"""
+    if not summary:
+        return ""
+    lines = [f"- {sentence} [{index + 1}]" for index, sentence in summary]
+    return f"Key points from {sources} sources (extractive summary):\n" + "\n".join(lines)
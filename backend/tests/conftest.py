@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Backend modules import each other by flat name (see main.py, fastapi_server.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Importing fastapi_server creates the job state store; keep tests from writing job_state.db
+os.environ.setdefault("STATE_BACKEND", "memory")
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+
+from admission import DEFAULT_RETRY_AFTER_SECONDS, AdmissionQueue, QueuedRequest, QueueFull
+
+
+class Slots:
+    """Job slots for the queue: ``start`` succeeds while one is free"""
+
+    def __init__(self, free: int = 0):
+        self.free = free
+        self.started = []
+        self.published = {}
+        self.publishes = 0
+        self.failed = []
+
+    def start(self, request: QueuedRequest) -> bool:
+        if self.free <= 0:
+            return False
+        self.free -= 1
+        self.started.append(request.task_id)
+        return True
+
+    def publish(self, request: QueuedRequest, position: int, estimated_start):
+        self.published[request.task_id] = position
+        self.publishes += 1
+
+    def fail(self, request: QueuedRequest, error: Exception):
+        self.failed.append(request.task_id)
+
+
+def request(task_id: str, client: str = "a", priority: str = "normal") -> QueuedRequest:
+    return QueuedRequest(task_id, client, priority, {})
+
+
+def run(scenario):
+    asyncio.run(scenario())
+
+
+def test_starts_immediately_when_a_slot_is_free():
+    slots = Slots(free=1)
+    queue = AdmissionQueue(slots.start, slots.publish)
+    assert queue.submit(request("first")) is False
+    assert slots.started == ["first"] and len(queue) == 0
+
+
+def test_dispatch_order_is_priority_then_round_robin_by_client():
+    async def scenario():
+        slots = Slots()
+        queue = AdmissionQueue(slots.start, slots.publish)
+        for task_id, client, priority in [("a1", "a", "normal"), ("a2", "a", "normal"), ("a3", "a", "normal"),
+                                          ("b1", "b", "normal"), ("low", "c", "low"), ("high", "b", "high")]:
+            assert queue.submit(request(task_id, client, priority)) is True
+        order = ["high", "a1", "b1", "a2", "a3", "low"]
+        assert [queued.task_id for queued in queue._dispatch_order()] == order
+        assert {task_id: slots.published[task_id] for task_id in order} == {
+            task_id: position for position, task_id in enumerate(order, 1)
+        }
+
+        # Free slots one at a time: requests start in the published order
+        for _ in order:
+            slots.free += 1
+            queue.job_finished()
+            await asyncio.sleep(0.01)
+        assert slots.started == order and len(queue) == 0
+        queue._pump_task.cancel()
+
+    run(scenario)
+
+
+def test_full_queue_raises_with_retry_after():
+    async def scenario():
+        slots = Slots()
+        queue = AdmissionQueue(slots.start, slots.publish, max_queued=2, max_per_client=5)
+        queue.submit(request("a1"))
+        queue.submit(request("b1", client="b"))
+        with pytest.raises(QueueFull) as full:
+            queue.submit(request("c1", client="c"))
+        assert full.value.retry_after == DEFAULT_RETRY_AFTER_SECONDS
+        assert queue.stats()["rejected"] == 1 and "c1" not in slots.published
+        queue._pump_task.cancel()
+
+    run(scenario)
+
+
+def test_per_client_limit_leaves_room_for_other_clients():
+    async def scenario():
+        slots = Slots()
+        queue = AdmissionQueue(slots.start, slots.publish, max_queued=10, max_per_client=2)
+        queue.submit(request("a1"))
+        queue.submit(request("a2"))
+        with pytest.raises(QueueFull, match="already has 2"):
+            queue.submit(request("a3"))
+        assert queue.submit(request("b1", client="b")) is True
+        queue._pump_task.cancel()
+
+    run(scenario)
+
+
+def test_only_changed_positions_are_published():
+    async def scenario():
+        slots = Slots()
+        queue = AdmissionQueue(slots.start, slots.publish, max_per_client=20)
+        for index in range(20):
+            queue.submit(request(f"a{index}"))
+        # Each submit at the back of the queue publishes just the new request
+        assert slots.publishes == 20
+        queue.submit(request("b1", client="b"))
+        # b1 goes second, moving the 19 requests behind it
+        assert slots.publishes == 20 + 1 + 19 and slots.published["b1"] == 2
+
+        # Starting several at once republishes the shifted positions once
+        slots.publishes = 0
+        slots.free = 3
+        queue.job_finished()
+        await asyncio.sleep(0.01)
+        assert slots.started == ["a0", "b1", "a1"] and slots.publishes == 18
+        assert slots.published["a2"] == 1
+        queue._pump_task.cancel()
+
+    run(scenario)
+
+
+def test_a_failing_start_fails_that_request_and_keeps_pumping():
+    async def scenario():
+        slots = Slots()
+
+        def start(queued: QueuedRequest) -> bool:
+            if queued.task_id == "broken" and slots.free:
+                raise RuntimeError("supervisor unavailable")
+            return slots.start(queued)
+
+        queue = AdmissionQueue(start, slots.publish, fail=slots.fail)
+        queue.submit(request("broken"))
+        queue.submit(request("next", client="b"))
+        slots.free = 1
+        queue.job_finished()
+        await asyncio.sleep(0.01)
+        assert slots.failed == ["broken"] and slots.started == ["next"] and len(queue) == 0
+        assert not queue._pump_task.done() or queue._pump_task.exception() is None
+
+    run(scenario)
+
+
+def test_retry_after_follows_throughput():
+    slots = Slots()
+    queue = AdmissionQueue(slots.start, slots.publish)
+    for _ in range(30):
+        queue.throughput.record()
+    # 30 jobs within the first second: about 30 jobs/s
+    assert queue._retry_after(60) in (2, 3)
+    assert queue._retry_after(1) == 1
+
+
+def test_analyze_returns_429_with_retry_after(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import fastapi_server
+
+    def full(*args, **kwargs):
+        raise QueueFull("Analysis queue is full", 7)
+
+    monkeypatch.setattr(fastapi_server.pipeline_runner, "run_pipeline_async", full)
+    response = TestClient(fastapi_server.app).post("/api/analyze", json={"query": "ipl"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert response.json()["detail"] == "Analysis queue is full"
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from data_schemas import CleanResponse, ScrapeResponse
+from payload_codec import pack_message, unpack_message
+from records import SearchResult, to_columns
+from stage_cache import NullStageCache
+
+# Imported up front: uagents creates its Agents on the current event loop, which
+# asyncio.run() leaves unset
+import agents  # noqa: E402
+import enhanced_agents  # noqa: E402
+import real_agents  # noqa: E402
+
+
+class Context:
+    """Records what a handler sends instead of delivering it"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, destination, message):
+        self.sent.append((destination, message))
+
+
+@pytest.mark.parametrize("module", [agents, real_agents, enhanced_agents], ids=lambda module: module.__name__)
+def test_data_cleaning_agent_handles_a_scrape(module, monkeypatch):
+    if hasattr(module, "get_stage_cache"):
+        monkeypatch.setattr(module, "get_stage_cache", NullStageCache)
+    results = [SearchResult(f"IPL {k}", f"https://example.com/{k}", f"Chennai beat Kolkata in Dubai {k}")
+               for k in range(3)]
+    message = pack_message(ScrapeResponse, "scrape->clean", **to_columns(results))
+
+    ctx = Context()
+    asyncio.run(module.clean(ctx, "scraper", message))
+
+    [(destination, sent)] = ctx.sent
+    assert destination == module.eda_agent.address and isinstance(sent, CleanResponse)
+    payload = unpack_message(sent, "clean->eda")
+    assert len(payload["documents"]) == 3 and "Chennai" in payload["keywords"]["Keywords"]
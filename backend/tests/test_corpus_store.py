@@ -0,0 +1,67 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from corpus_store import STRING_FIELDS, CorpusStore
+from records import SearchResult
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CorpusStore(str(tmp_path / "corpus"), compact_bytes=10 ** 12)
+
+
+def append(store: CorpusStore, job: int, query: str = "IPL trends", count: int = 3):
+    results = [SearchResult(f"Title {job}-{k} ünïcode", f"https://example.com/{k}", "a long shared snippet " * 3)
+               for k in range(count)]
+    return store.append(f"job{job}", query, results, [f"clean text {k} " * 4 for k in range(count)])
+
+
+def contents(snapshot):
+    return {field: list(snapshot.strings(field)) for field in STRING_FIELDS}
+
+
+def test_snapshot_survives_compaction(store):
+    for job in range(4):
+        append(store, job)
+    snapshot = store.snapshot()
+    expected = contents(snapshot)
+    old_generation = snapshot.directory
+
+    store.compact()
+    assert not os.path.exists(old_generation)
+    assert contents(snapshot) == expected
+    assert list(snapshot.strings("title", snapshot.job_rows("job2")))[0] == "Title 2-0 ünïcode"
+
+
+def test_compaction_keeps_rows_and_interns_repeated_strings(store):
+    for job in range(6):
+        append(store, job, ["IPL trends", "ipl  Trends!", "cricket"][job % 3])
+    before = store.snapshot()
+    stats = store.compact()
+    after = store.snapshot()
+    assert after.manifest["generation"] != before.manifest["generation"]
+    assert contents(after) == contents(before)
+    assert stats["heap_bytes_after"] < stats["heap_bytes_before"]
+    assert after.query_rows("ipl trends").tolist() == before.query_rows("IPL TRENDS").tolist()
+    # The store keeps appending to the new generation
+    append(store, 6, "cricket")
+    assert len(store.snapshot()) == len(after) + 3
+
+
+def test_compaction_drops_jobs_past_retention(store):
+    append(store, 0)
+    old = time.time() - 10 * 86400
+    manifest = store.snapshot().manifest
+    path = os.path.join(store.root, manifest["generation"], "jobs.time")
+    with open(path, "r+b") as f:
+        f.write(np.float64(old).tobytes())
+    append(store, 1)
+    store.retention_days = 1
+    stats = store.compact()
+    assert (stats["jobs_before"], stats["jobs_after"]) == (2, 1)
+    snapshot = store.snapshot()
+    assert snapshot.job_rows("job0") == slice(0, 0)
+    assert len(list(snapshot.strings("title", snapshot.job_rows("job1")))) == 3
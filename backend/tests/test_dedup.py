@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+import dedup
+from dedup import SIMHASH_BITS, NearDuplicateIndex, ResultDeduplicator, hamming_distance, simhash
+from records import SearchResult
+
+
+def flip_bits(fingerprint: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(SIMHASH_BITS), count):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+
+@pytest.mark.parametrize("similarity", [0.95, 0.9, 0.8, 0.7])
+def test_bands_cover_every_bit_once(similarity):
+    index = NearDuplicateIndex(similarity)
+    covered = 0
+    for shift, mask in index._bands:
+        assert covered & (mask << shift) == 0
+        covered |= mask << shift
+    assert covered == (1 << SIMHASH_BITS) - 1
+
+
+@pytest.mark.parametrize("similarity", [0.95, 0.9, 0.8])
+def test_recall_within_threshold_is_guaranteed(similarity):
+    rng = random.Random(0)
+    index = NearDuplicateIndex(similarity)
+    stored = [rng.getrandbits(SIMHASH_BITS) for _ in range(500)]
+    for fingerprint in stored:
+        index.add(fingerprint)
+    # Every fingerprint within max_distance shares a band with its original (pigeonhole)
+    for fingerprint in stored:
+        for distance in range(index.max_distance + 1):
+            assert index.find(flip_bits(fingerprint, distance, rng)) is not None
+
+
+def test_far_fingerprints_are_not_matched():
+    rng = random.Random(1)
+    index = NearDuplicateIndex(0.9)
+    fingerprint = rng.getrandbits(SIMHASH_BITS)
+    index.add(fingerprint)
+    far = flip_bits(fingerprint, index.max_distance + 1, rng)
+    assert hamming_distance(fingerprint, far) > index.max_distance
+    assert index.find(far) is None
+
+
+def test_eviction_keeps_buckets_consistent():
+    rng = random.Random(2)
+    index = NearDuplicateIndex(0.9, max_entries=100)
+    fingerprints = [rng.getrandbits(SIMHASH_BITS) for _ in range(250)]
+    for fingerprint in fingerprints:
+        index.add(fingerprint)
+    assert len(index) <= 100
+    assert index.find(fingerprints[-1]) is not None
+    assert index.find(fingerprints[0]) is None
+    alive = {entry for bucket in index._buckets for entries in bucket.values() for entry in entries}
+    assert alive == set(index._fingerprints)
+
+
+def test_simhash_ignores_case_and_punctuation():
+    text = "Chennai Super Kings beat Kolkata Knight Riders in the final in Dubai to win their fourth IPL title"
+    copy = "CHENNAI super kings beat Kolkata Knight-Riders in the final, in Dubai, to win their fourth IPL title!"
+    assert simhash(text) == simhash(copy)
+    assert hamming_distance(simhash(text), simhash("Mumbai Indians retain Rohit Sharma as captain")) > 6
+
+
+def test_syndicated_copies_are_dropped_within_a_run():
+    text = "Chennai Super Kings beat Kolkata Knight Riders in the final in Dubai to win their fourth IPL title"
+    results = [SearchResult("CSK win", "https://a.com/1", text), SearchResult("CSK win", "https://b.com/1", text),
+               SearchResult("Auction", "https://c.com/1", "Mumbai Indians retain Rohit Sharma ahead of the auction")]
+    kept = ResultDeduplicator().add(results)
+    assert [result.url for result in kept] == ["https://a.com/1", "https://c.com/1"]
+
+
+def test_results_without_text_fall_back_to_the_url():
+    results = [SearchResult("", "https://a.com/1", ""), SearchResult("", "https://a.com/2", ""),
+               SearchResult("", "https://a.com/1", "")]
+    kept = ResultDeduplicator().add(results)
+    assert [result.url for result in kept] == ["https://a.com/1", "https://a.com/2"]
+
+
+def test_history_never_suppresses_a_rerun_of_the_same_query(monkeypatch):
+    monkeypatch.setattr(dedup, "DEDUP_HISTORY", True)
+    monkeypatch.setattr(dedup, "_history_index", None)
+    results = [SearchResult("IPL 2021 final", f"https://a.com/{i}", f"Report number {i} on a different match "
+                            f"{'with runs wickets catches boundaries'.split()[i]} and more") for i in range(4)]
+    first = ResultDeduplicator(series="ipl trends 2021").add(results)
+    rerun = ResultDeduplicator(series="IPL trends, 2021").add(results)
+    assert len(first) == len(rerun) == 4
+    # Another series drops what this one already analyzed
+    assert ResultDeduplicator(series="ipl finals").add(results) == []
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+import pytest
+
+import gemini_client
+from gemini_client import GeminiClient
+
+
+class BlockingModel:
+    def __init__(self):
+        self.release = threading.Event()
+
+    def generate_content(self, prompt):
+        self.release.wait(5)
+        return f"answer to {prompt}"
+
+
+def test_rest_call_holds_its_permit_until_the_thread_finishes(monkeypatch):
+    monkeypatch.setattr(gemini_client, "_use_async_api", False)
+    client = GeminiClient(max_concurrency=1)
+    model = client._model = BlockingModel()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.generate("first"), 0.05)
+        semaphore = client._semaphore()
+        # The abandoned call still runs on the executor
+        assert semaphore.locked() and client.in_flight == 1
+        second = asyncio.ensure_future(client.generate("second"))
+        await asyncio.sleep(0.05)
+        assert not second.done() and client.waiting == 1
+        model.release.set()
+        assert await asyncio.wait_for(second, 5) == "answer to second"
+        assert client.in_flight == 0 and not semaphore.locked()
+
+    asyncio.run(scenario())
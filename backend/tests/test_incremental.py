@@ -0,0 +1,119 @@
+import pytest
+
+import incremental
+from corpus_processor import EntityCounts, clean_text
+from eda_engine import analyze_corpus
+from incremental import IncrementalCorpus, IncrementalRun
+from records import SearchResult
+
+
+def source(page: int, extra: str = "") -> SearchResult:
+    return SearchResult(f"IPL stats {page}", f"https://example.com/{page}",
+                        f"Chennai beat Kolkata in Dubai final {page} {extra} term{page} Mumbai Indians in Pune")
+
+
+def run(corpus: IncrementalCorpus, sources):
+    job = IncrementalRun(corpus, clean_text)
+    documents = job.process(sources)
+    stats, keywords, report = job.finish()
+    return documents, stats, keywords, report
+
+
+def assert_matches_full_path(documents, stats, keywords):
+    full = analyze_corpus(documents)
+    for key in ("num_documents", "total_characters", "total_tokens", "vocabulary_size", "hapax_terms",
+                "document_lengths", "top_terms", "top_terms_per_document"):
+        assert stats[key] == full[key], key
+    # Scores are summed in a different column order, so they may differ in the last bits
+    assert [t["term"] for t in stats["top_tfidf_terms"]] == [t["term"] for t in full["top_tfidf_terms"]]
+    assert [t["score"] for t in stats["top_tfidf_terms"]] == pytest.approx([t["score"] for t in full["top_tfidf_terms"]])
+    expected = EntityCounts()
+    for document in documents:
+        expected.add(document)
+    assert keywords == expected.to_keywords()
+
+
+def test_reruns_match_a_full_recompute():
+    corpus = IncrementalCorpus("ipl")
+    documents, stats, keywords, report = run(corpus, [source(i) for i in range(6)])
+    assert report["added"] == 6
+    assert_matches_full_path(documents, stats, keywords)
+
+    # Two changed, one removed, two added, and the order shuffled
+    changed = [source(5), source(0, "Kolkata Kolkata"), source(2), source(3, "Delhi"), source(6), source(7)]
+    documents, stats, keywords, report = run(corpus, changed)
+    assert (report["added"], report["changed"], report["removed"], report["unchanged"]) == (2, 2, 2, 2)
+    assert report["processed_documents"] == 4
+    assert_matches_full_path(documents, stats, keywords)
+
+
+def test_keywords_are_ranked_by_frequency_across_documents():
+    corpus = IncrementalCorpus("ipl")
+    sources = [SearchResult("a", f"https://example.com/{i}", "Alpha Gamma" if i else "Beta Gamma Gamma")
+               for i in range(3)]
+    documents, _, keywords, _ = run(corpus, sources)
+    # First appearance would rank Beta before Alpha; Alpha appears in two documents
+    assert keywords["Keywords"][:3] == ["Gamma", "Alpha", "Beta"]
+
+
+def test_unchanged_rerun_reuses_the_stats():
+    corpus = IncrementalCorpus("ipl")
+    run(corpus, [source(i) for i in range(4)])
+    cached = corpus._stats
+    _, _, _, report = run(corpus, [source(i) for i in range(4)])
+    assert report["unchanged"] == 4 and report["processed_documents"] == 0
+    assert corpus._stats is cached
+
+
+def test_run_without_sources_keeps_the_stored_state():
+    corpus = IncrementalCorpus("ipl")
+    run(corpus, [source(i) for i in range(4)])
+    _, stats, _, report = run(corpus, [])
+    assert report["skipped"] and stats["num_documents"] == 0
+    assert len(corpus.documents) == 4 and corpus.runs == 1
+    _, _, _, report = run(corpus, [source(i) for i in range(4)])
+    assert report["unchanged"] == 4
+
+
+def test_vocabulary_is_compacted_when_mostly_unused(monkeypatch):
+    monkeypatch.setattr(incremental, "INCREMENTAL_MIN_COMPACT_TERMS", 0)
+    corpus = IncrementalCorpus("ipl")
+    run(corpus, [SearchResult("a", f"https://example.com/{i}", " ".join(f"old{i}x{j}" for j in range(20)))
+                 for i in range(5)])
+    assert len(corpus.terms) == 100
+    # Analyzed before the other run's commit compacts the vocabulary
+    stale = IncrementalRun(corpus, clean_text)
+    stale_documents = stale.process([source(9)])
+    documents, stats, keywords, _ = run(corpus, [source(i) for i in range(3)])
+    assert corpus.generation == 1 and len(corpus.terms) == stats["vocabulary_size"]
+    assert_matches_full_path(documents, stats, keywords)
+    stale_stats, stale_keywords, _ = stale.finish()
+    assert_matches_full_path(stale_documents, stale_stats, stale_keywords)
+
+
+@pytest.mark.parametrize("query", ["IPL trends 2021", "ipl  trends, 2021!"])
+def test_queries_share_state_by_normalized_key(query):
+    assert incremental.normalize_query(query) == "ipl trends 2021"
+
+
+def test_entity_counts_are_maintained_by_delta():
+    corpus = IncrementalCorpus("ipl")
+    run(corpus, [source(i, "Delhi Capitals") for i in range(4)])
+    documents, _, keywords, _ = run(corpus, [source(0), source(1, "Kolkata"), source(5)])
+    expected = EntityCounts()
+    for document in documents:
+        expected.add(document)
+    # Removed and changed documents are subtracted, leaving no empty entries behind
+    assert corpus.entities.keywords == expected.keywords and corpus.entities.misc == expected.misc
+    assert "Delhi" not in corpus.entities.misc and keywords == expected.to_keywords()
+
+
+def test_keyword_ties_rank_the_same_in_any_document_order():
+    texts = ["Alpha Gamma", "Beta Delta", "Gamma Delta"]
+    forward, backward = EntityCounts(), EntityCounts()
+    for text in texts:
+        forward.add(text)
+    for text in reversed(texts):
+        backward.add(text)
+    assert forward.to_keywords() == backward.to_keywords()
+    assert forward.to_keywords()["Keywords"] == ["Delta", "Gamma", "Alpha", "Beta"]
@@ -0,0 +1,101 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from page_cache import PageCache
+
+BODY = b"<html><body><p>Chennai beat Kolkata</p><script>x()</script></body></html>"
+
+
+class PageServer(BaseHTTPRequestHandler):
+    """``/<cache-control>`` pages with ETag "v1"; ``status`` overrides the response code"""
+
+    status = 200
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.status != 200:
+            self.send_response(self.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("ETag", '"v1"')
+        self.send_header("Cache-Control", self.path.lstrip("/"))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def base():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    PageServer.status = 200
+    PageServer.requests = []
+    return PageCache(str(tmp_path), max_bytes=10 ** 6)
+
+
+def test_fresh_pages_are_served_without_a_request(cache, base):
+    assert cache.fetch(f"{base}/max-age=300").source == "downloaded"
+    page = cache.fetch(f"{base}/max-age=300")
+    assert (page.source, page.body) == ("fresh", BODY)
+    assert page.text() == "Chennai beat Kolkata"
+    assert len(PageServer.requests) == 1
+
+
+def test_stale_pages_are_revalidated_with_their_etag(cache, base):
+    cache.fetch(f"{base}/no-cache")
+    page = cache.fetch(f"{base}/no-cache")
+    assert (page.source, page.body) == ("revalidated", BODY)
+    assert PageServer.requests[-1] == ("/no-cache", '"v1"')
+    assert cache.stats()["revalidated"] == 1 and cache.stats()["bytes_from_cache"] == len(BODY)
+
+
+def test_server_errors_serve_the_stale_copy(cache, base):
+    cache.fetch(f"{base}/no-cache")
+    PageServer.status = 503
+    assert cache.fetch(f"{base}/no-cache").source == "stale"
+    PageServer.status = 404
+    assert cache.fetch(f"{base}/no-cache") is None
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:-10],                                  # truncated body
+    lambda data: data.replace(b'"fresh_until"', b'"fresh"'),  # header without freshness
+    lambda data: b"{not json" + data[data.index(b"\n"):],
+    lambda data: b"[1]\n",
+])
+def test_corrupt_entries_are_discarded_and_fetched_again(cache, base, corrupt):
+    url = f"{base}/max-age=300"
+    cache.fetch(url)
+    path = cache._path(cache._key(url))
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(corrupt(data))
+
+    page = cache.fetch(url)
+    assert (page.source, page.body) == ("downloaded", BODY)
+    assert len(PageServer.requests) == 2
+    stats = cache.stats()
+    assert stats["discarded"] == 1 and stats["entries"] == 1 and stats["stored_bytes"] == os.path.getsize(path)
+    assert cache.fetch(url).source == "fresh"
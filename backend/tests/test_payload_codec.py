@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+import payload_codec
+from data_schemas import CleanResponse
+from payload_codec import BlobStore, PayloadStats, pack_message, unpack_message
+
+DOCUMENTS = [f"document {i} about chennai and mumbai " * 20 for i in range(100)]
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    stats = PayloadStats()
+    monkeypatch.setattr(payload_codec, "payload_stats", stats)
+    return stats
+
+
+@pytest.fixture
+def blob_store(monkeypatch, tmp_path):
+    store = BlobStore(str(tmp_path), ttl=60)
+    monkeypatch.setattr(payload_codec, "_blob_store", store)
+    return store
+
+
+def test_off_mode_records_the_uncompressed_baseline(monkeypatch, stats):
+    monkeypatch.setattr(payload_codec, "PAYLOAD_ENCODING", "off")
+    message = pack_message(CleanResponse, "clean->eda", job_id="job", documents=DOCUMENTS)
+    assert message.packed is None and message.job_id == "job"
+    assert unpack_message(message, "clean->eda")["documents"] == DOCUMENTS
+    hop = stats.snapshot()["clean->eda"]
+    assert hop["messages"] == 1 and hop["encoded_messages"] == 0
+    assert hop["raw_bytes"] == hop["wire_bytes"] == len(message.json())
+    assert f"{len(message.json())} -> {len(message.json())} bytes (100%)" in payload_codec.format_payload_stats()
+
+
+@pytest.mark.parametrize("encoding", ["zlib", "blob"])
+def test_round_trip_records_real_wire_size(monkeypatch, stats, blob_store, encoding):
+    monkeypatch.setattr(payload_codec, "PAYLOAD_ENCODING", encoding)
+    message = pack_message(CleanResponse, "clean->eda", traceparent="00-trace", job_id="job", documents=DOCUMENTS,
+                           urls=["https://example.com"])
+    assert message.packed and message.job_id == "job" and message.traceparent == "00-trace"
+    payload = unpack_message(message, "clean->eda")
+    assert payload["documents"] == DOCUMENTS and payload["urls"] == ["https://example.com"]
+    hop = stats.snapshot()["clean->eda"]
+    assert hop["wire_bytes"] == len(message.json())
+    assert hop["wire_bytes"] < hop["raw_bytes"]
+
+
+def test_small_payloads_stay_inline(monkeypatch, stats):
+    monkeypatch.setattr(payload_codec, "PAYLOAD_ENCODING", "zlib")
+    message = pack_message(CleanResponse, "clean->eda", documents=["short"])
+    assert message.packed is None
+    assert stats.snapshot()["clean->eda"]["wire_bytes"] == len(message.json())
+
+
+def test_reused_blob_renews_its_ttl(blob_store):
+    key = blob_store.put(b"payload")
+    path = os.path.join(blob_store.root, key)
+    old = time.time() - 50
+    os.utime(path, (old, old))
+    assert blob_store.put(b"payload") == key
+    assert time.time() - os.path.getmtime(path) < 5
+
+
+def test_prune_removes_expired_blobs(blob_store):
+    key = blob_store.put(b"payload")
+    path = os.path.join(blob_store.root, key)
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    blob_store._last_prune = 0.0
+    blob_store.put(b"other")
+    assert not os.path.exists(path)
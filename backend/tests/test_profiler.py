@@ -0,0 +1,52 @@
+import sys
+import threading
+
+import pytest
+
+from profiler import JobProfiler, Sampler
+
+
+def busy_function(name: str):
+    """A new function named ``name``: each one is a new stack for the sampler"""
+    namespace = {}
+    exec(f"def {name}():\n    return sum(range(20000))", namespace)
+    return namespace[name]
+
+
+@pytest.fixture
+def fast_switching():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_profile_can_be_read_while_sampling(fast_switching):
+    sampler = Sampler(interval_ms=0.1)
+    profiler = JobProfiler("job")
+    sampler.register(profiler)
+    done = threading.Event()
+
+    def work():
+        # The sampler keeps adding Counter keys while the profile is read
+        count = 0
+        while not done.is_set():
+            count += 1
+            busy_function(f"stage_function_{count}")()
+
+    try:
+        with profiler.stage("clean"):
+            worker = threading.Thread(target=profiler.wrap(work))
+            worker.start()
+            try:
+                for _ in range(500):
+                    summary = profiler.summary()
+                    profiler.collapsed()
+            finally:
+                done.set()
+                worker.join()
+    finally:
+        sampler.unregister(profiler)
+        profiler.flush()
+    assert summary["stages"]["clean"]["samples"] > 0
+    assert len(profiler.stages["clean"].samples) > 1
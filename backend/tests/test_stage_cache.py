@@ -0,0 +1,87 @@
+import pytest
+
+import agent_runner
+import eda_engine
+from feature_hashing import describe_training
+from stage_cache import NullStageCache, Stage, StageCache, code_version
+
+STAGE = Stage("test", eda_engine.analyze_corpus)
+
+
+def test_keys_depend_on_content_not_identity():
+    assert StageCache.key(STAGE, ["a", "b"], {"x": 1}) == StageCache.key(STAGE, ["a", "b"], {"x": 1})
+    assert StageCache.key(STAGE, {"x": 1, "y": 2}) == StageCache.key(STAGE, {"y": 2, "x": 1})
+
+
+@pytest.mark.parametrize("left, right", [
+    ((["ab", "c"],), (["a", "bc"],)),      # string boundaries are part of the key
+    ((["a"], "b"), (["a", "b"],)),         # so are argument boundaries
+    ((1,), ("1",)),
+    ((1,), (1.0,)),
+    ((True,), (1,)),
+    ((None,), ("None",)),
+    (("text",), (b"text",)),
+])
+def test_distinct_inputs_get_distinct_keys(left, right):
+    assert StageCache.key(STAGE, *left) != StageCache.key(STAGE, *right)
+
+
+def test_stage_name_and_version_are_part_of_the_key():
+    other_name = Stage("other", eda_engine.analyze_corpus)
+    other_version = Stage("test", eda_engine.analyze_corpus, describe_training)
+    keys = {StageCache.key(stage, ["doc"]) for stage in (STAGE, other_name, other_version)}
+    assert len(keys) == 3
+
+
+def test_version_follows_module_settings(monkeypatch):
+    before = code_version(eda_engine.analyze_corpus)
+    monkeypatch.setattr(eda_engine, "TOP_TERMS", eda_engine.TOP_TERMS + 1)
+    assert code_version(eda_engine.analyze_corpus) != before
+
+
+def test_eda_version_covers_the_calling_module():
+    assert agent_runner.EDA_STAGE.version == code_version(
+        agent_runner.analyze_documents, eda_engine.analyze_corpus, agent_runner.EntityCounts.to_keywords
+    )
+    assert agent_runner.EDA_STAGE.version != code_version(
+        eda_engine.analyze_corpus, agent_runner.EntityCounts.to_keywords
+    )
+
+
+def test_call_with_hit_reports_hits_and_copies_results(tmp_path):
+    cache = StageCache(directory=str(tmp_path))
+    calls = []
+
+    def compute(documents, check=None):
+        calls.append(documents)
+        return {"documents": list(documents)}
+
+    value, cached = cache.call_with_hit(STAGE, compute, ["a"], check=lambda: None)
+    assert not cached
+    value["documents"].append("mutated")
+    again, cached = cache.call_with_hit(STAGE, compute, ["a"], check=lambda: None)
+    assert cached and again == {"documents": ["a"]} and len(calls) == 1
+
+    # A new process (empty memory tier) reads the disk tier
+    fresh = StageCache(directory=str(tmp_path))
+    assert fresh.call_with_hit(STAGE, compute, ["a"]) == ({"documents": ["a"]}, True)
+    assert fresh.stats()["stages"]["test"]["disk_hits"] == 1
+    assert NullStageCache().call_with_hit(STAGE, compute, ["a"]) == ({"documents": ["a"]}, False)
+
+
+def test_clean_stage_is_shared_by_profiled_and_unprofiled_jobs():
+    cache = StageCache()
+    texts = ["<p>Chennai beat Kolkata</p>", "Mumbai Indians in Pune"]
+    documents, counts = cache.call(agent_runner.CLEAN_STAGE, agent_runner.clean_documents, texts)
+    (cached_documents, cached_counts), cached = cache.call_with_hit(
+        agent_runner.CLEAN_STAGE, agent_runner.clean_documents, texts, in_process=True
+    )
+    assert cached and cached_documents == documents
+    assert cached_counts.to_keywords() == counts.to_keywords()
+
+
+def test_cached_training_is_not_reported_with_stale_speed():
+    stats = {"model": "SGDRegressor", "features": 16, "documents": 10, "docs_per_second": 1234.0, "cached": False}
+    assert "1,234 docs/s" in describe_training(stats)
+    described = describe_training(dict(stats, cached=True))
+    assert "docs/s" not in described and "reused from the stage cache" in described
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+
+import pytest
+
+from state_store import MemoryStateStore, SQLiteStateStore
+
+
+def status(value):
+    return {"status": value, "is_running": value in ("starting", "running")}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryStateStore(max_jobs=2)
+        return
+    store = SQLiteStateStore(str(tmp_path / "state.db"), max_jobs=2)
+    yield store
+    store._writer.shutdown(wait=True)
+
+
+def test_put_nowait_is_read_back_in_order(store):
+    for value in ("queued", "starting", "running", "completed"):
+        store.put_nowait("job", "status", status(value))
+        assert store.get("job", "status")["status"] == value
+
+
+def test_put_nowait_encodes_the_value_when_called(store):
+    value = status("running")
+    store.put_nowait("job", "status", value)
+    value["status"] = "mutated"
+    if isinstance(store, SQLiteStateStore):
+        store._writer.submit(lambda: None).result()
+        assert store.get("job", "status")["status"] == "running"
+
+
+def test_trim_keeps_queued_and_running_jobs(store):
+    store.put("queued", "status", status("queued"))
+    store.acquire_slot("running", 10)
+    store.put("running", "status", status("running"))
+    for index in range(5):
+        store.put(f"done-{index}", "status", status("completed"))
+    if isinstance(store, SQLiteStateStore):
+        store._trim(store._connect())
+    assert store.get("queued", "status")["status"] == "queued"
+    assert store.get("running", "status")["status"] == "running"
+    assert store.get("done-0", "status") is None
+    assert store.get("done-4", "status")["status"] == "completed"
+
+
+def test_slots_of_a_reused_pid_are_released(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "state.db"))
+    assert store.acquire_slot("running", 2)
+    db = store._connect()
+    # Left by the previous run, whose worker had this pid but started at another time
+    db.execute("INSERT INTO job_slots (task_id, pid, started) VALUES ('stale', ?, 1)", (os.getpid(),))
+    assert store.running_count() == 2
+    assert store.acquire_slot("next", 2)
+    assert {row[0] for row in db.execute("SELECT task_id FROM job_slots")} == {"running", "next"}
+    store._writer.shutdown(wait=True)
+
+
+def test_databases_without_start_times_are_migrated(tmp_path):
+    path = str(tmp_path / "state.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE job_slots (task_id TEXT PRIMARY KEY, pid INTEGER NOT NULL, "
+               "cancel_requested INTEGER NOT NULL DEFAULT 0)")
+    db.execute("INSERT INTO job_slots (task_id, pid) VALUES ('old', ?)", (os.getpid(),))
+    db.commit()
+    db.close()
+    store = SQLiteStateStore(path)
+    # Without a start time only the pid can be checked, and it is alive
+    assert not store.acquire_slot("new", 1)
+    assert store.acquire_slot("new", 2) and store.running_count() == 2
+    store._writer.shutdown(wait=True)
@@ -0,0 +1,28 @@
+from tracing import FileExporter, Span
+
+
+def finished(name: str, trace_id: str, parent_id=None) -> Span:
+    span = Span(name, trace_id, parent_id, sampled=True)
+    span.end_ns = span.start_ns + 1
+    return span
+
+
+def test_file_exporter_rotates_and_finds_traces_in_both_files(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    exporter = FileExporter(path, flush_spans=1, max_bytes=2000)
+    for index in range(40):
+        exporter.export(finished(f"span {index}", f"{index % 4:032x}"))
+    assert (tmp_path / "traces.jsonl.1").exists()
+    current = tmp_path / "traces.jsonl"
+    assert not current.exists() or current.stat().st_size <= 2000
+    spans = exporter.get_trace(f"{1:032x}")
+    assert spans and all(s["trace_id"] == f"{1:032x}" for s in spans)
+    # Only the newest spans are kept: at most the current and the rotated file
+    assert [s["name"] for s in spans] == [f"span {index}" for index in range(1, 40, 4)][-len(spans):]
+
+
+def test_buffered_spans_are_flushed_for_a_lookup(tmp_path):
+    exporter = FileExporter(str(tmp_path / "traces.jsonl"))
+    exporter.export(finished("child", "ab" * 16, parent_id="1" * 16))
+    assert [s["name"] for s in exporter.get_trace("ab" * 16)] == ["child"]
+    assert exporter.get_trace("cd" * 16) == []
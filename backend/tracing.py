@@ -0,0 +1,255 @@
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Tracing Configuration
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "off")  # off, file or memory
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+# The trace file is rotated to TRACE_FILE.1 beyond this size; lookups read both
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(64 * 1024 * 1024)))
+TRACE_MEMORY_SPANS = int(os.getenv("TRACE_MEMORY_SPANS", "10000"))
+TRACE_FLUSH_SPANS = 256
+
+
+class Span:
+    """A timed operation within a trace, propagated as a W3C traceparent string"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status", "sampled")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def set_error(self, error: BaseException):
+        if self.sampled:
+            self.status = "error"
+            self.attributes["error"] = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.sampled:
+                get_exporter().export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None,
+            "status": self.status,
+            "attributes": self.attributes,
+            "pid": os.getpid(),
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans while tracing is off"""
+
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+def parse_traceparent(traceparent: Optional[str]):
+    """Return (trace_id, parent_span_id, sampled) or None for a missing/invalid header"""
+    if not traceparent:
+        return None
+    parts = traceparent.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == "01"
+
+
+def start_span(name: str, parent: Union[Span, str, None] = None,
+               attributes: Optional[Dict[str, Any]] = None) -> Union[Span, _NoopSpan]:
+    """Start a span under ``parent`` (a Span or traceparent string) or the current span.
+
+    Returns NOOP_SPAN when tracing is off, so callers pay nothing beyond this check.
+    """
+    if TRACE_EXPORTER == "off":
+        return NOOP_SPAN
+    if parent is None:
+        parent = _current_span.get()
+    if isinstance(parent, Span):
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+    context = parse_traceparent(parent)
+    if context is not None:
+        trace_id, parent_id, sampled = context
+        return Span(name, trace_id, parent_id, sampled, attributes)
+    # New trace: the sampling decision is made once, at the root
+    return Span(name, f"{random.getrandbits(128):032x}", None, random.random() < TRACE_SAMPLE_RATE, attributes)
+
+
+@contextlib.contextmanager
+def span(name: str, parent: Union[Span, str, None] = None, **attributes):
+    """Run a block inside a new span, ending it (and recording any error) on exit"""
+    current = start_span(name, parent, attributes)
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+@contextlib.contextmanager
+def activate(current: Union[Span, _NoopSpan]):
+    """Make an already started span the parent of spans started in this block"""
+    if current is NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+
+
+def traced_handler(name: str):
+    """Run a uagents message handler in a span that continues the sender's trace"""
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def traced(ctx, sender: str, message):
+            with span(name, getattr(message, "traceparent", None), sender=sender):
+                return await handler(ctx, sender, message)
+
+        return traced
+
+    return decorator
+
+
+class MemoryExporter:
+    """Keeps the most recent spans in process for the API to serve"""
+
+    def __init__(self, max_spans: int = TRACE_MEMORY_SPANS):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, finished: Span):
+        self.spans.append(finished)
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        return [s.to_dict() for s in list(self.spans) if s.trace_id == trace_id]
+
+    def flush(self):
+        pass
+
+
+class FileExporter:
+    """Appends finished spans as JSON lines, buffered and written in batches.
+
+    Once the file grows past ``max_bytes`` it becomes ``<path>.1`` (replacing
+    the previous one) and a new file is started, so a lookup reads at most
+    twice ``max_bytes``.
+    """
+
+    def __init__(self, path: str = TRACE_FILE, flush_spans: int = TRACE_FLUSH_SPANS,
+                 max_bytes: int = TRACE_FILE_MAX_BYTES):
+        self.path = path
+        self.flush_spans = flush_spans
+        self.max_bytes = max_bytes
+        self._buffer: List[Span] = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def export(self, finished: Span):
+        with self._lock:
+            self._buffer.append(finished)
+            # Root spans end a trace, so write it out while it is still fresh
+            if len(self._buffer) < self.flush_spans and finished.parent_id is not None:
+                return
+            spans, self._buffer = self._buffer, []
+        self._write(spans)
+
+    def flush(self):
+        with self._lock:
+            spans, self._buffer = self._buffer, []
+        self._write(spans)
+
+    def _write(self, spans: List[Span]):
+        if not spans:
+            return
+        lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+        try:
+            with open(self.path, "a") as f:
+                f.write(lines)
+                size = f.tell()
+            if size > self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except OSError as e:
+            logger.error(f"[tracing] Could not write spans to {self.path}: {e}")
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Spans of ``trace_id`` in the current and rotated file; reads files, so call off the event loop"""
+        self.flush()
+        spans = []
+        for path in (f"{self.path}.1", self.path):
+            try:
+                with open(path) as f:
+                    # Most lines belong to other traces: match the id before parsing
+                    spans.extend(s for s in (json.loads(line) for line in f if trace_id in line)
+                                 if s["trace_id"] == trace_id)
+            except FileNotFoundError:
+                pass
+        return spans
+
+
+exporter = None
+
+
+def get_exporter():
+    global exporter
+    if exporter is None:
+        exporter = FileExporter() if TRACE_EXPORTER == "file" else MemoryExporter()
+    return exporter
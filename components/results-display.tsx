@@ -19,6 +19,8 @@ interface AnalysisResults {
   data_sources: number
   characters_processed: number
   agent_actions: number
+  partial?: boolean
+  completed_stages?: string[] | null
 }
 
 interface ResultsDisplayProps {
@@ -102,6 +104,11 @@ ${results.scrape_results}
             <div className="space-y-2">
               <div className="flex items-center gap-2">
                 <CardTitle className="text-2xl">Analysis Results</CardTitle>
+                {results.partial && (
+                  <Badge variant="outline" title={`Completed stages: ${(results.completed_stages ?? []).join(", ")}`}>
+                    Partial
+                  </Badge>
+                )}
               </div>
               <CardDescription className="text-base">
                 Query: <span className="font-medium text-foreground">"{results.query}"</span>
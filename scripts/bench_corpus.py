@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for the multi-core corpus processor.
+
+Builds a synthetic corpus of the given size, with markup, entities and
+document lengths spread over two orders of magnitude. It is cleaned and
+its entities counted first inline (one core, no pool), then with process
+pools of 1, 2, 4, ... workers. Prints throughput, speedup over the inline
+run and parallel efficiency, and checks each run's output against the
+inline one.
+
+Usage: python scripts/bench_corpus.py [--megabytes 20] [--max-workers N] [--repeat 3]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from corpus_processor import CORPUS_MP_START, process_corpus, process_shard  # noqa: E402
+
+WORDS = ("the season opened with a record crowd as the home side chased a tricky total under lights while "
+         "analysts debated the auction strategy and the toss").split()
+ENTITIES = ["Chennai", "Mumbai", "Kolkata", "Dubai", "Sharjah", "Dhoni", "Rohit", "Tata Company",
+            "Dream Technologies", "Star Corp", "Vivo Ltd"]
+
+
+def synthetic_corpus(megabytes: float, seed: int = 0):
+    rng = random.Random(seed)
+    texts, total = [], 0
+    while total < megabytes * 1024 * 1024:
+        words = rng.choices(WORDS, k=int(rng.lognormvariate(4.5, 1.0)) + 5)
+        for _ in range(max(1, len(words) // 12)):
+            words.insert(rng.randrange(len(words)), f"in {rng.choice(ENTITIES)}")
+        text = f"<p>{' '.join(words)}.</p> <b>{rng.choice(ENTITIES)}</b>, {rng.randint(1, 99)}% &amp; more!"
+        texts.append(text)
+        total += len(text)
+    return texts
+
+
+def worker_counts(max_workers: int):
+    counts, workers = [], 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    return counts + [max_workers]
+
+
+def best_of(repeat: int, run):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = run()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, output)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=20)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = synthetic_corpus(args.megabytes)
+    size_mb = sum(map(len, texts)) / 1024 / 1024
+    print(f"{len(texts)} documents, {size_mb:.1f} MB, {os.cpu_count()} CPUs\n")
+
+    inline_seconds, (documents, counts) = best_of(args.repeat, lambda: process_shard(texts))
+    expected = (documents, counts.to_keywords())
+    print(f"{'workers':>8} {'shards':>7} {'seconds':>8} {'MB/s':>7} {'speedup':>8} {'efficiency':>11}")
+    print(f"{'inline':>8} {1:>7} {inline_seconds:>8.2f} {size_mb / inline_seconds:>7.1f} {1.0:>8.2f} {'':>11}")
+
+    for workers in worker_counts(args.max_workers):
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(CORPUS_MP_START)) as pool:
+            # Start the worker processes before timing
+            list(pool.map(process_shard, [[""]] * workers))
+            seconds, (documents, counts, stats) = best_of(
+                args.repeat, lambda: process_corpus(texts, executor=pool, workers=workers)
+            )
+        if (documents, counts.to_keywords()) != expected:
+            print(f"  output with {workers} workers differs from the inline run")
+        speedup = inline_seconds / seconds
+        print(f"{workers:>8} {stats['shards']:>7} {seconds:>8.2f} {size_mb / seconds:>7.1f} "
+              f"{speedup:>8.2f} {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
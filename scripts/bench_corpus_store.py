@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark the memory-mapped columnar corpus store.
+
+Appends synthetic jobs to a fresh store, each with 100 results drawn from a
+per-query pool so that re-runs of a query repeat sources, as tracked queries
+do. It then scans and slices the records through a snapshot, and compacts
+the store. Prints throughput and memory: mapped pages that reads touch count
+toward RSS but are page cache, so private (anonymous) memory is shown too
+and should stay far below the size of the heap.
+
+Usage: python scripts/bench_corpus_store.py [--records 1000000] [--queries 50] [--dir /tmp/corpus-bench]
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from corpus_store import CorpusStore  # noqa: E402
+from records import SearchResult  # noqa: E402
+
+WORDS = ("cricket ipl chennai kolkata mumbai final trophy season runs wickets captain stadium auction "
+         "player team match score batting bowling umpire toss innings league playoff record").split()
+RESULTS_PER_JOB = 100
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def private_mb() -> float:
+    """Anonymous resident memory (Linux); file-backed pages of the memory maps are excluded"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def source_pool(rng: random.Random, query: int, size: int = 300):
+    pool = []
+    for i in range(size):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(15, 40)))
+        pool.append((SearchResult(f"Query {query} result {i}", f"https://example.com/{query}/{i}", text),
+                     f"query {query} result {i} {text}"))
+    return pool
+
+
+def timed(label: str, run):
+    start = time.perf_counter()
+    value = run()
+    print(f"  {label:<40} {time.perf_counter() - start:>8.3f}s  peak RSS {peak_rss_mb():>7.1f} MB  "
+          f"private {private_mb():>7.1f} MB")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "corpus-bench"))
+    args = parser.parse_args()
+
+    shutil.rmtree(args.dir, ignore_errors=True)
+    store = CorpusStore(args.dir, compact_bytes=1 << 62)
+    rng = random.Random(0)
+    pools = [source_pool(rng, query) for query in range(args.queries)]
+
+    jobs = args.records // RESULTS_PER_JOB
+    start = time.perf_counter()
+    for job in range(jobs):
+        query = rng.randrange(args.queries)
+        picked = rng.sample(pools[query], RESULTS_PER_JOB)
+        store.append(f"job-{job}", f"tracked query {query}", [result for result, _ in picked],
+                     [text for _, text in picked])
+    elapsed = time.perf_counter() - start
+    stats = store.stats()
+    print(f"Appended {stats['records']:,} records in {jobs:,} jobs: {elapsed:.1f}s "
+          f"({stats['records'] / elapsed:,.0f} records/s), heap {stats['heap'] / 1e6:,.1f} MB, "
+          f"disk {stats['disk_bytes'] / 1e6:,.1f} MB")
+
+    baseline = private_mb()
+    print(f"\nReads (private memory before reading {baseline:.1f} MB)")
+    snapshot = store.snapshot()
+    total = timed("sum text lengths (scan one column)",
+                  lambda: sum(int(batch["text_len"].sum(dtype=np.int64)) for batch in snapshot.scan(["text_len"])))
+    per_query = timed("records per query (bincount)", lambda: np.bincount(snapshot.column("query")))
+    rows = timed("index rows of one query", lambda: snapshot.query_rows("tracked query 0"))
+    timed(f"decode {min(len(rows), 10_000):,} texts of that query",
+          lambda: sum(map(len, snapshot.strings("text", rows[:10_000]))))
+    timed("decode one job", lambda: list(snapshot.strings("title", snapshot.job_rows(f"job-{jobs // 2}"))))
+    print(f"  {total / 1e6:,.1f} MB of text, {per_query.max():,} records in the largest query, "
+          f"private memory grew {private_mb() - baseline:.1f} MB")
+
+    print("\nCompaction")
+    result = timed("compact (interning repeated sources)", store.compact)
+    print(f"  heap {result['heap_bytes_before'] / 1e6:,.1f} MB -> {result['heap_bytes_after'] / 1e6:,.1f} MB")
+    shutil.rmtree(args.dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark the page cache for source fetches.
+
+Serves synthetic pages from a local HTTP server: a third with
+``max-age=300``, a third with ``no-cache`` (every use costs a revalidation)
+and a third with only Last-Modified, all with ETags; a few pages change
+between jobs. Jobs then fetch result pages whose URLs follow a Zipf-like
+popularity, as popular stats pages recur across queries: first with the
+cache off, then with a fresh cache. Prints bytes downloaded versus served
+from the cache, 304s and wall time.
+
+Usage: python scripts/bench_page_cache.py [--jobs 50] [--pages-per-job 30] [--urls 300] [--latency-ms 30]
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from page_cache import NullPageCache, PageCache  # noqa: E402
+
+WORDS = ("cricket ipl chennai kolkata mumbai final trophy season runs wickets captain stadium auction "
+         "player team match score batting bowling umpire toss innings league playoff record").split()
+POLICIES = ("max-age=300", "no-cache", None)
+
+
+class PageServer(BaseHTTPRequestHandler):
+    latency = 0.0
+    versions = {}
+    counts = {"200": 0, "304": 0}
+    modified = formatdate(time.time() - 30 * 24 * 3600, usegmt=True)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        page = int(self.path.rsplit("/", 1)[-1])
+        version = self.versions.get(page, 0)
+        etag = f'"{page}-{version}"'
+        policy = POLICIES[page % len(POLICIES)]
+        if self.headers.get("If-None-Match") == etag:
+            self.counts["304"] += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        rng = random.Random(hashlib.md5(etag.encode()).digest())
+        body = ("<html><body>" + "".join(f"<p>{' '.join(rng.choices(WORDS, k=40))}</p>" for _ in range(300))
+                + "</body></html>").encode()
+        self.counts["200"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", self.modified)
+        if policy:
+            self.send_header("Cache-Control", policy)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_jobs(cache: PageCache, base: str, args) -> float:
+    rng = random.Random(1)
+    weights = [1 / (rank + 1) for rank in range(args.urls)]
+    PageServer.versions = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(16) as pool:
+        for _ in range(args.jobs):
+            urls = {f"{base}/{page}" for page in rng.choices(range(args.urls), weights, k=args.pages_per_job)}
+            list(pool.map(cache.fetch, urls))
+            for page in rng.sample(range(args.urls), max(1, args.urls // 100)):
+                PageServer.versions[page] = PageServer.versions.get(page, 0) + 1
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--pages-per-job", type=int, default=30)
+    parser.add_argument("--urls", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--dir", default=os.path.join(tempfile.gettempdir(), "page-cache-bench"))
+    args = parser.parse_args()
+
+    PageServer.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageServer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/pages"
+
+    shutil.rmtree(args.dir, ignore_errors=True)
+    print(f"{'cache':>6} {'seconds':>8} {'requests':>9} {'200s':>6} {'304s':>6} {'MB down':>8} {'MB cached':>10} "
+          f"{'on disk':>8}")
+    for label, cache in (("off", NullPageCache()), ("on", PageCache(args.dir))):
+        PageServer.counts = {"200": 0, "304": 0}
+        seconds = run_jobs(cache, base, args)
+        stats = cache.stats()
+        print(f"{label:>6} {seconds:>8.2f} {stats['requests']:>9} {PageServer.counts['200']:>6} "
+              f"{PageServer.counts['304']:>6} {stats['bytes_downloaded'] / 1e6:>8.1f} "
+              f"{stats['bytes_from_cache'] / 1e6:>10.1f} {stats['stored_bytes'] / 1e6:>7.1f}M")
+    server.shutdown()
+    shutil.rmtree(args.dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
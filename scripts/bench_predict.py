@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /api/predict serving path under concurrent load.
+
+Trains a model shaped like the pipeline's, then drives the micro-batcher
+with N concurrent clients, once with batching disabled (one row per
+predict call) and once with the configured batch window. Prints throughput
+and latency percentiles for both.
+
+Usage: python scripts/bench_predict.py [--clients 200] [--requests 5000]
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+import numpy as np  # noqa: E402
+from sklearn.ensemble import RandomForestRegressor  # noqa: E402
+
+from model_server import BATCH_WINDOW_MS, MAX_BATCH_ROWS, MicroBatcher, ModelCache, save_model  # noqa: E402
+
+
+def train_model(path: str):
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 20, size=(200, 2))
+    y = rng.random(200)
+    save_model(pickle.dumps(RandomForestRegressor(n_estimators=100).fit(X, y)), path)
+
+
+async def drive(batcher: MicroBatcher, clients: int, total: int):
+    remaining = [total]
+
+    async def client():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            await batcher.predict([[float(np.random.randint(20)), float(np.random.randint(20))]])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    stats = batcher.stats()
+    return total / elapsed, stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trained_model.pkl")
+        train_model(path)
+        print(f"{'mode':<22} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'rows/batch':>11}")
+        for label, window, max_rows in [("unbatched", 0, 1), (f"batched ({BATCH_WINDOW_MS:g} ms)", BATCH_WINDOW_MS, MAX_BATCH_ROWS)]:
+            batcher = MicroBatcher(ModelCache(path), window_ms=window, max_rows=max_rows)
+            throughput, stats = await drive(batcher, args.clients, args.requests)
+            latency = stats["requests"]
+            print(f"{label:<22} {throughput:>8.0f} {latency['p50_ms']:>8.1f} {latency['p99_ms']:>8.1f} "
+                  f"{stats['mean_batch_rows']:>11.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Latency of the local extractive summarizer.
+
+Builds synthetic sources (a snippet plus page text) from a Zipf-distributed
+vocabulary and times both ranking methods, TF-IDF centroid scoring and
+TextRank, at growing corpus sizes. The summary is meant to be served while
+Gemini is still generating, so it should take milliseconds, not seconds.
+
+Usage: python scripts/bench_summarizer.py [--sources 10,50,100] [--sentences-per-source 40] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from summarizer import split_sentences, summarize  # noqa: E402
+
+ENTITIES = ["Chennai", "Mumbai", "Kolkata", "Dubai", "Dhoni", "Rohit", "Gaikwad", "Narine"]
+
+
+def synthetic_sources(count: int, sentences: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    sources = []
+    for _ in range(count):
+        text = []
+        for _ in range(sentences):
+            words = rng.choices(vocabulary, weights, k=rng.randint(8, 30))
+            words.insert(rng.randrange(len(words)), rng.choice(ENTITIES))
+            text.append(" ".join(words).capitalize() + ".")
+        sources.append(" ".join(text[:2]) + " ... " + " ".join(text[2:]))
+    return sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", default="10,50,100")
+    parser.add_argument("--sentences-per-source", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'sources':>8} {'sentences':>10} {'method':>9} {'best ms':>8}")
+    for count in map(int, args.sources.split(",")):
+        texts = synthetic_sources(count, args.sentences_per_source)
+        candidates = len(split_sentences(texts)[0])
+        for method in ("centroid", "textrank"):
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                summarize(texts, "chennai final", method=method)
+                best = min(best, time.perf_counter() - start)
+            print(f"{count:>8} {candidates:>10} {method:>9} {best * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark streaming training on hashed text features.
+
+Streams documents (synthetic by default, or one per line from --corpus)
+through train_relevance_model in mini-batches. Prints throughput and the
+process's peak RSS after each chunk. Memory should stay flat no matter
+how many documents are streamed.
+
+Usage: python scripts/bench_training.py [--documents 200000] [--batch-size 256] [--corpus FILE] [--query "..."]
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+from feature_hashing import TRAIN_BATCH_DOCS, HashedTextModel, iter_text_file, train_relevance_model  # noqa: E402
+
+WORDS = ("cricket ipl chennai kolkata mumbai final trophy season runs wickets captain stadium auction "
+         "player team match score batting bowling umpire toss innings league playoff record").split()
+
+
+def synthetic_documents(count: int, seed: int = 0):
+    """Random documents with an open-ended vocabulary, so a vocabulary-based vectorizer would keep growing"""
+    rng = random.Random(seed)
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(20, 60))
+        words.append(f"term{rng.randrange(10 ** 7)}")
+        yield f"Article {i}: " + " ".join(words)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=TRAIN_BATCH_DOCS)
+    parser.add_argument("--chunks", type=int, default=5, help="report progress this many times")
+    parser.add_argument("--corpus", help="train on this file (one document per line) instead of synthetic data")
+    parser.add_argument("--query", default="chennai ipl final")
+    args = parser.parse_args()
+
+    documents = iter_text_file(args.corpus) if args.corpus else synthetic_documents(args.documents)
+    chunk = max(1, args.documents // args.chunks)
+    model = HashedTextModel()
+    total = 0
+    start = time.perf_counter()
+    print(f"{'documents':>10} {'docs/s':>9} {'peak RSS MB':>12}")
+    while True:
+        _, stats = train_relevance_model(islice(documents, chunk), args.query, args.batch_size, model=model)
+        if not stats["documents"]:
+            break
+        total += stats["documents"]
+        print(f"{total:>10} {stats['docs_per_second']:>9,.0f} {peak_rss_mb():>12.1f}")
+    elapsed = time.perf_counter() - start
+    print(f"\n{total} documents in {elapsed:.1f}s ({total / elapsed:,.0f} docs/s), "
+          f"{model.n_features} hashed features")
+    sample = ["chennai wins the ipl final", "umpire reviews the toss"]
+    for text, score in zip(sample, model.predict(sample)):
+        print(f"  relevance {score:+.2f}  {text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Load test for concurrent pipeline jobs on a single event loop.
+
+Upstream search and Gemini calls are replaced by in-process fakes with a
+fixed latency, so the test measures the job scheduling itself: how many
+jobs can be in flight at once and how much memory and how many threads each
+one costs.
+
+Usage: python scripts/load_test_jobs.py [--jobs 100 200 400] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+os.environ.setdefault("MAX_CONCURRENT_JOBS", "10000")
+
+import requests  # noqa: E402
+import google.generativeai as genai  # noqa: E402
+
+
+def install_fake_upstreams(latency: float):
+    items = [
+        {"title": f"Result {i} about cricket trends", "link": f"https://example.com/{i}",
+         "snippet": f"Snippet {i} describing Chennai and Mumbai in the IPL season"}
+        for i in range(10)
+    ]
+
+    class FakeResponse:
+        status_code = 200
+
+        def json(self):
+            return {"items": items, "organic_results": items}
+
+        def raise_for_status(self):
+            pass
+
+    def fake_get(self, url, **kwargs):
+        time.sleep(latency)
+        return FakeResponse()
+
+    class FakeModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, prompt, **kwargs):
+            time.sleep(latency)
+            return types.SimpleNamespace(text="Fake answer")
+
+        async def generate_content_async(self, prompt, **kwargs):
+            await asyncio.sleep(latency)
+            return types.SimpleNamespace(text="Fake answer")
+
+    requests.Session.get = fake_get
+    genai.GenerativeModel = FakeModel
+
+
+async def run_round(runner, jobs: int):
+    supervisor = runner.supervisor
+    baseline_memory, _ = tracemalloc.get_traced_memory()
+    baseline_threads = threading.active_count()
+
+    start = time.perf_counter()
+    task_ids = [runner.run_pipeline_async(f"cricket trends {i}", timeout=120) for i in range(jobs)]
+    peak_in_flight, peak_memory, peak_threads = 0, 0, 0
+    while supervisor.running_count:
+        peak_in_flight = max(peak_in_flight, supervisor.running_count)
+        peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[0] - baseline_memory)
+        peak_threads = max(peak_threads, threading.active_count())
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    statuses = [runner.get_job(task_id).status["status"] for task_id in task_ids if runner.get_job(task_id)]
+    return {
+        "jobs": jobs,
+        "seconds": elapsed,
+        "jobs_per_second": jobs / elapsed,
+        "peak_in_flight": peak_in_flight,
+        "peak_memory_kb_per_job": peak_memory / jobs / 1024,
+        "threads": f"{baseline_threads} -> {peak_threads}",
+        "completed": statuses.count("completed"),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[100, 200, 400])
+    parser.add_argument("--latency", type=float, default=0.2, help="fake upstream latency in seconds")
+    args = parser.parse_args()
+
+    install_fake_upstreams(args.latency)
+    from agent_runner import get_pipeline_runner
+    runner = get_pipeline_runner()
+    runner.supervisor.max_finished = max(args.jobs)
+
+    tracemalloc.start()
+    print(f"{'jobs':>6} {'seconds':>8} {'jobs/s':>8} {'in-flight':>10} {'KB/job':>8} {'threads':>10} {'completed':>10}")
+    for jobs in args.jobs:
+        r = await run_round(runner, jobs)
+        print(f"{r['jobs']:>6} {r['seconds']:>8.2f} {r['jobs_per_second']:>8.1f} {r['peak_in_flight']:>10} "
+              f"{r['peak_memory_kb_per_job']:>8.1f} {r['threads']:>10} {r['completed']:>10}")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
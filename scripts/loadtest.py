@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test for the FastAPI service.
+
+Runs a scenario file (see scripts/loadtest_scenarios/) against a running API
+or, with --spawn, starts the API and the fake upstreams (backend/fake_upstreams.py)
+as local processes first. Requests are sent open-loop at fixed rates, and
+latency is measured from each request's scheduled start, so a slow server
+cannot hide queueing delay by slowing the generator down.
+
+The machine-readable report has per-step, per-endpoint throughput,
+p50/p95/p99 latency, error rates and status code counts, plus the first
+step at which the service saturated.
+
+Usage:
+    python scripts/loadtest.py scripts/loadtest_scenarios/ramp_analyze.json --spawn -o report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+
+# A step counts as saturated once any of these is crossed
+SATURATION_THROUGHPUT_RATIO = 0.9
+SATURATION_ERROR_RATE = 0.05
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List] = defaultdict(list)
+        self.task_ids: List[str] = []
+
+    def record(self, key: str, latency: float, status: Optional[int], ok: bool):
+        self.samples[key].append((latency, status, ok))
+
+
+def render(template: Any, n: int) -> Any:
+    if isinstance(template, str):
+        return template.replace("{n}", str(n))
+    if isinstance(template, dict):
+        return {k: render(v, n) for k, v in template.items()}
+    if isinstance(template, list):
+        return [render(v, n) for v in template]
+    return template
+
+
+async def fire(session: aiohttp.ClientSession, base_url: str, spec: Dict[str, Any], n: int,
+               scheduled: float, recorder: Recorder, key: str):
+    path = render(spec["path"], n)
+    if "{task_id}" in path:
+        path = path.replace("{task_id}", random.choice(recorder.task_ids)) if recorder.task_ids else path.split("?")[0]
+    expect = spec.get("expect", [200])
+    status = None
+    try:
+        async with session.request(spec.get("method", "GET"), base_url + path,
+                                   json=render(spec.get("json"), n)) as response:
+            body = await response.read()
+            status = response.status
+            if spec.get("capture_task_id") and status == 200:
+                recorder.task_ids.append(json.loads(body)["task_id"])
+    except Exception:
+        pass
+    recorder.record(key, time.perf_counter() - scheduled, status, status in expect)
+
+
+async def run_stream(session, base_url: str, spec: Dict[str, Any], duration: float, recorder: Recorder, key: str):
+    interval = 1.0 / spec["rate"]
+    start = time.perf_counter()
+    tasks, n = [], 0
+    while n * interval < duration:
+        scheduled = start + n * interval
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        tasks.append(asyncio.create_task(fire(session, base_url, spec, n, scheduled, recorder, key)))
+        n += 1
+    await asyncio.gather(*tasks)
+
+
+def summarize(samples: List, duration: float, offered_rate: float) -> Dict[str, Any]:
+    if not samples:
+        return {"requests": 0}
+    latencies = np.array([s[0] for s in samples]) * 1000
+    failures = sum(1 for s in samples if not s[2])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "requests": len(samples),
+        "offered_rps": offered_rate,
+        "achieved_rps": sum(1 for s in samples if s[2]) / duration,
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(latencies.max()),
+        "error_rate": failures / len(samples),
+        "status_codes": {str(code): count for code, count in Counter(s[1] for s in samples).items()},
+    }
+
+
+def is_saturated(endpoints: Dict[str, Dict[str, Any]], slo_p99_ms: Optional[float]) -> bool:
+    for stats in endpoints.values():
+        if not stats.get("requests"):
+            continue
+        if stats["achieved_rps"] < SATURATION_THROUGHPUT_RATIO * stats["offered_rps"]:
+            return True
+        if stats["error_rate"] > SATURATION_ERROR_RATE:
+            return True
+        if slo_p99_ms and stats["p99_ms"] > slo_p99_ms:
+            return True
+    return False
+
+
+async def configure_upstreams(session, upstream_url: str, upstreams: Dict[str, Any]):
+    for name, config in upstreams.items():
+        async with session.post(f"{upstream_url}/_config/{name}", json=config) as response:
+            response.raise_for_status()
+
+
+async def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status < 500:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def spawn_services(api_port: int, upstream_port: int) -> List[subprocess.Popen]:
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    env = dict(os.environ,
+               GOOGLE_CSE_URL=f"{upstream_url}/customsearch/v1",
+               SERPAPI_URL=f"{upstream_url}/search",
+               GEMINI_API_ENDPOINT=upstream_url,
+               GOOGLE_API_KEY="fake", SERP_API_KEY="fake", CX_ID="fake", GEMINI_API_KEY="fake")
+    common = [sys.executable, "-m", "uvicorn", "--host", "127.0.0.1", "--log-level", "warning"]
+    return [
+        subprocess.Popen(common + ["fake_upstreams:app", "--port", str(upstream_port)], cwd=BACKEND_DIR, env=env),
+        subprocess.Popen(common + ["fastapi_server:app", "--port", str(api_port)], cwd=BACKEND_DIR, env=env),
+    ]
+
+
+async def run_scenario(scenario: Dict[str, Any], base_url: str, upstream_url: Optional[str]) -> Dict[str, Any]:
+    connector = aiohttp.TCPConnector(limit=scenario.get("max_connections", 1000))
+    timeout = aiohttp.ClientTimeout(total=scenario.get("request_timeout_seconds", 30))
+    report = {"scenario": scenario.get("name"), "base_url": base_url, "steps": [], "saturation_step": None}
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        if upstream_url and scenario.get("upstreams"):
+            await configure_upstreams(session, upstream_url, scenario["upstreams"])
+
+        recorder = Recorder()
+        for index, step in enumerate(scenario["steps"]):
+            duration = step["duration_seconds"]
+            step_recorder = Recorder()
+            step_recorder.task_ids = recorder.task_ids
+            keys = [f"{spec.get('method', 'GET')} {spec['path']}" for spec in step["requests"]]
+            await asyncio.gather(*(
+                run_stream(session, base_url, spec, duration, step_recorder, key)
+                for spec, key in zip(step["requests"], keys)
+            ))
+            endpoints = {
+                key: summarize(step_recorder.samples[key], duration, spec["rate"])
+                for spec, key in zip(step["requests"], keys)
+            }
+            saturated = is_saturated(endpoints, scenario.get("slo_p99_ms"))
+            report["steps"].append({"step": index, "duration_seconds": duration,
+                                    "saturated": saturated, "endpoints": endpoints})
+            if saturated and report["saturation_step"] is None:
+                report["saturation_step"] = index
+            print_step(index, endpoints, saturated)
+
+        if upstream_url:
+            async with session.get(f"{upstream_url}/_stats") as response:
+                report["upstream_requests"] = (await response.json())["requests"]
+    return report
+
+
+def print_step(index: int, endpoints: Dict[str, Dict[str, Any]], saturated: bool):
+    print(f"step {index}{' (saturated)' if saturated else ''}", file=sys.stderr)
+    for key, s in endpoints.items():
+        if not s.get("requests"):
+            continue
+        print(f"  {key:<32} {s['achieved_rps']:>7.1f}/{s['offered_rps']:<5g} rps  p50 {s['p50_ms']:>7.1f}  "
+              f"p95 {s['p95_ms']:>7.1f}  p99 {s['p99_ms']:>7.1f} ms  errors {s['error_rate']:.1%}", file=sys.stderr)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenario", help="path to a scenario JSON file")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--upstream-url", help="fake upstreams URL, used to apply the scenario's upstream settings")
+    parser.add_argument("--spawn", action="store_true", help="start the API and fake upstreams locally")
+    parser.add_argument("--api-port", type=int, default=8000)
+    parser.add_argument("--upstream-port", type=int, default=9100)
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    with open(args.scenario) as f:
+        scenario = json.load(f)
+
+    processes = []
+    base_url, upstream_url = args.base_url, args.upstream_url
+    if args.spawn:
+        processes = spawn_services(args.api_port, args.upstream_port)
+        base_url = f"http://127.0.0.1:{args.api_port}"
+        upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    try:
+        await wait_until_up(f"{base_url}/health")
+        if upstream_url:
+            await wait_until_up(f"{upstream_url}/_stats")
+        report = await run_scenario(scenario, base_url, upstream_url)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
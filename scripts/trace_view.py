@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Offline viewer for spans written with TRACE_EXPORTER=file.
+
+Prints each trace as a tree with start offsets and durations. For spans
+started by an agent message, it also prints the delivery delay: the time
+from the sender's "send" span starting to the handler starting. With
+--chrome, it writes Chrome trace events that load in Perfetto or
+chrome://tracing.
+
+Usage:
+    python scripts/trace_view.py backend/traces.jsonl [--trace TRACE_ID] [--last 3] [--chrome trace.json]
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Any, Dict, List
+
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def print_trace(trace_id: str, spans: List[Dict[str, Any]]):
+    by_id = {s["span_id"]: s for s in spans}
+    children = defaultdict(list)
+    roots = []
+    for s in sorted(spans, key=lambda s: s["start_ns"]):
+        if s["parent_id"] in by_id:
+            children[s["parent_id"]].append(s)
+        else:
+            roots.append(s)
+    origin = min(s["start_ns"] for s in spans)
+    total = (max(s["end_ns"] for s in spans) - origin) / 1e6
+    print(f"trace {trace_id}  {len(spans)} spans  {total:.1f} ms")
+
+    def walk(s, depth):
+        parent = by_id.get(s["parent_id"])
+        notes = [f"{k}={v}" for k, v in s["attributes"].items() if k not in ("query", "error")]
+        if parent is not None and parent["name"] == "send":
+            notes.insert(0, f"delivery {(s['start_ns'] - parent['start_ns']) / 1e6:.2f} ms")
+        if s["status"] != "ok":
+            notes.append(s["attributes"].get("error", s["status"]))
+        print(f"  {(s['start_ns'] - origin) / 1e6:>9.2f} ms {s['duration_ms']:>9.2f} ms  "
+              f"{'  ' * depth}{s['name']}  {' '.join(notes)}")
+        for child in children[s["span_id"]]:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+
+
+def to_chrome_events(traces: Dict[str, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Complete ("X") events; overlapping spans are spread over lanes so each lane nests"""
+    events = []
+    for pid, spans in enumerate(traces.values()):
+        lanes: List[List[int]] = []
+        for s in sorted(spans, key=lambda s: (s["start_ns"], -s["end_ns"])):
+            for lane, stack in enumerate(lanes):
+                while stack and stack[-1] <= s["start_ns"]:
+                    stack.pop()
+                if not stack or stack[-1] >= s["end_ns"]:
+                    stack.append(s["end_ns"])
+                    break
+            else:
+                lanes.append([s["end_ns"]])
+                lane = len(lanes) - 1
+            events.append({
+                "name": s["name"], "ph": "X", "pid": pid, "tid": lane,
+                "ts": s["start_ns"] / 1000, "dur": (s["end_ns"] - s["start_ns"]) / 1000,
+                "args": dict(s["attributes"], span_id=s["span_id"], trace_id=s["trace_id"]),
+            })
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="JSONL file written by the file exporter")
+    parser.add_argument("--trace", help="only this trace id")
+    parser.add_argument("--last", type=int, default=1, help="show the N most recent traces")
+    parser.add_argument("--chrome", help="write the selected traces as Chrome trace events to this file")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path)
+    if args.trace:
+        selected = {args.trace: traces.get(args.trace, [])}
+    else:
+        recent = sorted(traces, key=lambda t: min(s["start_ns"] for s in traces[t]))[-args.last:]
+        selected = {t: traces[t] for t in recent}
+
+    for trace_id, spans in selected.items():
+        if spans:
+            print_trace(trace_id, spans)
+    if args.chrome:
+        with open(args.chrome, "w") as f:
+            json.dump({"traceEvents": to_chrome_events(selected)}, f)
+        print(f"wrote {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()